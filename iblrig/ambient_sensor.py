@@ -0,0 +1,188 @@
+"""
+Background sampling of the ambient module.
+
+Reading the ambient module is a round-trip over the Bpod's serial port. :class:`AmbientSensorSampler` takes these
+readings in a background thread at a fixed interval and stores them, along with their timestamps, in a preallocated
+structured array. As the serial port is shared with the state machine, the sampler only reads from the module within
+the windows opened by the task with :meth:`AmbientSensorSampler.window`, i.e. while the Bpod is known to be idle.
+The task attaches the latest reading to each trial without waiting for the module.
+"""
+
+import contextlib
+import logging
+import math
+import threading
+import time
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+AMBIENT_SENSOR_FILE = '_iblrig_ambientSensorData.raw.csv'
+AMBIENT_SENSOR_DTYPE = np.dtype(
+    [('timestamp', np.float64), ('Temperature_C', np.float64), ('AirPressure_mb', np.float64), ('RelativeHumidity', np.float64)]
+)
+"""numpy.dtype: The fields of a sample: the time the reading was requested (seconds since the epoch) and the sensor values."""
+
+
+class AmbientSensorSampler:
+    """Read the ambient module in a background thread."""
+
+    def __init__(
+        self,
+        read_function: Callable[[], dict[str, float]],
+        interval_s: float = 10.0,
+        min_window_s: float = 0.05,
+        capacity: int = 1024,
+    ):
+        """
+        Read the ambient module in a background thread.
+
+        Parameters
+        ----------
+        read_function : callable
+            Function returning a reading of the module as a dictionary with keys Temperature_C, AirPressure_mb and
+            RelativeHumidity, see :meth:`iblrig.hardware.Bpod.get_ambient_sensor_reading`.
+        interval_s : float, optional
+            The minimum interval between two readings in seconds. Defaults to 10 s.
+        min_window_s : float, optional
+            A reading is only started if the current sampling window remains open for at least this duration in seconds,
+            so that it completes before the task needs the serial port again. Defaults to 50 ms.
+        capacity : int, optional
+            The number of samples preallocated. The array is grown as needed. Defaults to 1024.
+        """
+        self.read_function = read_function
+        self.interval_s = interval_s
+        self.min_window_s = min_window_s
+        self._samples = np.full(capacity, np.nan, dtype=AMBIENT_SENSOR_DTYPE)
+        self._nsamples = 0
+        self._lock = threading.Lock()  # guards the samples
+        self._reading = threading.Lock()  # held while the module is being read
+        self._condition = threading.Condition()  # guards the sampling window and the stop flag
+        self._window_end: float | None = None  # end of the sampling window (time.monotonic), None if closed
+        self._next_sample = 0.0  # earliest time of the next reading (time.monotonic)
+        self._stop = False
+        self._thread: threading.Thread | None = None
+
+    @property
+    def nsamples(self) -> int:
+        """int: The number of samples recorded."""
+        return self._nsamples
+
+    @property
+    def samples(self) -> np.ndarray:
+        """numpy.ndarray: A copy of the samples recorded, see :data:`AMBIENT_SENSOR_DTYPE`."""
+        with self._lock:
+            return self._samples[: self._nsamples].copy()
+
+    def latest(self) -> dict[str, float]:
+        """
+        Return the latest sample.
+
+        Returns
+        -------
+        dict
+            The timestamp and sensor values of the latest sample. All values are NaN if no sample has been recorded.
+        """
+        with self._lock:
+            sample = self._samples[self._nsamples - 1] if self._nsamples > 0 else np.full(1, np.nan, AMBIENT_SENSOR_DTYPE)[0]
+            return {name: float(sample[name]) for name in AMBIENT_SENSOR_DTYPE.names}
+
+    def sample(self) -> None:
+        """Read the module in the calling thread, e.g. before the first trial."""
+        with self._reading:
+            self._read()
+
+    def start(self) -> None:
+        """Take a first reading and start the background thread."""
+        self.sample()
+        self._thread = threading.Thread(target=self._run, name='ambient_sensor', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread, waiting for a reading in progress to complete."""
+        with self._condition:
+            self._stop = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @contextlib.contextmanager
+    def window(self, duration: float | None = None) -> Iterator[None]:
+        """
+        Allow the background thread to read the module.
+
+        When exiting the context, the sampling window is closed and the calling thread waits for a reading in progress
+        to complete, after which the serial port can be used again.
+
+        Parameters
+        ----------
+        duration : float, optional
+            The expected duration of the window in seconds. Readings are not started within the last `min_window_s` of
+            the window. If None, the window stays open until the context is exited.
+
+        Examples
+        --------
+        >>> with sampler.window(dt):
+        ...     time.sleep(dt)
+        """
+        with self._condition:
+            self._window_end = math.inf if duration is None else time.monotonic() + duration
+            self._condition.notify_all()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._window_end = None
+            with self._reading:
+                pass
+
+    def save(self, file_path: str | Path) -> None:
+        """
+        Save the samples recorded as a CSV file.
+
+        Parameters
+        ----------
+        file_path : str or Path
+            The CSV file.
+        """
+        try:
+            pd.DataFrame(self.samples).to_csv(file_path, index=False, float_format='%.6f')
+        except OSError as e:
+            log.error(f'Could not save the ambient sensor data to {file_path}: {e}')
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while True:
+                    if self._stop:
+                        return
+                    now = time.monotonic()
+                    window_open = self._window_end is not None and self._window_end - now >= self.min_window_s
+                    if window_open and now >= self._next_sample:
+                        break
+                    self._condition.wait(self._next_sample - now if window_open else None)
+                # the module is read outside the condition, the window can't be closed before the reading is started
+                self._reading.acquire()
+            try:
+                self._read()
+            finally:
+                self._reading.release()
+
+    def _read(self) -> None:
+        self._next_sample = time.monotonic() + self.interval_s
+        timestamp = time.time()
+        try:
+            reading = self.read_function()
+        except Exception as e:
+            log.warning(f'Could not read the ambient sensor: {e}')
+            return
+        with self._lock:
+            if self._nsamples == self._samples.size:
+                self._samples = np.concatenate([self._samples, np.full(self._samples.size, np.nan, AMBIENT_SENSOR_DTYPE)])
+            self._samples[self._nsamples] = (timestamp, *(reading.get(name, np.nan) for name in AMBIENT_SENSOR_DTYPE.names[1:]))
+            self._nsamples += 1
@@ -1,11 +1,13 @@
 """Extends the base_tasks modules by providing task logic around the Choice World protocol."""
 
 import abc
+import contextlib
 import logging
 import math
-import random
+import socket
 import subprocess
 import time
+from collections.abc import Hashable
 from pathlib import Path
 from string import ascii_letters
 from typing import Annotated, Any
@@ -18,8 +20,11 @@ from pydantic import NonNegativeFloat, NonNegativeInt
 import iblrig.base_tasks
 import iblrig.graphic
 from iblrig import choiceworld, misc
-from iblrig.hardware import SOFTCODE
+from iblrig.ambient_sensor import AMBIENT_SENSOR_FILE, AmbientSensorSampler
+from iblrig.constants import ONLINE_PLOTS_PORT
+from iblrig.hardware import SOFTCODE, StateMachineTemplate
 from iblrig.pydantic_definitions import TrialDataModel
+from iblrig.trial_timing import TIMINGS_FILE, TrialTimer
 from iblutil.io import jsonable
 from iblutil.util import Bunch
 from pybpodapi.com.messaging.trial import Trial
@@ -29,6 +34,17 @@ log = logging.getLogger(__name__)
 
 NTRIALS_INIT = 2000
 NBLOCKS_INIT = 100
+TRIAL_PHASES = (
+    'next_trial',
+    'state_machine',
+    'iti_wait',
+    'send_state_machine',
+    'iti_overhead',
+    'trial_completed',
+    'ambient_sensor',
+    'show_trial_log',
+)
+"""tuple of str: Steps of the trial loop timed by :attr:`ChoiceWorldSession.trial_timer`."""
 
 # TODO: task parameters should be verified through a pydantic model
 #
@@ -59,6 +75,7 @@ NBLOCKS_INIT = 100
 #     RESPONSE_WINDOW: float = 60
 #     REWARD_AMOUNT_UL: float = 1.5
 #     REWARD_TYPE: str = 'Water 10% Sucrose'
+#     SAVE_TRIAL_DATA_ARROW: bool = False
 #     STIM_ANGLE: float = 0.0
 #     STIM_FREQ: float = 0.1
 #     STIM_GAIN: float = 4.0  # wheel to stimulus relationship (degrees visual angle per mm of wheel displacement)
@@ -126,6 +143,16 @@ class ChoiceWorldSession(
         self.trial_num = -1
         self.block_num = -1
         self.block_trial_num = -1
+        # UDP socket used to notify the online plots of new trials
+        self._online_plots_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # parameters of all trials drawn in advance, see make_trial_schedule()
+        self._trial_schedule: choiceworld.TrialSchedule | None = None
+        # state machines compiled once per session, see get_state_machine_template_key()
+        self._state_machine_templates: dict[Hashable, StateMachineTemplate] = {}
+        # durations of the steps executed between the trials
+        self.trial_timer = TrialTimer(TRIAL_PHASES, file_path=self.paths.SESSION_RAW_DATA_FOLDER.joinpath(TIMINGS_FILE))
+        # background reading of the ambient module, see start_ambient_sensor_sampler()
+        self.ambient_sensor_sampler: AmbientSensorSampler | None = None
         # init the tables, there are 2 of them: a trials table and a ambient sensor data table
         self.trials_table = self.TrialDataModel.preallocate_dataframe(NTRIALS_INIT)
         self.ambient_sensor_table = pd.DataFrame(
@@ -177,51 +204,194 @@ class ChoiceWorldSession(
 
     def _run(self):
         """Run the task with the actual state machine."""
-        time_last_trial_end = time.time()
-        for i in range(self.task_params.NTRIALS):  # Main loop
-            # t_overhead = time.time()
+        time_last_trial_end = time_resume = time.time()
+        dead_time = self.task_params.get('DEAD_TIME', 0.5)
+        timer = self.trial_timer
+        sampler = self.start_ambient_sensor_sampler()
+        # the ambient module shares the Bpod's serial port: it is only read in between the trials
+        sampling_window = sampler.window if sampler is not None else lambda duration=None: contextlib.nullcontext()
+        try:
+            for i in range(self.task_params.NTRIALS):  # Main loop
+                timer.start_trial(i)
+                # prepare the trial: draw the trial's parameters, build the state machine, validate and serialize it
+                sma, message = self.prepare_trial(i)
+                log.info(f'Starting trial: {i}')
+                # The ITI_DELAY_SECS defines the grey screen period within the state machine, where the
+                # Bpod TTL is HIGH. The DEAD_TIME param defines the time between last trial and the next
+                dt = self.task_params.ITI_DELAY_SECS - dead_time - (time.time() - time_last_trial_end)
+                # wait to achieve the desired ITI duration
+                if dt > 0:
+                    with timer.measure('iti_wait'), sampling_window(dt):
+                        time.sleep(dt)
+                # only the transmission of the state machine to the Bpod remains between the trials
+                log.debug('Sending state machine to bpod')
+                with timer.measure('send_state_machine'):
+                    self.bpod.send_serialized_state_machine(message)
+                self.log_iti_overhead(time.time() - time_resume - max(dt, 0), dead_time)
+                # Run state machine
+                log.debug('running state machine')
+                self.bpod.run_state_machine(sma)  # Locks until state machine 'exit' is reached
+                time_last_trial_end = time_resume = time.time()
+                # handle pause event
+                flag_pause = self.paths.SESSION_FOLDER.joinpath('.pause')
+                flag_stop = self.paths.SESSION_FOLDER.joinpath('.stop')
+                if flag_pause.exists() and i < (self.task_params.NTRIALS - 1):
+                    log.info(f'Pausing session inbetween trials {i} and {i + 1}')
+                    with sampling_window():
+                        while flag_pause.exists() and not flag_stop.exists():
+                            time.sleep(1)
+                    time_resume = time.time()
+                    self.trials_table.at[self.trial_num, 'pause_duration'] = time_resume - time_last_trial_end
+                    if not flag_stop.exists():
+                        log.info('Resuming session')
+
+                # save trial and update log, the Bpod is idle: the ambient module can be read within the dead time
+                with sampling_window(dead_time - (time.time() - time_resume)):
+                    with timer.measure('trial_completed'):
+                        self.trial_completed(self.bpod.session.current_trial.export())
+                    with timer.measure('ambient_sensor'):
+                        if sampler is not None:
+                            reading = sampler.latest()
+                            for column in self.ambient_sensor_table.columns:
+                                self.ambient_sensor_table.at[i, column] = reading[column]
+                    with timer.measure('show_trial_log'):
+                        self.show_trial_log()
+
+                # handle stop event
+                if flag_stop.exists():
+                    log.info('Stopping session after trial %d', i)
+                    flag_stop.unlink()
+                    break
+        finally:
+            self._online_plots_socket.close()
+            if sampler is not None:
+                sampler.stop()
+                sampler.save(self.paths.SESSION_RAW_DATA_FOLDER.joinpath(AMBIENT_SENSOR_FILE))
+            self.log_trial_timings()
+
+    def start_ambient_sensor_sampler(self) -> AmbientSensorSampler | None:
+        """
+        Start reading the ambient module in the background.
+
+        The module is read every `AMBIENT_SENSOR_INTERVAL_SECS` seconds, in between the trials while the Bpod is idle. The latest
+        reading is attached to each trial in :attr:`ambient_sensor_table` and the time series is saved as
+        `_iblrig_ambientSensorData.raw.csv` at the end of the session.
+
+        Returns
+        -------
+        AmbientSensorSampler or None
+            The sampler, or None if `RECORD_AMBIENT_SENSOR_DATA` is False or the Bpod has no ambient module.
+        """
+        if not self.task_params.get('RECORD_AMBIENT_SENSOR_DATA', True) or self.bpod.ambient_module is None:
+            return None
+        self.ambient_sensor_sampler = AmbientSensorSampler(
+            self.bpod.get_ambient_sensor_reading, interval_s=self.task_params.get('AMBIENT_SENSOR_INTERVAL_SECS', 10)
+        )
+        self.ambient_sensor_sampler.start()
+        return self.ambient_sensor_sampler
+
+    def prepare_trial(self, i: int) -> tuple[StateMachine, bytes]:
+        """
+        Prepare a trial for sending it to the Bpod.
+
+        Draws the trial's parameters, then builds, validates and serializes its state machine. If the trial's state
+        machine shares its structure with a previous trial's, the cached template is re-used with the trial's timers.
+
+        Parameters
+        ----------
+        i : int
+            The trial number.
+
+        Returns
+        -------
+        StateMachine
+            The state machine of the trial.
+        bytes
+            The serialized state machine, see :meth:`~iblrig.hardware.Bpod.send_serialized_state_machine`.
+        """
+        with self.trial_timer.measure('next_trial'):
             self.next_trial()
-            log.info(f'Starting trial: {i}')
-            # =============================================================================
-            #     Start state machine definition
-            # =============================================================================
+        with self.trial_timer.measure('state_machine'):
+            return self._get_serialized_state_machine(i)
+
+    def _get_serialized_state_machine(self, i: int) -> tuple[StateMachine, bytes]:
+        if (key := self.get_state_machine_template_key(i)) is None:
             sma = self.get_state_machine_trial(i)
-            log.debug('Sending state machine to bpod')
-            # Send state machine description to Bpod device
-            self.bpod.send_state_machine(sma)
-            # t_overhead = time.time() - t_overhead
-            # The ITI_DELAY_SECS defines the grey screen period within the state machine, where the
-            # Bpod TTL is HIGH. The DEAD_TIME param defines the time between last trial and the next
-            dead_time = self.task_params.get('DEAD_TIME', 0.5)
-            dt = self.task_params.ITI_DELAY_SECS - dead_time - (time.time() - time_last_trial_end)
-            # wait to achieve the desired ITI duration
-            if dt > 0:
-                time.sleep(dt)
-            # Run state machine
-            log.debug('running state machine')
-            self.bpod.run_state_machine(sma)  # Locks until state machine 'exit' is reached
-            time_last_trial_end = time.time()
-            # handle pause event
-            flag_pause = self.paths.SESSION_FOLDER.joinpath('.pause')
-            flag_stop = self.paths.SESSION_FOLDER.joinpath('.stop')
-            if flag_pause.exists() and i < (self.task_params.NTRIALS - 1):
-                log.info(f'Pausing session inbetween trials {i} and {i + 1}')
-                while flag_pause.exists() and not flag_stop.exists():
-                    time.sleep(1)
-                self.trials_table.at[self.trial_num, 'pause_duration'] = time.time() - time_last_trial_end
-                if not flag_stop.exists():
-                    log.info('Resuming session')
-
-            # save trial and update log
-            self.trial_completed(self.bpod.session.current_trial.export())
-            self.ambient_sensor_table.loc[i] = self.bpod.get_ambient_sensor_reading()
-            self.show_trial_log()
-
-            # handle stop event
-            if flag_stop.exists():
-                log.info('Stopping session after trial %d', i)
-                flag_stop.unlink()
-                break
+            return sma, self.bpod.serialize_state_machine(sma)
+        state_timers = self.get_state_machine_timers(i)
+        if (template := self._state_machine_templates.get(key)) is None:
+            log.debug(f'compiling state machine template {key}')
+            template = StateMachineTemplate(self.get_state_machine_trial(i), state_timers.keys())
+            self._state_machine_templates[key] = template
+        return template.render(state_timers)
+
+    def get_state_machine_template_key(self, i: int) -> Hashable | None:
+        """
+        Get the key of the state machine template used for a trial.
+
+        Trials with the same key have state machines of identical structure that only differ by the timers returned
+        by :meth:`get_state_machine_timers`: the state machine is built once and its timers are patched for each
+        trial, see :class:`~iblrig.hardware.StateMachineTemplate`. Subclasses overriding
+        :meth:`get_state_machine_trial` need to override both methods to make use of the templates.
+
+        Parameters
+        ----------
+        i : int
+            The trial number.
+
+        Returns
+        -------
+        Hashable or None
+            The key of the template, None if the state machine is to be built for the trial.
+        """
+        if (type(self).get_state_machine_trial, type(self)._instantiate_state_machine) != (
+            ChoiceWorldSession.get_state_machine_trial,
+            ChoiceWorldSession._instantiate_state_machine,
+        ):
+            return None
+        return i == 0, self.position
+
+    def get_state_machine_timers(self, i: int) -> dict[str, float]:
+        """
+        Get the timers of the states that vary between trials sharing a state machine template.
+
+        Parameters
+        ----------
+        i : int
+            The trial number.
+
+        Returns
+        -------
+        dict[str, float]
+            The state timers in seconds, by state name.
+        """
+        return {
+            'quiescent_period': self.quiescent_period,
+            'reward': self.reward_time,
+            'correct': self.task_params.FEEDBACK_CORRECT_DELAY_SECS - self.reward_time,
+        }
+
+    def log_iti_overhead(self, overhead: float, dead_time: float) -> None:
+        """
+        Log the time spent between two trials in addition to the intended inter-trial interval.
+
+        Parameters
+        ----------
+        overhead : float
+            The time elapsed since the end of the previous trial, without the time spent waiting for the intended ITI.
+        dead_time : float
+            The allowed overhead, i.e. the DEAD_TIME task parameter.
+        """
+        self.trial_timer.record('iti_overhead', overhead)
+        log_level = logging.WARNING if overhead > dead_time else logging.DEBUG
+        log.log(log_level, f'Inter-trial overhead: {overhead * 1000:.1f} ms (DEAD_TIME: {dead_time * 1000:.0f} ms)')
+
+    def log_trial_timings(self) -> None:
+        """Save the durations of the steps executed between the trials and log their percentiles."""
+        if self.trial_timer.ntrials == 0:
+            return
+        self.trial_timer.save()
+        self.trial_timer.log_summary()
 
     def mock(self, file_jsonable_fixture=None):
         """
@@ -249,6 +419,9 @@ class ChoiceWorldSession(
 
         self.bpod.session.trials = [MockTrial()]
         self.bpod.send_state_machine = lambda k: None
+        self.bpod.serialize_state_machine = lambda sma: sma.update_state_numbers() or b''
+        self.bpod.send_serialized_state_machine = lambda k: None
+        self.get_state_machine_template_key = lambda i: None
         self.bpod.run_state_machine = lambda k: time.sleep(1.2)
 
         daction = ('dummy', 'action')
@@ -479,24 +652,66 @@ class ChoiceWorldSession(
     def default_reward_amount(self):
         return self.task_params.REWARD_AMOUNT_UL
 
+    @property
+    def trial_schedule(self) -> choiceworld.TrialSchedule:
+        """choiceworld.TrialSchedule: The parameters of all trials, drawn when first accessed."""
+        if self._trial_schedule is None:
+            self._trial_schedule = self.make_trial_schedule()
+            # the seed is saved with the task parameters so that the session can be reproduced
+            self.task_params['RANDOM_SEED'] = self._trial_schedule.seed
+        return self._trial_schedule
+
+    def make_trial_schedule(self, **kwargs) -> choiceworld.TrialSchedule:
+        """
+        Draw the parameters of all trials of the session.
+
+        The random number generator is seeded with the RANDOM_SEED task parameter, if set.
+
+        Parameters
+        ----------
+        **kwargs
+            Arguments overriding the ones passed to :class:`~iblrig.choiceworld.TrialSchedule`.
+
+        Returns
+        -------
+        choiceworld.TrialSchedule
+            The parameters of all trials.
+        """
+        match self.task_params.CONTRAST_SET_PROBABILITY_TYPE:
+            case 'skew_zero' | 'biased':
+                contrast_probabilities = misc.get_biased_probs(n=len(self.task_params.CONTRAST_SET))
+            case 'uniform':
+                contrast_probabilities = None
+            case _:
+                raise ValueError("Unsupported probability_type. Use 'skew_zero', 'biased', or 'uniform'.")
+        kwargs = {
+            'n_trials': self.task_params.NTRIALS,
+            'stim_positions': self.task_params.STIM_POSITIONS,
+            'contrast_set': self.task_params.CONTRAST_SET,
+            'contrast_probabilities': contrast_probabilities,
+            'quiescent_period': self.task_params.QUIESCENT_PERIOD,
+            'seed': self.task_params.get('RANDOM_SEED'),
+        } | kwargs
+        return choiceworld.TrialSchedule(**kwargs)
+
     def draw_next_trial_info(self, pleft=0.5, **kwargs):
         """Draw next trial variables.
 
+        The trial's parameters are taken from the :attr:`trial_schedule`.
         calls :meth:`send_trial_info_to_bonsai`.
         This is called by the `next_trial` method before updating the Bpod state machine.
         """
         assert len(self.task_params.STIM_POSITIONS) == 2, 'Only two positions are supported'
-        contrast = misc.draw_contrast(self.task_params.CONTRAST_SET, self.task_params.CONTRAST_SET_PROBABILITY_TYPE)
-        position = int(np.random.choice(self.task_params.STIM_POSITIONS, p=[pleft, 1 - pleft]))
-        quiescent_period = self.task_params.QUIESCENT_PERIOD + misc.truncated_exponential(
-            scale=0.35, min_value=0.2, max_value=0.5
-        )
+        trial = self.trial_schedule.trial(self.trial_num, probability_left=pleft)
+        contrast = trial['contrast']
+        position = int(trial['position'])
+        quiescent_period = trial['quiescent_period']
         stim_gain = (
             self.session_info.ADAPTIVE_GAIN_VALUE if self.task_params.get('ADAPTIVE_GAIN', False) else self.task_params.STIM_GAIN
         )
         self.trials_table.at[self.trial_num, 'quiescent_period'] = quiescent_period
         self.trials_table.at[self.trial_num, 'contrast'] = contrast
-        self.trials_table.at[self.trial_num, 'stim_phase'] = random.uniform(0, 2 * math.pi)
+        self.trials_table.at[self.trial_num, 'stim_phase'] = trial['stim_phase']
         self.trials_table.at[self.trial_num, 'stim_sigma'] = self.task_params.STIM_SIGMA
         self.trials_table.at[self.trial_num, 'stim_angle'] = self.task_params.STIM_ANGLE
         self.trials_table.at[self.trial_num, 'stim_gain'] = stim_gain
@@ -523,12 +738,24 @@ class ChoiceWorldSession(
         # update cumulative reward value
         self.session_info.TOTAL_WATER_DELIVERED += self.trials_table.at[self.trial_num, 'reward_amount']
         self.session_info.NTRIALS += 1
-        # SAVE TRIAL DATA
-        self.save_trial_data_to_json(bpod_data)
-        # this is a flag for the online plots. If online plots were in pyqt5, there is a file watcher functionality
+        # SAVE TRIAL DATA - the data are written in a background thread, which then calls trial_data_saved()
+        self.save_trial_data_to_json(bpod_data, callback=self.trial_data_saved)
+        self.check_sync_pulses(bpod_data=bpod_data)
+
+    def trial_data_saved(self) -> None:
+        """Flag the session for transfer and notify the online plots once a trial's data have been written."""
+        # the flag file is kept for viewers that can't listen for notifications
         Path(self.paths['DATA_FILE_PATH']).parent.joinpath('new_trial.flag').touch()
+        self.notify_online_plots()
         self.paths.SESSION_FOLDER.joinpath('transfer_me.flag').touch()
-        self.check_sync_pulses(bpod_data=bpod_data)
+
+    def notify_online_plots(self) -> None:
+        """Notify the online plots that a trial has been appended to the task data file."""
+        message = str(self.paths['DATA_FILE_PATH']).encode('utf-8')
+        try:
+            self._online_plots_socket.sendto(message, ('127.0.0.1', ONLINE_PLOTS_PORT))
+        except OSError as e:
+            log.debug(f'Could not notify the online plots: {e}')
 
     def check_sync_pulses(self, bpod_data):
         # todo move this in the post trial when we have a task flow
@@ -697,6 +924,18 @@ class HabituationChoiceWorldSession(ChoiceWorldSession):
         )
         return sma
 
+    def get_state_machine_template_key(self, i: int) -> Hashable | None:
+        if type(self).get_state_machine_trial is not HabituationChoiceWorldSession.get_state_machine_trial:
+            return None
+        return i == 0
+
+    def get_state_machine_timers(self, i: int) -> dict[str, float]:
+        return {
+            'stim_on': self.trials_table.at[self.trial_num, 'delay_to_stim_center'],
+            'reward': self.reward_time,
+            'post_reward': self.task_params.ITI_DELAY_SECS - self.reward_time,
+        }
+
 
 class ActiveChoiceWorldTrialData(ChoiceWorldTrialData):
     """Pydantic Model for Trial Data, extended from :class:`~.iblrig.base_choice_world.ChoiceWorldTrialData`."""
@@ -823,35 +1062,27 @@ class BiasedChoiceWorldSession(ActiveChoiceWorldSession):
             {'probability_left': np.zeros(NBLOCKS_INIT) * np.NaN, 'block_length': np.zeros(NBLOCKS_INIT, dtype=np.int16) * -1}
         )
 
+    def make_trial_schedule(self, **kwargs) -> choiceworld.TrialSchedule:
+        block_parameters = {
+            'block_len_factor': self.task_params.BLOCK_LEN_FACTOR,
+            'block_len_min': self.task_params.BLOCK_LEN_MIN,
+            'block_len_max': self.task_params.BLOCK_LEN_MAX,
+            'probability_set': self.task_params.BLOCK_PROBABILITY_SET,
+            'init_5050': self.task_params.BLOCK_INIT_5050,
+        }
+        return super().make_trial_schedule(**({'block_parameters': block_parameters} | kwargs))
+
     def new_block(self):
         """
-        if block_init_5050
-            First block has 50/50 probability of leftward stim
-            is 90 trials long
+        Start a new block, as drawn in the :attr:`trial_schedule`.
+
+        If BLOCK_INIT_5050 is set, the first block has 50/50 probability of leftward stim and is 90 trials long.
         """
         self.block_num += 1  # the block number is zero based
         self.block_trial_num = 0
-
-        # handles the block length logic
-        if self.task_params.BLOCK_INIT_5050 and self.block_num == 0:
-            block_len = 90
-        else:
-            block_len = int(
-                misc.truncated_exponential(
-                    scale=self.task_params.BLOCK_LEN_FACTOR,
-                    min_value=self.task_params.BLOCK_LEN_MIN,
-                    max_value=self.task_params.BLOCK_LEN_MAX,
-                )
-            )
-        if self.block_num == 0:
-            pleft = 0.5 if self.task_params.BLOCK_INIT_5050 else np.random.choice(self.task_params.BLOCK_PROBABILITY_SET)
-        elif self.block_num == 1 and self.task_params.BLOCK_INIT_5050:
-            pleft = np.random.choice(self.task_params.BLOCK_PROBABILITY_SET)
-        else:
-            # this switches the probability of leftward stim for the next block
-            pleft = round(abs(1 - self.blocks_table.loc[self.block_num - 1, 'probability_left']), 1)
-        self.blocks_table.at[self.block_num, 'block_length'] = block_len
-        self.blocks_table.at[self.block_num, 'probability_left'] = pleft
+        block = self.trial_schedule.blocks.loc[self.block_num]
+        self.blocks_table.at[self.block_num, 'block_length'] = block['block_length']
+        self.blocks_table.at[self.block_num, 'probability_left'] = block['probability_left']
 
     def next_trial(self):
         self.trial_num += 1
@@ -980,14 +1211,27 @@ class TrainingChoiceWorldSession(ActiveChoiceWorldSession):
             self.training_phase = np.minimum(5, self.training_phase + 1)
             log.warning(f'Moving on to training phase {self.training_phase}, {self.trial_num}')
 
+    def make_trial_schedule(self, **kwargs) -> choiceworld.TrialSchedule:
+        # the signed contrasts are drawn for the current training phase, the position is given by their sign
+        kwargs = {
+            'contrast_set': choiceworld.CONTRASTS,
+            'contrast_probabilities': choiceworld.training_contrasts_probabilities(self.training_phase),
+            'probability_left': self.task_params.PROBABILITY_LEFT,
+        } | kwargs
+        return super().make_trial_schedule(**kwargs)
+
     def next_trial(self):
         # update counters
         self.trial_num += 1
         self.var['training_phase_trial_counts'][self.training_phase] += 1
         # check if the subject graduates to a new training phase
+        training_phase = self.training_phase
         self.check_training_phase()
+        if self.training_phase != training_phase:
+            contrast_probabilities = choiceworld.training_contrasts_probabilities(self.training_phase)
+            self.trial_schedule.redraw(self.trial_num, contrast_probabilities=contrast_probabilities)
         # draw the next trial
-        signed_contrast = choiceworld.draw_training_contrast(self.training_phase)
+        signed_contrast = self.trial_schedule.trial(self.trial_num)['contrast']
         position = self.task_params.STIM_POSITIONS[int(np.sign(signed_contrast) == 1)]
         contrast = np.abs(signed_contrast)
         # debiasing: if the previous trial was incorrect and easy repeat the trial
@@ -1001,7 +1245,7 @@ class TrainingChoiceWorldSession(ActiveChoiceWorldSession):
                 average_right = np.mean(self.trials_table['response_side'][iresponse[-np.maximum(10, iresponse.size) :]] == 1)
                 # the next probability of next stimulus being on the left is a draw from a normal distribution
                 # centered on average right with sigma 0.5. If it is less than 0.5 the next stimulus will be on the left
-                position = self.task_params.STIM_POSITIONS[int(np.random.normal(average_right, 0.5) >= 0.5)]
+                position = self.task_params.STIM_POSITIONS[int(self.trial_schedule.rng.normal(average_right, 0.5) >= 0.5)]
                 # contrast is the last contrast
                 contrast = last_contrast
         else:
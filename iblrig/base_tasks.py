@@ -24,6 +24,7 @@ from typing import Protocol, final
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
 import scipy.interpolate
 import serial
 import yaml
@@ -35,14 +36,17 @@ import iblrig.path_helper
 import pybpodapi
 from ibllib.oneibl.registration import IBLRegistrationClient
 from iblrig import net, path_helper, sound
-from iblrig.constants import BASE_PATH, BONSAI_EXE, PYSPIN_AVAILABLE
+from iblrig.constants import BASE_PATH, BONSAI_EXE, CACHE_PATH, PYSPIN_AVAILABLE
 from iblrig.frame2ttl import Frame2TTL
 from iblrig.hardware import SOFTCODE, Bpod, MyRotaryEncoder, sound_device_factory
 from iblrig.hifi import HiFi
 from iblrig.path_helper import load_pydantic_yaml
 from iblrig.pydantic_definitions import HardwareSettings, RigSettings, TrialDataModel
+from iblrig.subject_history import SubjectHistory
 from iblrig.tools import call_bonsai
 from iblrig.transfer_experiments import BehaviorCopier, VideoCopier
+from iblrig.trial_store import ArrowTrialWriter, arrow_file_from_jsonable, trial_data_schema
+from iblrig.trial_writer import TrialDataWriter
 from iblutil.io.net.base import ExpMessage
 from iblutil.spacer import Spacer
 from iblutil.util import Bunch, flatten, setup_logger
@@ -123,6 +127,7 @@ class BaseSession(ABC):
         log.info(f'Session call: {" ".join(sys.argv)}')
         self.interactive = interactive
         self._one = one
+        self._trial_writer: TrialDataWriter | None = None
         self.init_datetime = datetime.datetime.now()
 
         # loads in the settings: first load the files, then update with the input argument if provided
@@ -449,21 +454,35 @@ class BaseSession(ABC):
             json.dump(output_dict, outfile, indent=4, sort_keys=True, default=str)  # converts datetime objects to string
         return json_file  # PosixPath
 
+    def update_subject_history(self):
+        """Update the subject's history index with the current protocol, see :class:`iblrig.subject_history.SubjectHistory`."""
+        try:
+            history = SubjectHistory(self.paths.SESSION_FOLDER.parents[1])
+            history.update_session(self.paths.SESSION_FOLDER, self.paths.TASK_COLLECTION)
+        except Exception as e:
+            log.warning(f'Could not update the subject history: {e}')
+
     @final
-    def save_trial_data_to_json(self, bpod_data: dict):
+    def save_trial_data_to_json(self, bpod_data: dict, callback: Callable[[], None] | None = None):
         """Validate and save trial data.
 
         This method retrieve's the current trial's data from the trial_table and validates it using a Pydantic model
         (self.TrialDataDefinition). In merges in the trial's bpod_data dict and appends everything to the session's
-        JSON data file.
+        JSON data file. If the task parameter `SAVE_TRIAL_DATA_ARROW` is set, the trial's data is additionally appended to
+        an Arrow IPC stream (see :mod:`iblrig.trial_store`).
+
+        The data are written by a background thread (see :mod:`iblrig.trial_writer`) so that slow disks don't delay the
+        next trial. Use :meth:`flush_trial_data` to wait for the data to be written.
 
         Parameters
         ----------
         bpod_data : dict
             Trial data returned from pybpod.
+        callback : callable, optional
+            A function called from the writer thread once the trial's data have been written to the JSON data file.
         """
         # get trial's data as a dict
-        trial_data = self.trials_table.iloc[self.trial_num].to_dict()
+        trial_data = self.TrialDataModel.dataframe_row(self.trials_table, self.trial_num)
 
         # warn about entries not covered by pydantic model
         if trial_data.get('trial_num', 1) == 0:
@@ -476,12 +495,42 @@ class BaseSession(ABC):
         # validate by passing through pydantic model
         trial_data = self.TrialDataModel.model_validate(trial_data).model_dump()
 
-        # add bpod_data as 'behavior_data'
-        trial_data['behavior_data'] = bpod_data
+        # hand the trial data over to the writer thread, bpod_data is written as 'behavior_data'
+        if self._trial_writer is None:
+            arrow_writer = None
+            if self.task_params.get('SAVE_TRIAL_DATA_ARROW', False):
+                file_arrow = arrow_file_from_jsonable(self.paths['DATA_FILE_PATH'])
+                arrow_writer = ArrowTrialWriter(file_arrow, schema=self.get_trial_data_schema())
+            self._trial_writer = TrialDataWriter(self.paths['DATA_FILE_PATH'], arrow_writer=arrow_writer)
+        self._trial_writer.put(trial_data, bpod_data, callback=callback)
+
+    def get_trial_data_schema(self) -> pa.Schema:
+        """
+        Declare the schema of the Arrow IPC stream written if the task parameter `SAVE_TRIAL_DATA_ARROW` is set.
 
-        # write json data to file
-        with open(self.paths['DATA_FILE_PATH'], 'a') as fp:
-            fp.write(json.dumps(trial_data) + '\n')
+        Returns
+        -------
+        pyarrow.Schema
+            The schema of the trial data, see :func:`iblrig.trial_store.trial_data_schema`.
+        """
+        return trial_data_schema(self.TrialDataModel)
+
+    def flush_trial_data(self, close: bool = False) -> None:
+        """
+        Wait for the trial data handed over by :meth:`save_trial_data_to_json` to be written and synced to disk.
+
+        Parameters
+        ----------
+        close : bool, optional
+            Whether to stop the writer thread. A new one is started for trials saved subsequently. Defaults to False.
+        """
+        if self._trial_writer is None:
+            return
+        if close:
+            trial_writer, self._trial_writer = self._trial_writer, None
+            trial_writer.close()
+        else:
+            self._trial_writer.flush()
 
     @property
     def one(self):
@@ -627,7 +676,16 @@ class BaseSession(ABC):
             self.paths.SESSION_FOLDER.joinpath('.stop').unlink()
 
         signal.signal(signal.SIGINT, sigint_handler)
-        self._run()  # runs the specific task logic i.e. trial loop etc...
+        try:
+            self._run()  # runs the specific task logic i.e. trial loop etc...
+        except BaseException:
+            # don't hide the error of the task behind an error writing the last trials
+            try:
+                self.flush_trial_data(close=True)
+            except Exception as e:
+                log.error(f'Could not write the trial data: {e}')
+            raise
+        self.flush_trial_data(close=True)  # the trial data are written in a background thread
         # post task instructions
         log.critical('Graceful exit')
         log.info(f'Session {self.paths.SESSION_RAW_DATA_FOLDER}')
@@ -637,6 +695,7 @@ class BaseSession(ABC):
                 'Poop count', f'{self.session_info.SUBJECT_NAME} droppings count:', nullable=True, askint=True
             )
         self.save_task_parameters_to_json_file()
+        self.update_subject_history()
         self.register_to_alyx()
         self._execute_mixins_shared_function('stop_mixin')
         self._execute_mixins_shared_function('cleanup_mixin')
@@ -936,6 +995,12 @@ class BpodMixin(BaseSession):
         )
         return softcode_dict
 
+    def get_trial_data_schema(self) -> pa.Schema:
+        # the states of the trial's state machine and all events of the Bpod
+        if (sma := getattr(self.bpod.session.current_trial, 'sma', None)) is None:
+            return super().get_trial_data_schema()
+        return trial_data_schema(self.TrialDataModel, sma.state_names, sma.hardware.channels.event_names)
+
     def init_mixin_bpod(self, *args, **kwargs):
         self.bpod = Bpod()
 
@@ -1104,7 +1169,7 @@ class SoundMixin(BaseSession, HasBpod):
         # not sure how this plays out when referenced outside of this python file
         self.sound['sd'], self.sound['samplerate'], self.sound['channels'] = sound_device_factory(output=sound_output)
         # Create sounds and output actions of state machine
-        self.sound['GO_TONE'] = iblrig.sound.make_sound(
+        self.sound['GO_TONE'] = iblrig.sound.make_sound_cached(
             rate=self.sound['samplerate'],
             frequency=self.task_params.GO_TONE_FREQUENCY,
             duration=self.task_params.GO_TONE_DURATION,
@@ -1112,13 +1177,14 @@ class SoundMixin(BaseSession, HasBpod):
             fade=0.01,
             chans=self.sound['channels'],
         )
-        self.sound['WHITE_NOISE'] = iblrig.sound.make_sound(
+        self.sound['WHITE_NOISE'] = iblrig.sound.make_sound_cached(
             rate=self.sound['samplerate'],
             frequency=-1,
             duration=self.task_params.WHITE_NOISE_DURATION,
             amplitude=self.task_params.WHITE_NOISE_AMPLITUDE * amp_gain_factor,
             fade=0.01,
             chans=self.sound['channels'],
+            cache_white_noise=self.hardware_settings.device_sound.CACHE_WHITE_NOISE,
         )
 
     def start_mixin_sound(self):
@@ -1146,9 +1212,14 @@ class SoundMixin(BaseSession, HasBpod):
                 assert module is not None, 'No HiFi module connected to Bpod'
                 assert self.hardware_settings.device_sound.COM_SOUND is not None
                 hifi = HiFi(port=self.hardware_settings.device_sound.COM_SOUND, sampling_rate_hz=self.sound['samplerate'])
-                hifi.load(index=self.task_params.GO_TONE_IDX, data=self.sound.GO_TONE)
-                hifi.load(index=self.task_params.WHITE_NOISE_IDX, data=self.sound.WHITE_NOISE)
-                hifi.push()
+                record_file = None
+                if self.hardware_settings.device_sound.SKIP_UNCHANGED_UPLOAD:
+                    record_file = CACHE_PATH.joinpath('hifi_waveforms.json')
+                waveforms = {
+                    self.task_params.GO_TONE_IDX: self.sound.GO_TONE,
+                    self.task_params.WHITE_NOISE_IDX: self.sound.WHITE_NOISE,
+                }
+                hifi.load_waveforms(waveforms, record_file=record_file)
                 hifi.close()
                 self.bpod.define_harp_sounds_actions(
                     module=module,
@@ -4,12 +4,15 @@ Appendix 2 of the paper into code.
 """
 
 import logging
-from typing import Literal
+from collections.abc import Sequence
+from typing import Any, Literal
 
 import numpy as np
+import pandas as pd
 
-import iblrig.raw_data_loaders
+from iblrig.misc import truncated_exponential
 from iblrig.path_helper import iterate_previous_sessions
+from iblrig.subject_history import get_trials_summary
 
 log = logging.getLogger(__name__)
 
@@ -50,6 +53,8 @@ def get_subject_training_info(
     """
     Goes through a subject's history and gets the latest training phase and adaptive reward volume.
 
+    The subject's history is looked up in the per-subject index, see :class:`iblrig.subject_history.SubjectHistory`.
+
     Parameters
     ----------
     subject_name : str
@@ -87,7 +92,7 @@ def get_subject_training_info(
         if len(session_info) > 0:
             session_info = session_info[0]
             task_settings = session_info.get('task_settings')
-            trials_data, _ = iblrig.raw_data_loaders.load_task_jsonable(session_info.get('file_task_data'))
+            trials_summary = get_trials_summary(session_info)
     except Exception as e:
         log.exception(msg='Error obtaining training information from previous session!', exc_info=e)
         training_info['adaptive_gain'] = stim_gain_on_error
@@ -110,17 +115,17 @@ def get_subject_training_info(
     training_info['adaptive_reward'] = compute_adaptive_reward_volume(
         subject_weight_g=task_settings.get('SUBJECT_WEIGHT'),
         reward_volume_ul=prev_reward_vol,
-        delivered_volume_ul=trials_data.get('reward_amount').sum(),
-        ntrials=trials_data.shape[0],
+        delivered_volume_ul=trials_summary['reward_delivered'],
+        ntrials=trials_summary['ntrials'],
     )
 
     # retrieve training_phase from the previous session's trials table
-    if 'training_phase' in trials_data:
-        training_info['training_phase'] = trials_data['training_phase'].values[-1]
+    if trials_summary['training_phase'] is not None:
+        training_info['training_phase'] = trials_summary['training_phase']
 
     # set adaptive gain depending on number of correct trials in previous session.
     # also fix negative adaptive gain values (due to a bug in the GUI prior to v8.21.0
-    if np.sum(trials_data['response_side'] != 0) > 200:
+    if trials_summary['n_responses'] > 200:
         training_info['adaptive_gain'] = task_settings.get('STIM_GAIN')
     elif task_settings.get('ADAPTIVE_GAIN_VALUE', 1) < 0:
         training_info['adaptive_gain'] = task_settings.get('AG_INIT_VALUE')
@@ -164,3 +169,198 @@ def training_phase_from_contrast_set(contrast_set: list[float]) -> int | None:
         if np.array_equal(contrast_set, expected_set):
             return phase
     raise Exception(f'Could not determine training phase from contrast set {contrast_set}')
+
+
+def draw_blocks(
+    n_trials: int,
+    rng: np.random.Generator,
+    *,
+    block_len_factor: float = 60,
+    block_len_min: int = 20,
+    block_len_max: int = 100,
+    probability_set: Sequence[float] = (0.2, 0.8),
+    init_5050: bool = True,
+) -> pd.DataFrame:
+    """
+    Draw the blocks of a biased choice world session.
+
+    The block lengths are drawn from a truncated exponential distribution. The probability of a left stimulus is drawn
+    from `probability_set` for the first block and alternates between complementary values for the following blocks.
+
+    Parameters
+    ----------
+    n_trials : int
+        The number of trials to be covered by the blocks.
+    rng : numpy.random.Generator
+        The random number generator.
+    block_len_factor : float, optional
+        The scale of the exponential distribution of the block lengths.
+    block_len_min : int, optional
+        The minimum block length.
+    block_len_max : int, optional
+        The maximum block length.
+    probability_set : Sequence[float], optional
+        The probabilities of a left stimulus to choose from for the first biased block.
+    init_5050 : bool, optional
+        Whether the session starts with an unbiased block of 90 trials.
+
+    Returns
+    -------
+    pd.DataFrame
+        The blocks, with columns 'probability_left' and 'block_length'.
+    """
+    n_blocks = int(np.ceil(n_trials / block_len_min)) + 1
+    block_length = truncated_exponential(block_len_factor, block_len_min, block_len_max, size=n_blocks, rng=rng).astype(np.int16)
+    if init_5050:
+        block_length[0] = 90
+    block_length = block_length[: np.searchsorted(np.cumsum(block_length), n_trials) + 1]
+    probability_left = np.zeros(block_length.size)
+    probability_left[0] = 0.5 if init_5050 else rng.choice(probability_set)
+    for i in range(1, block_length.size):
+        if i == 1 and init_5050:
+            probability_left[i] = rng.choice(probability_set)
+        else:
+            # this switches the probability of leftward stim for the next block
+            probability_left[i] = round(abs(1 - probability_left[i - 1]), 1)
+    return pd.DataFrame({'probability_left': probability_left, 'block_length': block_length})
+
+
+class TrialSchedule:
+    """
+    The parameters of all trials of a choice world session, drawn in advance.
+
+    All trials are drawn in a single vectorized pass from a seeded random number generator, which keeps the random draws
+    out of the inter-trial interval and makes the sequence of trials reproducible from the seed. Tasks that adapt to the
+    subject's performance re-draw the remaining trials with :meth:`redraw`.
+
+    Parameters
+    ----------
+    n_trials : int
+        The number of trials.
+    stim_positions : Sequence[float]
+        The left and right stimulus positions.
+    contrast_set : Sequence[float]
+        The contrasts to draw from.
+    contrast_probabilities : Sequence[float], optional
+        The probabilities of the contrasts, uniform by default.
+    probability_left : float, optional
+        The probability of a stimulus on the left, ignored if `block_parameters` are passed.
+    quiescent_period : float, optional
+        The minimum duration of the quiescent period, a truncated exponential draw between 0.2 and 0.5 s is added to it.
+    block_parameters : dict, optional
+        If set, the probability of a left stimulus is drawn in blocks, see :func:`draw_blocks` for the keys.
+    seed : int, optional
+        The seed of the random number generator, drawn from the OS's entropy if not set.
+
+    Attributes
+    ----------
+    seed : int
+        The seed of the random number generator.
+    rng : numpy.random.Generator
+        The random number generator, also to be used by the task for draws that depend on the subject's behavior.
+    contrast_set : np.ndarray
+        The contrasts to draw from.
+    blocks : pd.DataFrame or None
+        The blocks, see :func:`draw_blocks`.
+    columns : dict[str, np.ndarray]
+        The parameters of the trials, by name of the trials table's column.
+    """
+
+    def __init__(
+        self,
+        n_trials: int,
+        stim_positions: Sequence[float],
+        contrast_set: Sequence[float],
+        contrast_probabilities: Sequence[float] | None = None,
+        *,
+        probability_left: float = 0.5,
+        quiescent_period: float = 0.2,
+        block_parameters: dict[str, Any] | None = None,
+        seed: int | None = None,
+    ):
+        self.seed = np.random.SeedSequence().entropy if seed is None else seed
+        self.rng = np.random.default_rng(self.seed)
+        self.stim_positions = np.asarray(stim_positions)
+        self.contrast_set = np.asarray(contrast_set, dtype=float)
+        self.columns: dict[str, np.ndarray] = {}
+        if block_parameters is None:
+            self.blocks = None
+            self.columns['stim_probability_left'] = np.full(n_trials, probability_left, dtype=float)
+        else:
+            self.blocks = draw_blocks(n_trials, self.rng, **block_parameters)
+            block_length = self.blocks['block_length'].values.astype(int)
+            block_start = np.cumsum(block_length) - block_length
+            block_num = np.repeat(np.arange(block_length.size), block_length)[:n_trials]
+            self.columns['block_num'] = block_num
+            self.columns['block_trial_num'] = np.arange(n_trials) - block_start[block_num]
+            self.columns['stim_probability_left'] = self.blocks['probability_left'].values[block_num]
+        self._position_variates = self.rng.random(n_trials)
+        self.columns['position'] = self._positions(self._position_variates, self.columns['stim_probability_left'])
+        self.columns['contrast'] = self.rng.choice(self.contrast_set, size=n_trials, p=contrast_probabilities)
+        self.columns['quiescent_period'] = quiescent_period + truncated_exponential(0.35, 0.2, 0.5, size=n_trials, rng=self.rng)
+        self.columns['stim_phase'] = self.rng.uniform(0, 2 * np.pi, n_trials)
+
+    def __len__(self) -> int:
+        return self._position_variates.size
+
+    def _positions(self, variates: np.ndarray, probability_left: np.ndarray | float) -> np.ndarray:
+        return np.where(variates < probability_left, self.stim_positions[0], self.stim_positions[1])
+
+    def trial(self, i: int, probability_left: float | None = None) -> dict[str, Any]:
+        """
+        Get the parameters of a trial.
+
+        Parameters
+        ----------
+        i : int
+            The trial number.
+        probability_left : float, optional
+            The probability of a stimulus on the left, if it deviates from the scheduled one. The stimulus position is
+            then derived from the same random draw.
+
+        Returns
+        -------
+        dict[str, Any]
+            The parameters of the trial, by name of the trials table's column.
+        """
+        trial = {key: values[i] for key, values in self.columns.items()}
+        if probability_left is not None and probability_left != trial['stim_probability_left']:
+            trial['stim_probability_left'] = probability_left
+            trial['position'] = self._positions(self._position_variates[i], probability_left).item()
+        return trial
+
+    def redraw(
+        self,
+        start: int,
+        *,
+        contrast_set: Sequence[float] | None = None,
+        contrast_probabilities: Sequence[float] | None = None,
+        probability_left: float | None = None,
+    ) -> None:
+        """
+        Re-draw the trials from `start` onwards, e.g. after a change of training phase.
+
+        Parameters
+        ----------
+        start : int
+            The number of the first trial to re-draw.
+        contrast_set : Sequence[float], optional
+            The new contrasts to draw from.
+        contrast_probabilities : Sequence[float], optional
+            The probabilities of the contrasts, uniform by default.
+        probability_left : float, optional
+            The new probability of a stimulus on the left.
+        """
+        if contrast_set is not None:
+            self.contrast_set = np.asarray(contrast_set, dtype=float)
+        if contrast_set is not None or contrast_probabilities is not None:
+            n = len(self) - start
+            self.columns['contrast'][start:] = self.rng.choice(self.contrast_set, size=n, p=contrast_probabilities)
+        if probability_left is not None:
+            self.columns['stim_probability_left'][start:] = probability_left
+            self.columns['position'][start:] = self._positions(self._position_variates[start:], probability_left)
+
+    @property
+    def table(self) -> pd.DataFrame:
+        """pd.DataFrame: The parameters of all trials."""
+        return pd.DataFrame(self.columns)
@@ -12,7 +12,8 @@ import iblrig
 from iblrig.hardware import Bpod
 from iblrig.online_plots import OnlinePlots
 from iblrig.path_helper import get_local_and_remote_paths
-from iblrig.transfer_experiments import BehaviorCopier, EphysCopier, SessionCopier, VideoCopier
+from iblrig.session_qc import QC_REPORT_FILE, make_qc_report
+from iblrig.transfer_experiments import BehaviorCopier, EphysCopier, SessionCopier, TransferScheduler, VideoCopier
 from iblutil.util import setup_logger
 
 logger = logging.getLogger(__name__)
@@ -42,7 +43,9 @@ def _transfer_parser(description: str) -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description=description, formatter_class=argparse.ArgumentDefaultsHelpFormatter, argument_default=argparse.SUPPRESS
     )
-    parser.add_argument('-t', '--tag', default='behavior', type=str, help='data type to transfer, e.g. "behavior", "video"')
+    parser.add_argument(
+        '-t', '--tag', default='behavior', type=str, help='data type(s) to transfer, e.g. "behavior", "video" or "behavior,video"'
+    )
     parser.add_argument('-l', '--local', action='store', type=dir_path, dest='local_path', help='define local data path')
     parser.add_argument('-r', '--remote', action='store', type=dir_path, dest='remote_path', help='define remote data path')
     parser.add_argument('-d', '--dry', action='store_true', dest='dry', help='do not remove local data after copying')
@@ -55,6 +58,12 @@ def _transfer_parser(description: str) -> argparse.ArgumentParser:
     parser.add_argument(
         '--date', type=str, help='an optional date pattern to filter sessions by. Wildcards accepted.', default='*-*-*'
     )
+    parser.add_argument(
+        '-j', '--max-sessions', type=int, dest='max_sessions', help='number of sessions to copy concurrently', default=1
+    )
+    parser.add_argument(
+        '-b', '--max-bandwidth', type=float, dest='max_bandwidth', help='limit the aggregate transfer rate (MiB/s)'
+    )
     return parser
 
 
@@ -235,15 +244,23 @@ def transfer_data(
     dry: bool = False,
     interactive: bool = False,
     cleanup_weeks=2,
+    *,
+    max_sessions: int = 1,
+    max_bandwidth: float | None = None,
     **kwargs,
 ) -> list[SessionCopier]:
     """
     Copies data from the rig to the local server.
 
+    Sessions are copied by a `TransferScheduler`: data types are queued following
+    `iblrig.transfer_experiments.TRANSFER_PRIORITY` and the failure of one session doesn't abort the transfer of the
+    other sessions.
+
     Parameters
     ----------
     tag : str
-        The acquisition PC tag to transfer, e.g. 'behavior', 'video', 'ephys', 'timeline', etc.
+        The acquisition PC tag to transfer, e.g. 'behavior', 'video', 'ephys', 'timeline', etc. Several tags can be
+        passed as a comma-separated string, e.g. 'behavior,video'.
     local_path : Path
         Path to local subjects folder, otherwise fetches path from iblrig_settings.yaml file.
     remote_path : Path
@@ -254,6 +271,10 @@ def transfer_data(
         If true, users are prompted to review the sessions to copy before proceeding.
     cleanup_weeks : int, bool
         Remove local data older than this number of weeks. If False, do not remove.
+    max_sessions : int
+        The maximum number of sessions copied concurrently.
+    max_bandwidth : float, optional
+        The maximum aggregate transfer rate in MiB/s. No limit is applied if None.
     kwargs
         Optional arguments to pass to SessionCopier constructor.
 
@@ -268,24 +289,30 @@ def transfer_data(
     kwargs['glob_pattern'] = _build_glob_pattern(**kwargs)
     kwargs = {k: v for k, v in kwargs.items() if k not in ('subject', 'date', 'number', 'flag_file')}
     local_subject_folder, remote_subject_folder = _get_subjects_folders(local_path, remote_path)
-    copier = tag2copier.get(tag.lower(), SessionCopier)
-    logger.info('Searching for %s sessions using %s class', tag.lower(), copier.__name__)
     expected_devices = kwargs.pop('number_of_expected_devices', None)
-    copiers = _get_copiers(copier, local_subject_folder, remote_subject_folder, interactive=interactive, tag=tag, **kwargs)
+    tags = [t.strip() for t in tag.split(',') if t.strip()]
+    copiers = []
+    for copier_tag in tags:
+        copier = tag2copier.get(copier_tag.lower(), SessionCopier)
+        logger.info('Searching for %s sessions using %s class', copier_tag.lower(), copier.__name__)
+        copiers.extend(
+            _get_copiers(copier, local_subject_folder, remote_subject_folder, interactive=interactive, tag=copier_tag, **kwargs)
+        )
 
     for copier in copiers:
         logger.critical(f'{copier.state}, {copier.session_path}')
-        if not dry:
-            copier.run(number_of_expected_devices=expected_devices)
+    if not dry and len(copiers) > 0:
+        TransferScheduler(copiers, max_sessions=max_sessions, max_bandwidth=max_bandwidth).run(expected_devices)
 
     if interactive:
         _print_status(copiers, 'States after transfer operation:')
 
     # once we copied the data, remove older session for which the data was successfully uploaded
     if isinstance(cleanup_weeks, int) and cleanup_weeks > -1:
-        remove_local_sessions(
-            weeks=cleanup_weeks, dry=dry, local_path=local_subject_folder, remote_path=remote_subject_folder, tag=tag
-        )
+        for copier_tag in tags:
+            remove_local_sessions(
+                weeks=cleanup_weeks, dry=dry, local_path=local_subject_folder, remote_path=remote_subject_folder, tag=copier_tag
+            )
     return copiers
 
 
@@ -325,6 +352,10 @@ def remove_local_sessions(weeks=2, local_path=None, remote_path=None, dry=False,
         else:
             sc = copier(session_path, remote_subjects_folder=remote_subject_folder)
         if sc.state == 3:
+            # files modified after they were copied are not on the server: only their status is read, not their content
+            if modified_files := sc.manifest.modified_files():
+                logger.warning(f'{sc.session_path}: {len(modified_files)} file(s) modified since the copy, skipping removal')
+                continue
             session_size = sum(f.stat().st_size for f in session_path.rglob('*') if f.is_file()) / 1024**3
             logger.info(f'{sc.session_path}, {session_size:0.02f} Go')
             size += session_size
@@ -353,6 +384,35 @@ def view_session():
     online_plots.run(file_jsonable=args.file_jsonable)
 
 
+def qc_report():
+    """
+    Entry point for command line: compute the quality metrics of all sessions within a subjects folder.
+
+    >>> qc_report /full/path/to/Subjects -j 8
+    """
+    setup_logger('iblrig', level='INFO')
+    parser = argparse.ArgumentParser(description='Compute the quality metrics of all sessions within a subjects folder.')
+    parser.add_argument(
+        'subjects_folder', nargs='?', type=dir_path, default=None, help='subjects folder (default: local subjects folder)'
+    )
+    parser.add_argument(
+        '-o',
+        '--output',
+        type=Path,
+        dest='file_report',
+        default=None,
+        help=f'Parquet file (default: {QC_REPORT_FILE} in subjects folder)',
+    )
+    parser.add_argument('-j', '--max-workers', type=int, dest='max_workers', default=None, help='number of processes')
+    parser.add_argument('-f', '--force', action='store_true', help='process all sessions, including unchanged ones')
+    args = parser.parse_args()
+
+    subjects_folder = args.subjects_folder or get_local_and_remote_paths().local_subjects_folder
+    file_report = args.file_report or subjects_folder.joinpath(QC_REPORT_FILE)
+    report = make_qc_report(subjects_folder, file_report=file_report, max_workers=args.max_workers, force=args.force)
+    logger.info(f'Quality metrics of {report.shape[0]} protocols saved to {file_report}')
+
+
 def flush():
     """Flush the valve until the user hits enter."""
     file_settings = Path(iblrig.__file__).parents[1].joinpath('settings', 'hardware_settings.yaml')
@@ -12,6 +12,7 @@ BONSAI_EXE = BASE_PATH.joinpath('Bonsai', 'Bonsai.exe')
 SETTINGS_PATH = BASE_PATH.joinpath('settings')
 HARDWARE_SETTINGS_YAML = SETTINGS_PATH.joinpath('hardware_settings.yaml')
 RIG_SETTINGS_YAML = SETTINGS_PATH.joinpath('iblrig_settings.yaml')
+CACHE_PATH = BASE_PATH.joinpath('cache')  # rig-specific files that can be regenerated, e.g. rendered sounds
 HAS_SPINNAKER = (
     os.name == 'nt'
     and (_spin_exe := which('SpinUpdateConsole_v140')) is not None
@@ -22,6 +23,7 @@ try:
 except ValueError:
     HAS_PYSPIN = False
 PYSPIN_AVAILABLE = HAS_SPINNAKER and HAS_PYSPIN
+ONLINE_PLOTS_PORT = 7113  # UDP port used by the tasks to notify the online plots of new trials
 COPYRIGHT_YEAR = 2024
 URL_DOC = 'https://int-brain-lab.github.io/iblrig'
 URL_REPO = 'https://github.com/int-brain-lab/iblrig/tree/iblrigv8'
@@ -7,7 +7,7 @@ from iblrig import __version__ as version
 from iblrig.constants import COPYRIGHT_YEAR
 from iblrig.gui.tools import Worker
 from iblrig.gui.ui_splash import Ui_splash
-from iblrig.hardware_validation import Result, get_all_validators
+from iblrig.hardware_validation import Result, get_all_validators, run_validators
 from iblrig.path_helper import load_pydantic_yaml
 from iblrig.pydantic_definitions import HardwareSettings, RigSettings
 
@@ -48,11 +48,15 @@ class Splash(QDialog, Ui_splash):
         self.show()
 
     def validation(self):
-        for validator in get_all_validators():
-            validator_instance = validator(hardware_settings=self.hardware_settings, iblrig_settings=self.rig_settings)
-            self.labelStatus.setText(f'Validating {validator_instance.name} ...')
-            for result in validator_instance.run():
-                self.validation_results.append(result)
+        validators = [
+            v(hardware_settings=self.hardware_settings, iblrig_settings=self.rig_settings) for v in get_all_validators()
+        ]
+        self.labelStatus.setText(f'Validating {validators[0].name} ...')
+        for idx, event in run_validators(validators):
+            if isinstance(event, Result):
+                self.validation_results.append(event)
+            elif idx + 1 < len(validators):
+                self.labelStatus.setText(f'Validating {validators[idx + 1].name} ...')
 
     def stop_and_close(self):
         self.close()
@@ -1,7 +1,6 @@
 import platform
 import subprocess
-from datetime import datetime
-from typing import NamedTuple
+from typing import Any, NamedTuple
 
 import pandas as pd
 from PyQt5.Qt import pyqtSlot
@@ -20,8 +19,8 @@ from PyQt5.QtWidgets import QHeaderView, QStyledItemDelegate, QWidget
 from iblrig.gui.tools import DataFrameTableModel
 from iblrig.gui.ui_tab_data import Ui_TabData
 from iblrig.path_helper import get_local_and_remote_paths
-from iblrig.transfer_experiments import CopyState, SessionCopier
-from iblutil.util import dir_size
+from iblrig.session_catalog import SessionCatalog
+from iblrig.transfer_experiments import CopyState
 
 if platform.system() == 'Windows':
     from os import startfile
@@ -34,8 +33,6 @@ COPY_STATE_STRINGS = {
     CopyState.FINALIZED: 'Copy Finalized',
 }
 
-SESSIONS_GLOB = r'*/[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]/[0-9][0-9][0-9]/'
-
 
 def sizeof_fmt(num, suffix='B'):
     for unit in ('', 'K', 'M', 'G', 'T', 'P', 'E', 'Z'):
@@ -66,7 +63,7 @@ class DataItemDelegate(QStyledItemDelegate):
         super().initStyleOption(option, index)
         header_text = index.model().headerData(index.column(), Qt.Horizontal, Qt.DisplayRole)
         if 'Size' in header_text:
-            option.text = sizeof_fmt(index.data())
+            option.text = '' if pd.isna(index.data()) else sizeof_fmt(index.data())
             option.displayAlignment = Qt.AlignRight | Qt.AlignVCenter
 
 
@@ -108,7 +105,7 @@ class TabData(QWidget, Ui_TabData):
 
         # connect signals to slots
         self.dataWorker.initialized.connect(self.tableModel.setDataFrame)
-        self.dataWorker.update.connect(self.tableModel.setData)
+        self.dataWorker.update.connect(self._updateSession)
         self.dataWorker.started.connect(lambda: self.pushButtonUpdate.setEnabled(False))
         self.dataWorker.lazyLoadComplete.connect(lambda: self.pushButtonUpdate.setEnabled(True))
         self.tableView.doubleClicked.connect(self._openDir)
@@ -124,6 +121,14 @@ class TabData(QWidget, Ui_TabData):
         if self.tableModel.rowCount() == 0:
             self.dataWorker.start()
 
+    @pyqtSlot(dict)
+    def _updateSession(self, row_data: dict[str, Any]):
+        data_frame = self.tableModel.dataFrame
+        rows = data_frame.index[data_frame['Directory'] == row_data['Directory']]
+        for row in rows:
+            for name, value in row_data.items():
+                self.tableModel.setData(self.tableModel.index(row, data_frame.columns.get_loc(name)), value)
+
     @pyqtSlot(QModelIndex)
     def _openDir(self, index: QModelIndex):
         directory = self.tableView.model().itemData(index.siblingAtColumn(0))[0]
@@ -142,45 +147,36 @@ class TabData(QWidget, Ui_TabData):
 
 class DataWorker(QThread):
     initialized = pyqtSignal(pd.DataFrame)
-    update = pyqtSignal(QModelIndex, object)
+    update = pyqtSignal(dict)
     lazyLoadComplete = pyqtSignal()
 
     def __init__(self, parent: TabData):
         super().__init__(parent)
         self.localSubjectsPath = parent.localSubjectsPath
-        self.tableModel = parent.tableModel
-        self.tableModel.modelReset.connect(self.lazyLoadStatus)
+
+    @staticmethod
+    def _rowData(record: dict[str, Any]) -> dict[str, Any]:
+        return {
+            'Directory': record['session_path'],
+            'Subject': record['subject'],
+            'Date': QDateTime.fromTime_t(int(record['date'])) if record['date'] is not None else QDateTime(),
+            'Copy Status': COPY_STATE_STRINGS.get(record['copy_state'], 'N/A'),
+            'Size': float(record['size']) if record['size'] is not None else None,
+        }
+
+    def _dataFrame(self, records: list[dict[str, Any]]) -> pd.DataFrame:
+        return pd.DataFrame(data=[self._rowData(r) for r in records], columns=[c.name for c in COLUMNS])
 
     def run(self):
-        data = []
-        for session_dir in self.localSubjectsPath.glob(SESSIONS_GLOB):
-            # make sure we're dealing with a directory
-            if not session_dir.is_dir():
-                continue
-
-            # get folder creation time (cross-check with name of directory)
-            date = datetime.strptime(session_dir.parent.name, '%Y-%m-%d')
-            time = datetime.fromtimestamp(session_dir.stat().st_ctime)
-            date = time if time.date() == date.date() else date
-
-            # append data
-            data.append(
-                [
-                    session_dir,
-                    session_dir.parents[1].name,
-                    QDateTime.fromTime_t(int(date.timestamp())),
-                    '',  # will be lazy-loaded in a separate step
-                    float(dir_size(session_dir)),
-                ]
-            )
-        data = pd.DataFrame(data=data, columns=[c.name for c in COLUMNS])
-        self.initialized.emit(data)
-
-    def lazyLoadStatus(self):
-        col_status = self.tableModel.dataFrame.columns.get_loc('Copy Status')
-        for row, row_data in self.tableModel.dataFrame.iterrows():
-            state = SessionCopier(row_data['Directory']).state
-            state = COPY_STATE_STRINGS.get(state, 'N/A')
-            index = self.tableModel.index(row, col_status)
-            self.update.emit(index, state)
+        # show the cached catalog right away, then update the sessions that have changed since
+        catalog = SessionCatalog(self.localSubjectsPath)
+        cached = catalog.records()
+        self.initialized.emit(self._dataFrame(cached))
+        sessions = {r['session'] for r in cached}
+        for record in catalog.refresh():
+            if record['session'] in sessions:
+                self.update.emit(self._rowData(record))
+        records = catalog.records()
+        if {r['session'] for r in records} != sessions:
+            self.initialized.emit(self._dataFrame(records))
         self.lazyLoadComplete.emit()
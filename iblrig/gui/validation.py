@@ -5,7 +5,7 @@ from PyQt5.QtWidgets import QHeaderView
 
 from iblrig.gui.tools import Worker
 from iblrig.gui.ui_validation import Ui_validation
-from iblrig.hardware_validation import Result, Status, Validator, get_all_validators
+from iblrig.hardware_validation import Result, Status, Validator, ValidatorReport, get_all_validators, run_validators
 from iblrig.pydantic_definitions import HardwareSettings, RigSettings
 
 SECTION_FONT = QFont('', -1, QFont.Bold, False)
@@ -80,7 +80,7 @@ class SystemValidationDialog(QtWidgets.QDialog, Ui_validation):
     status_items: list[StatusItem] = []
     item_started = QtCore.pyqtSignal(int)
     item_result = QtCore.pyqtSignal(int, Result)
-    item_finished = QtCore.pyqtSignal(int, Status)
+    item_finished = QtCore.pyqtSignal(int, Status, float)
 
     def __init__(self, *args, hardware_settings: HardwareSettings, rig_settings: RigSettings, **kwargs) -> None:
         """
@@ -143,24 +143,16 @@ class SystemValidationDialog(QtWidgets.QDialog, Ui_validation):
         QThreadPool.globalInstance().tryStart(self.worker)
 
     def run_subprocess(self):
-        """Run all validators in a subprocess."""
-        for idx, validator_item in enumerate(self.validator_items):
-            self.item_started.emit(idx)
-            results = []
-            for result in validator_item.validator.run():
-                results.append(result)
-                self.item_result.emit(idx, result)
-
-            statuses = [r.status for r in results]
-            if Status.SKIP in statuses:
-                status = Status.SKIP
-            elif Status.FAIL in statuses:
-                status = Status.FAIL
-            elif Status.WARN in statuses:
-                status = Status.WARN
+        """Run all validators in a subprocess - validators that don't share resources run concurrently."""
+        current = -1
+        for idx, event in run_validators([item.validator for item in self.validator_items]):
+            if idx != current:
+                current = idx
+                self.item_started.emit(idx)
+            if isinstance(event, ValidatorReport):
+                self.item_finished.emit(idx, event.status, event.duration_s)
             else:
-                status = Status.PASS
-            self.item_finished.emit(idx, status)
+                self.item_result.emit(idx, event)
 
     @pyqtSlot(int)
     def on_item_started(self, idx: int):
@@ -178,10 +170,11 @@ class SystemValidationDialog(QtWidgets.QDialog, Ui_validation):
             self.validator_items[idx].appendRow(solution_item)
         self.update()
 
-    @pyqtSlot(int, Status)
-    def on_item_finished(self, idx: int, status: Status):
+    @pyqtSlot(int, Status, float)
+    def on_item_finished(self, idx: int, status: Status, duration_s: float):
         self.validator_items[idx].status = status
         self.status_items[idx].status = status
+        self.status_items[idx].setToolTip(f'{duration_s:.1f} s')
         if status == Status.PASS:
             self.treeView.collapse(self.validator_items[idx].index())
         self.treeView.scrollToBottom()
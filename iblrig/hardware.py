@@ -8,7 +8,7 @@ import struct
 import subprocess
 import threading
 import time
-from collections.abc import Callable
+from collections.abc import Callable, Iterable
 from enum import IntEnum
 from pathlib import Path
 from typing import Annotated, Literal
@@ -26,6 +26,7 @@ from pybpod_rotaryencoder_module.module import RotaryEncoder
 from pybpod_rotaryencoder_module.module_api import RotaryEncoderModule
 from pybpodapi.bpod.bpod_io import BpodIO
 from pybpodapi.bpod_modules.bpod_module import BpodModule
+from pybpodapi.com.arcom import ArduinoTypes
 from pybpodapi.state_machine import StateMachine
 
 SOFTCODE = IntEnum('SOFTCODE', ['STOP_SOUND', 'PLAY_TONE', 'PLAY_NOISE', 'TRIGGER_CAMERA'])
@@ -319,6 +320,115 @@ class Bpod(BpodIO):
         self.softcodes = softcode_dict
         self.softcode_handler_function = lambda code: softcode_dict[code]()
 
+    @staticmethod
+    def serialize_state_machine(sma: StateMachine, run_asap: bool | None = None) -> bytes:
+        """
+        Validate a state machine and build the message that describes it to the Bpod.
+
+        This is the part of `send_state_machine` that doesn't require access to the serial port. Together with
+        `send_serialized_state_machine` it allows for preparing a state machine ahead of the time it is sent.
+
+        Parameters
+        ----------
+        sma : StateMachine
+            The state machine.
+        run_asap : bool, optional
+            Whether the state machine should be run as soon as the current one has finished.
+
+        Returns
+        -------
+        bytes
+            The message to be sent to the Bpod.
+
+        Raises
+        ------
+        StateMachineBuilderError
+            If states were referenced by name but never declared.
+        """
+        sma.update_state_numbers()
+        state_machine_body = sma.build_message() + sma.build_message_global_timer() + sma.build_message_32_bits()
+        return bytes(sma.build_header(run_asap, len(state_machine_body)) + state_machine_body)
+
+    def send_serialized_state_machine(self, message: bytes) -> None:
+        """
+        Send a state machine that has been serialized with `serialize_state_machine` to the Bpod.
+
+        Parameters
+        ----------
+        message : bytes
+            The serialized state machine.
+        """
+        if not self.bpod_com_ready:
+            raise Exception('Bpod connection is closed')
+        if self._skip_all_trials is True:
+            return
+        self._bpodcom_send_state_machine(message)
+        self._new_sma_sent = True
+
+
+class StateMachineTemplate:
+    """
+    A state machine that is serialized once and re-used with different state timers.
+
+    Building, validating and serializing a state machine for every trial is wasteful when only the timers of a few of
+    its states change from one trial to the next. The template keeps the serialized message of the state machine and
+    patches the timers of the variable states into it.
+
+    Parameters
+    ----------
+    sma : StateMachine
+        The state machine.
+    state_names : Iterable[str]
+        The names of the states whose timers vary between uses of the template.
+    run_asap : bool, optional
+        Whether the state machine should be run as soon as the current one has finished.
+
+    Examples
+    --------
+    >>> template = StateMachineTemplate(sma, ['quiescent_period', 'reward'])
+    >>> sma, message = template.render({'quiescent_period': 0.52, 'reward': 0.08})
+    >>> bpod.send_serialized_state_machine(message)
+    >>> bpod.run_state_machine(sma)
+    """
+
+    def __init__(self, sma: StateMachine, state_names: Iterable[str], run_asap: bool | None = None):
+        self.sma = sma
+        message = Bpod.serialize_state_machine(sma, run_asap)
+        self._message = bytearray(message)
+        self._cycle_frequency = sma.hardware.cycle_frequency
+        # the state timers are the first values of the 32 bit block, which terminates the message
+        offset = len(message) - len(sma.build_message_32_bits())
+        self._state_indices = {name: sma.state_names.index(name) for name in state_names}
+        self._offsets = {name: offset + 4 * index for name, index in self._state_indices.items()}
+
+    def render(self, state_timers: dict[str, float]) -> tuple[StateMachine, bytes]:
+        """
+        Set the timers of the variable states.
+
+        Parameters
+        ----------
+        state_timers : dict[str, float]
+            The timers of the variable states in seconds, by state name.
+
+        Returns
+        -------
+        StateMachine
+            The state machine, to be passed to `run_state_machine`.
+        bytes
+            The serialized state machine, to be passed to `send_serialized_state_machine`.
+
+        Raises
+        ------
+        KeyError
+            If a state wasn't declared as variable when creating the template.
+        """
+        for name, timer in state_timers.items():
+            offset = self._offsets[name]
+            self._message[offset : offset + 4] = ArduinoTypes.get_uint32_array([timer * self._cycle_frequency])
+            self.sma.state_timers[self._state_indices[name]] = timer
+        self.sma.current_state = 0  # the state machine object is re-used: reset the state tracked by pybpod
+        return self.sma, bytes(self._message)
+
 
 class MyRotaryEncoder:
     def __init__(self, all_thresholds, gain, com, connect=False):
@@ -1,8 +1,11 @@
 import logging
+import queue
 import re
+import time
 from abc import ABC, abstractmethod
-from collections.abc import Generator
-from dataclasses import dataclass
+from collections.abc import Generator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import date
 from enum import IntEnum
 from inspect import isabstract
@@ -59,6 +62,29 @@ class Result:
     exception: Exception | None = None
 
 
+@dataclass
+class ValidatorReport:
+    """Dataclass holding the results and the wall time of a validator's run."""
+
+    validator: 'Validator'
+    results: list[Result] = field(default_factory=list)
+    success: bool | None = None
+    duration_s: float = 0.0
+
+    @property
+    def status(self) -> Status:
+        """Status: The overall status of the validation."""
+        statuses = [r.status for r in self.results]
+        if Status.SKIP in statuses:
+            return Status.SKIP
+        elif Status.FAIL in statuses:
+            return Status.FAIL
+        elif Status.WARN in statuses:
+            return Status.WARN
+        else:
+            return Status.PASS
+
+
 class ValidateHardwareError(Exception):
     def __init__(self, results: Result):
         super().__init__(results.message)
@@ -87,6 +113,24 @@ class Validator(ABC):
     def name(self) -> str:
         return getattr(self, '_name', self.__class__.__name__)
 
+    @property
+    def resources(self) -> set[str] | None:
+        """
+        The resources used exclusively by the validator, e.g., serial ports.
+
+        Validators with disjoint resources may run concurrently, see :func:`run_validators`. None denotes that the
+        validator must not run concurrently with any other validator.
+
+        Returns
+        -------
+        set[str] or None
+            The resources used by the validator.
+        """
+        return None
+
+    def _bpod_resources(self) -> set[str]:
+        return {port} if (port := self.hardware_settings.device_bpod.COM_BPOD) is not None else set()
+
     @abstractmethod
     def _run(self, *args, **kwargs) -> Generator[Result, None, bool]: ...
 
@@ -160,6 +204,10 @@ class ValidatorSerial(Validator):
     @abstractmethod
     def port(self) -> str | None: ...
 
+    @property
+    def resources(self) -> set[str] | None:
+        return {self.port} if self.port is not None else set()
+
     @property
     def port_info(self) -> ListPortInfo | None:
         return next(list_ports.grep(self.port), None) if self.port is not None else None
@@ -242,6 +290,10 @@ class ValidatorRotaryEncoderModule(ValidatorSerial):
     def port(self):
         return self.hardware_settings.device_rotary_encoder.COM_ROTARY_ENCODER
 
+    @property
+    def resources(self) -> set[str] | None:
+        return super().resources | self._bpod_resources()
+
     def _run(self):
         # invoke ValidateSerialDevice._run()
         success = yield from super()._run()
@@ -300,6 +352,10 @@ class ValidatorRotaryEncoderModule(ValidatorSerial):
 class ValidatorAmbientModule(Validator):
     _name = 'Bpod Ambient Module'
 
+    @property
+    def resources(self) -> set[str] | None:
+        return self._bpod_resources()
+
     def _run(self):
         # yield Bpod's connection status
         bpod = yield from self._get_bpod()
@@ -331,6 +387,10 @@ class ValidatorBpod(ValidatorSerial):
     def port(self):
         return self.hardware_settings.device_bpod.COM_BPOD
 
+    @property
+    def resources(self) -> set[str] | None:
+        return super().resources | self._bpod_resources()
+
     def _run(self):
         # close existing Bpod singleton
         if (bpod := Bpod._instances.get(self.hardware_settings.device_bpod.COM_BPOD, None)) is not None:  # noqa
@@ -410,6 +470,10 @@ class ValidatorBpod(ValidatorSerial):
 class ValidatorCamera(Validator):
     _name = 'Camera'
 
+    @property
+    def resources(self) -> set[str] | None:
+        return self._bpod_resources() | {'cameras'}
+
     def _run(self):
         if self.hardware_settings.device_cameras is None or (
             isinstance(self.hardware_settings.device_cameras, dict) and len(self.hardware_settings.device_cameras) == 0
@@ -484,6 +548,10 @@ class ValidatorCamera(Validator):
 class ValidatorAlyx(Validator):
     _name = 'Alyx'
 
+    @property
+    def resources(self) -> set[str] | None:
+        return set()
+
     def _run(self):
         # Validate ALYX_URL
         if self.iblrig_settings.ALYX_URL is None:
@@ -513,6 +581,10 @@ class ValidatorAlyx(Validator):
 class ValidatorValve(Validator):
     _name = 'Valve'
 
+    @property
+    def resources(self) -> set[str] | None:
+        return set()
+
     def _run(self):
         calibration_date = self.hardware_settings.device_valve.WATER_CALIBRATION_DATE
         today = date.today()
@@ -534,6 +606,10 @@ class ValidatorValve(Validator):
 class ValidatorMic(Validator):
     _name = 'Microphone'
 
+    @property
+    def resources(self) -> set[str] | None:
+        return {'audio'}
+
     def _run(self):
         if self.hardware_settings.device_microphone is None:
             yield Result(Status.SKIP, 'No workflow defined for microphone')
@@ -563,6 +639,10 @@ class ValidatorFrame2TTL(ValidatorSerial):
     def port(self):
         return self.hardware_settings.device_frame2ttl.COM_F2TTL
 
+    @property
+    def resources(self) -> set[str] | None:
+        return super().resources | self._bpod_resources() | {'gui'}
+
     def _run(self):
         # invoke ValidateSerialDevice._run()
         success = yield from super()._run()
@@ -647,6 +727,10 @@ class ValidatorFrame2TTL(ValidatorSerial):
 class ValidatorGit(Validator):
     _name = 'Git'
 
+    @property
+    def resources(self) -> set[str] | None:
+        return set()
+
     def _run(self):
         if not IS_GIT:
             yield Result(Status.SKIP, 'Your copy of IBLRIG is not managed through Git')
@@ -742,6 +826,10 @@ class ValidatorSound(ValidatorSerial):
             case _:
                 return None
 
+    @property
+    def resources(self) -> set[str] | None:
+        return super().resources | self._bpod_resources() | {'audio'}
+
     def _run(self):
         if (success := self.hardware_settings.device_sound.OUTPUT) == 'sysdefault':
             yield Result(
@@ -809,49 +897,148 @@ def get_all_validators() -> list[type[Validator]]:
     return [cast(type[Validator], x) for x in get_inheritors(Validator) if not isabstract(x)]
 
 
+def _resources_conflict(a: set[str] | None, b: set[str] | None) -> bool:
+    return a is None or b is None or len(a & b) > 0
+
+
+def _run_validator(index: int, validator: Validator, events: queue.Queue) -> None:
+    # runs in the worker threads of run_validators()
+    report = ValidatorReport(validator)
+    t0 = time.perf_counter()
+    try:
+        generator = validator.run()
+        while True:
+            try:
+                result = next(generator)
+            except StopIteration as e:
+                report.success = e.value
+                break
+            report.results.append(result)
+            events.put((index, result))
+    except Exception as e:
+        events.put((index, e))
+    report.duration_s = time.perf_counter() - t0
+    events.put((index, report))
+
+
+def run_validators(
+    validators: Sequence[Validator], max_workers: int | None = None
+) -> Generator[tuple[int, Result | ValidatorReport], None, list[ValidatorReport]]:
+    """
+    Run validators concurrently, streaming their results in order.
+
+    Validators whose resources (see :attr:`Validator.resources`) don't conflict run concurrently in a thread pool.
+    Validators sharing a resource run one after the other, in the order they were passed. The results are yielded in the
+    order of the validators: all results of a validator are yielded before those of the next one. Once all results of a
+    validator have been yielded, its :class:`ValidatorReport` is yielded, including the validator's wall time.
+
+    Parameters
+    ----------
+    validators : sequence of Validator
+        The validators to run.
+    max_workers : int, optional
+        The maximum number of validators running concurrently. Defaults to the number of validators.
+
+    Yields
+    ------
+    tuple[int, Result | ValidatorReport]
+        The index of the validator and one of its results or its report.
+
+    Returns
+    -------
+    list[ValidatorReport]
+        The reports of all validators.
+    """
+    n_validators = len(validators)
+    resources = [v.resources for v in validators]
+    events: queue.Queue = queue.Queue()
+    buffers: list[list[Result | ValidatorReport]] = [[] for _ in range(n_validators)]
+    pending = list(range(n_validators))
+    running: set[int] = set()
+    reports: list[ValidatorReport] = []
+    current = 0
+    with ThreadPoolExecutor(max_workers=max_workers or max(n_validators, 1), thread_name_prefix='validator') as executor:
+        while current < n_validators:
+            # start the pending validators that conflict neither with running ones nor with preceding pending ones
+            for index in list(pending):
+                blocking = [i for i in pending if i < index] + list(running)
+                if not any(_resources_conflict(resources[index], resources[i]) for i in blocking):
+                    pending.remove(index)
+                    running.add(index)
+                    executor.submit(_run_validator, index, validators[index], events)
+
+            # collect the next event, then yield the buffered events of the validators in order
+            index, event = events.get()
+            buffers[index].append(event)
+            if isinstance(event, ValidatorReport):
+                running.discard(index)
+            while current < n_validators and len(buffers[current]) > 0:
+                event = buffers[current].pop(0)
+                if isinstance(event, Exception):
+                    raise event
+                yield current, event
+                if isinstance(event, ValidatorReport):
+                    reports.append(event)
+                    current += 1
+    return reports
+
+
 def run_all_validators(
     iblrig_settings: RigSettings | None = None, hardware_settings: HardwareSettings | None = None, interactive: bool = False
 ) -> Generator[Result, None, None]:
-    validators = get_all_validators()
-    for validator in validators:
-        yield from validator(iblrig_settings=iblrig_settings, hardware_settings=hardware_settings, interactive=interactive).run()
+    validators = [
+        validator(iblrig_settings=iblrig_settings, hardware_settings=hardware_settings, interactive=interactive)
+        for validator in get_all_validators()
+    ]
+    for _, event in run_validators(validators):
+        if isinstance(event, Result):
+            yield event
 
 
 def run_all_validators_cli():
-    validators = get_all_validators()
     hardware_settings = load_pydantic_yaml(HardwareSettings)
     iblrig_settings = load_pydantic_yaml(RigSettings)
+    validators = [
+        validator(hardware_settings=hardware_settings, iblrig_settings=iblrig_settings, interactive=True)
+        for validator in get_all_validators()
+    ]
     fail = 0
     warn = 0
-    for validator in validators:
-        v = validator(hardware_settings=hardware_settings, iblrig_settings=iblrig_settings, interactive=True)
-        print(f'{ANSI.BOLD + ANSI.UNDERLINE + v.name + ANSI.END}')
-        for result in v.run():
-            match result.status:
-                case Status.PASS:
-                    color = ANSI.GREEN
-                    symbol = '✓'
-                case Status.FAIL:
-                    color = ANSI.RED + ANSI.BOLD
-                    fail += 1
-                    symbol = '✗'
-                case Status.WARN:
-                    color = ANSI.YELLOW + ANSI.BOLD
-                    warn += 1
-                    symbol = '!'
-                case Status.INFO:
-                    color = ANSI.BLUE
-                    symbol = 'i'
-                case Status.SKIP:
-                    color = ANSI.WHITE
-                    symbol = '∅'
-                case _:
-                    color = ANSI.END
-                    symbol = '?'
-            print(f'{color}  {symbol}  {result.message}{ANSI.END}')
-            if result.solution is not None and len(result.solution) > 0:
-                print(f'{color}     Suggestion: {result.solution}{ANSI.END}')
-        print('')
+    t0 = time.perf_counter()
+    current = -1
+    for index, result in run_validators(validators):
+        if index != current:
+            current = index
+            print(f'{ANSI.BOLD + ANSI.UNDERLINE + validators[index].name + ANSI.END}')
+        if isinstance(result, ValidatorReport):
+            print(f'{ANSI.WHITE}     ({result.duration_s:.1f} s){ANSI.END}')
+            print('')
+            continue
+        match result.status:
+            case Status.PASS:
+                color = ANSI.GREEN
+                symbol = '✓'
+            case Status.FAIL:
+                color = ANSI.RED + ANSI.BOLD
+                fail += 1
+                symbol = '✗'
+            case Status.WARN:
+                color = ANSI.YELLOW + ANSI.BOLD
+                warn += 1
+                symbol = '!'
+            case Status.INFO:
+                color = ANSI.BLUE
+                symbol = 'i'
+            case Status.SKIP:
+                color = ANSI.WHITE
+                symbol = '∅'
+            case _:
+                color = ANSI.END
+                symbol = '?'
+        print(f'{color}  {symbol}  {result.message}{ANSI.END}')
+        if result.solution is not None and len(result.solution) > 0:
+            print(f'{color}     Suggestion: {result.solution}{ANSI.END}')
+    print(f'Validated {len(validators)} components in {time.perf_counter() - t0:.1f} s.')
     if fail > 0:
         print(ANSI.RED + ANSI.BOLD + f'{fail} validation{"s" if fail > 1 else ""} failed.')
     if warn > 0:
@@ -1,5 +1,10 @@
+import hashlib
+import json
 import logging
+import time
+from collections.abc import Callable
 from dataclasses import dataclass
+from pathlib import Path
 
 import numpy as np
 from pydantic import validate_call
@@ -20,6 +25,19 @@ class _HiFiInfo:
     max_envelope_size: int
 
 
+@dataclass
+class HiFiLoadStats:
+    """Statistics of the upload of a waveform to the HiFi module."""
+
+    n_bytes: int
+    duration_s: float
+    n_retries: int = 0
+
+    @property
+    def throughput_bytes_per_s(self) -> float:
+        return self.n_bytes / self.duration_s if self.duration_s > 0 else float('inf')
+
+
 class HiFiException(SerialSingletonException):
     pass
 
@@ -96,9 +114,8 @@ class HiFi(SerialSingleton):
     def max_envelope_samples(self) -> int:
         return self._info.max_envelope_size
 
-    def load(self, index: int, data: np.ndarray[float | int], loop_mode: bool = False, loop_duration: int = 0) -> None:
+    def _format_waveform(self, data: np.ndarray[float | int]) -> np.ndarray:
         assert 1 <= data.ndim <= 2
-        assert 0 <= index < self._info.max_waves
 
         # ensure correct orientation of data
         if data.ndim == 1:
@@ -106,15 +123,108 @@ class HiFi(SerialSingleton):
         if data.shape[1] >= 2 >= data.shape[0] > 0:
             data = data.transpose()
 
-        # convert from float
-        if data.dtype == float:
+        # convert from float - the samples are scaled directly into a C-contiguous integer array, without intermediate copies
+        if np.issubdtype(data.dtype, np.floating):
             # assert -1 <= data.min() <= 0 <= data.max() <= 1
             if self._info.bit_depth == 16:
-                data = (data * np.iinfo(np.int16).max).astype(np.int16)
+                dtype = np.int16
             elif self._info.bit_depth == 32:
-                data = (data * np.iinfo(np.int32).max).astype(np.int32)
+                dtype = np.int32
             else:
                 raise NotImplementedError
+            out = np.empty(data.shape, dtype=dtype)
+            np.multiply(data, np.iinfo(dtype).max, out=out, casting='unsafe')
+            return out
+        return np.ascontiguousarray(data)
+
+    def _wait_for_output_buffer(self, max_pending: int, timeout_s: float) -> bool:
+        deadline = time.monotonic() + timeout_s
+        while self.out_waiting > max_pending:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.001)
+        return True
+
+    def _write_chunked(
+        self,
+        buffer: memoryview,
+        chunk_size: int,
+        *,
+        progress_callback: Callable[[int, int], None] | None = None,
+        stall_timeout_s: float = 1.0,
+        max_retries: int = 3,
+    ) -> int:
+        # Chunks are only written once the OS output buffer has drained (pending bytes <= chunk size), so that the writes
+        # don't block. If the device stalls, nothing is written while waiting: the upload resumes at the exact byte offset.
+        n_bytes = buffer.nbytes
+        offset = 0
+        n_stalls = 0
+        n_retries = 0
+        while offset < n_bytes:
+            if not self._wait_for_output_buffer(max_pending=chunk_size, timeout_s=stall_timeout_s):
+                n_stalls += 1
+                if n_stalls > max_retries:
+                    raise HiFiException(f'Serial write to {self.portstr} stalled at byte {offset} of {n_bytes}')
+                n_retries += 1
+                log.warning(f'Serial write stalled at byte {offset} of {n_bytes} - retrying ({n_stalls}/{max_retries})')
+                continue
+            offset += self.write(buffer[offset : offset + chunk_size]) or 0
+            n_stalls = 0
+            if progress_callback is not None:
+                progress_callback(offset, n_bytes)
+        return n_retries
+
+    def load(
+        self,
+        index: int,
+        data: np.ndarray[float | int],
+        loop_mode: bool = False,
+        loop_duration: int = 0,
+        *,
+        chunk_size: int = 32768,
+        progress_callback: Callable[[int, int], None] | None = None,
+        stall_timeout_s: float = 1.0,
+        max_retries: int = 3,
+    ) -> HiFiLoadStats:
+        """
+        Load a waveform to the module.
+
+        The samples are written to the serial port in chunks, directly from the integer sample buffer.
+
+        Parameters
+        ----------
+        index : int
+            The waveform's index on the module.
+        data : np.ndarray
+            The waveform, with shape (n_samples,) for mono or (n_samples, 2) for stereo. Floating point samples in the
+            range -1 to 1 are scaled to the bit depth of the module.
+        loop_mode : bool, optional
+            Whether to loop the waveform. Defaults to False.
+        loop_duration : int, optional
+            The duration of the loop, in samples. Defaults to 0.
+        chunk_size : int, optional
+            The number of bytes written per chunk. Defaults to 32768.
+        progress_callback : callable, optional
+            A function called with the number of bytes written so far and the total number of bytes after each chunk.
+        stall_timeout_s : float, optional
+            The time to wait for the serial output buffer to drain before a chunk is considered stalled. Defaults to 1 s.
+        max_retries : int, optional
+            The maximum number of consecutive stalls before the upload is aborted. Defaults to 3.
+
+        Returns
+        -------
+        HiFiLoadStats
+            The number of bytes written, the duration of the upload and the number of retries.
+
+        Raises
+        ------
+        HiFiException
+            If the upload stalled more than `max_retries` times in a row.
+        RuntimeError
+            If the waveform is too long or the module didn't acknowledge the upload.
+        """
+        assert 0 <= index < self._info.max_waves
+        data = self._format_waveform(data)
 
         # get array dimensions
         n_samples, n_channels = data.shape
@@ -127,9 +237,75 @@ class HiFi(SerialSingleton):
         is_stereo = n_channels == 2
 
         log.debug(f'Loading {n_samples} {"stereo" if is_stereo else "mono"} samples to slot #{index}')
+        t0 = time.perf_counter()
         self.write_packed('<cB??II', b'L', index, is_stereo, loop_mode, loop_duration, n_samples)
-        if not self.query(data) == b'\x01':
+        buffer = memoryview(data).cast('B')
+        n_retries = self._write_chunked(
+            buffer, chunk_size, progress_callback=progress_callback, stall_timeout_s=stall_timeout_s, max_retries=max_retries
+        )
+        if not self.read() == b'\x01':
             raise RuntimeError('Error loading data')
+        stats = HiFiLoadStats(n_bytes=buffer.nbytes, duration_s=time.perf_counter() - t0, n_retries=n_retries)
+        log.debug(f'Loaded {stats.n_bytes} bytes in {stats.duration_s:.3f} s ({stats.throughput_bytes_per_s / 1e6:.2f} MB/s)')
+        return stats
+
+    def load_waveforms(self, waveforms: dict[int, np.ndarray], record_file: str | Path | None = None) -> bool:
+        """
+        Load waveforms to the module and push them to the playback buffers.
+
+        If a `record_file` is passed, the upload is skipped if the same waveforms have been uploaded to this device at the
+        same sampling rate before. The record file maps each device's serial number (or port) to a digest of the waveforms
+        last uploaded to it.
+
+        Note that the module doesn't retain its waveforms when it is powered off. The record cannot detect this.
+
+        Parameters
+        ----------
+        waveforms : dict[int, np.ndarray]
+            The waveforms, keyed by their index on the module. See :meth:`load`.
+        record_file : str or Path, optional
+            A JSON file recording the waveforms uploaded to each device.
+
+        Returns
+        -------
+        bool
+            True if the waveforms have been uploaded, False if the upload was skipped.
+        """
+        waveforms = {index: self._format_waveform(data) for index, data in sorted(waveforms.items())}
+        digest = hashlib.sha1(f'{self.sampling_rate_hz} {self.bit_depth}'.encode())
+        for index, data in waveforms.items():
+            digest.update(f'{index} {data.shape} {data.dtype.str}'.encode())
+            digest.update(np.ascontiguousarray(data).data)
+        device_id = getattr(self.port_info, 'serial_number', None) or self.port
+
+        record = {}
+        if record_file is not None:
+            record_file = Path(record_file)
+            try:
+                record = json.loads(record_file.read_text())
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as e:
+                log.warning(f'Could not read {record_file.name}: {e}')
+            if record.get(device_id) == digest.hexdigest():
+                log.debug('Waveforms are already loaded - skipping upload')
+                return False
+            # invalidate the record while uploading
+            if record.pop(device_id, None) is not None:
+                record_file.write_text(json.dumps(record))
+
+        for index, data in waveforms.items():
+            self.load(index, data)
+        self.push()
+
+        if record_file is not None:
+            record[device_id] = digest.hexdigest()
+            try:
+                record_file.parent.mkdir(parents=True, exist_ok=True)
+                record_file.write_text(json.dumps(record))
+            except OSError as e:
+                log.warning(f'Could not write {record_file.name}: {e}')
+        return True
 
     def push(self) -> bool:
         log.debug('Pushing waveforms to playback buffers')
@@ -10,6 +10,7 @@ import argparse
 import datetime
 import logging
 from collections.abc import Sequence
+from functools import lru_cache
 from pathlib import Path
 from typing import Literal
 
@@ -143,7 +144,14 @@ def get_port_events(events: dict, name: str = '') -> list:
     return out
 
 
-def truncated_exponential(scale: float = 0.35, min_value: float = 0.2, max_value: float = 0.5) -> float:
+def truncated_exponential(
+    scale: float = 0.35,
+    min_value: float = 0.2,
+    max_value: float = 0.5,
+    *,
+    size: int | tuple[int, ...] | None = None,
+    rng: np.random.Generator | None = None,
+) -> float | np.ndarray:
     """
     Generate a truncated exponential random variable within a specified range.
 
@@ -155,28 +163,34 @@ def truncated_exponential(scale: float = 0.35, min_value: float = 0.2, max_value
         Minimum value for the truncated range. Defaults to 0.2.
     max_value : float, optional
         Maximum value for the truncated range. Defaults to 0.5.
+    size : int or tuple of int, optional
+        Output shape. If None (default), a single value is returned.
+    rng : numpy.random.Generator, optional
+        Random number generator. Defaults to NumPy's global random state.
 
     Returns
     -------
-    float
-        Truncated exponential random variable.
+    float or np.ndarray
+        Truncated exponential random variable(s).
+
+    Raises
+    ------
+    ValueError
+        If `scale` is not positive or the range `[min_value, max_value]` does not intersect the support of the
+        distribution.
 
     Notes
     -----
-    This function generates a random variable from an exponential distribution
-    with the specified `scale`. It then checks if the generated value is within
-    the specified range `[min_value, max_value]`. If it is within the range, it returns
-    the generated value; otherwise, it recursively generates a new value until it falls
-    within the specified range.
-
-    The `scale` should typically be greater than or equal to the `min_value` to avoid
-    potential issues with infinite recursion.
+    The values are drawn by inverse transform sampling of the exponential distribution with the specified `scale`,
+    conditioned on the range `[min_value, max_value]`. This is equivalent to drawing from the exponential distribution
+    until a value falls within the range, without the cost of rejected draws.
     """
-    x = np.random.exponential(scale)
-    if min_value <= x <= max_value:
-        return x
-    else:
-        return truncated_exponential(scale, min_value, max_value)
+    min_value = max(min_value, 0)
+    if scale <= 0 or max_value < min_value:
+        raise ValueError('`scale` must be positive and `max_value` must not be smaller than `min_value` or 0.')
+    u = (np.random if rng is None else rng).random(size)
+    # the CDF of the truncated distribution is (1 - exp(-(x - min_value) / scale)) / (1 - exp(-(max_value - min_value) / scale))
+    return min_value - scale * np.log1p(u * np.expm1(-(max_value - min_value) / scale))
 
 
 def get_biased_probs(n: int, idx: int = -1, p_idx: float = 0.5) -> list[float]:
@@ -220,12 +234,30 @@ def get_biased_probs(n: int, idx: int = -1, p_idx: float = 0.5) -> list[float]:
     return p
 
 
+@lru_cache
+def _contrast_cdf(
+    contrast_set: tuple[float, ...], probability_type: str, idx: int, idx_probability: float
+) -> tuple[np.ndarray, np.ndarray]:
+    # cumulative probability table used by draw_contrast
+    if probability_type in ['skew_zero', 'biased']:
+        p = get_biased_probs(n=len(contrast_set), idx=idx, p_idx=idx_probability)
+    elif probability_type == 'uniform':
+        p = np.ones(len(contrast_set)) / len(contrast_set)
+    else:
+        raise ValueError("Unsupported probability_type. Use 'skew_zero', 'biased', or 'uniform'.")
+    cdf = np.cumsum(p)
+    return np.array(contrast_set), cdf / cdf[-1]
+
+
 def draw_contrast(
     contrast_set: list[float],
     probability_type: Literal['skew_zero', 'biased', 'uniform'] = 'biased',
     idx: int = -1,
     idx_probability: float = 0.5,
-) -> float:
+    *,
+    size: int | tuple[int, ...] | None = None,
+    rng: np.random.Generator | None = None,
+) -> float | np.ndarray:
     """
     Draw a contrast value from a given iterable based to the specified probability type.
 
@@ -242,24 +274,28 @@ def draw_contrast(
         Index for probability manipulation (with "skew_zero" or "biased"), default: -1.
     idx_probability : float, optional
         Probability for the specified index (with "skew_zero" or "biased"), default: 0.5.
+    size : int or tuple of int, optional
+        Output shape. If None (default), a single value is returned.
+    rng : numpy.random.Generator, optional
+        Random number generator. Defaults to NumPy's global random state.
 
     Returns
     -------
-    float
-        The drawn contrast value.
+    float or np.ndarray
+        The drawn contrast value(s).
 
     Raises
     ------
     ValueError
         If an unsupported `probability_type` is provided.
+
+    Notes
+    -----
+    The cumulative probabilities are cached for each combination of arguments.
     """
-    if probability_type in ['skew_zero', 'biased']:
-        p = get_biased_probs(n=len(contrast_set), idx=idx, p_idx=idx_probability)
-        return np.random.choice(contrast_set, p=p)
-    elif probability_type == 'uniform':
-        return np.random.choice(contrast_set)
-    else:
-        raise ValueError("Unsupported probability_type. Use 'skew_zero', 'biased', or 'uniform'.")
+    values, cdf = _contrast_cdf(tuple(contrast_set), probability_type, idx, idx_probability)
+    u = (np.random if rng is None else rng).random(size)
+    return values[np.searchsorted(cdf, u, side='right')]
 
 
 def online_std(new_sample: float, new_count: int, old_mean: float, old_std: float) -> tuple[float, float]:
@@ -287,3 +323,104 @@ def online_std(new_sample: float, new_count: int, old_mean: float, old_std: floa
     new_mean = (old_mean * (new_count - 1) + new_sample) / new_count
     new_std = np.sqrt((old_std**2 * (new_count - 1) + (new_sample - old_mean) * (new_sample - new_mean)) / new_count)
     return new_mean, new_std
+
+
+class StreamingQuantile:
+    """
+    Estimate a quantile of a stream of values in constant time and memory.
+
+    This implements the P² algorithm (Jain & Chlamtac, 1985) which keeps track of five markers whose heights are
+    adjusted with a piecewise-parabolic interpolation as samples come in. The estimate is exact for up to five samples.
+    NaN values are ignored.
+
+    Examples
+    --------
+    >>> median = StreamingQuantile(0.5)
+    >>> for value in np.random.rand(1000):
+    ...     median.update(value)
+    >>> median.value
+    """
+
+    def __init__(self, q: float = 0.5):
+        """
+        Estimate a quantile of a stream of values in constant time and memory.
+
+        Parameters
+        ----------
+        q : float, optional
+            The quantile to estimate, between 0 and 1. Defaults to 0.5 (median).
+        """
+        if not 0 <= q <= 1:
+            raise ValueError('q must be between 0 and 1')
+        self.q = q
+        self.count = 0
+        self._heights: list[float] = []
+        self._positions = [0, 1, 2, 3, 4]
+        self._desired = [0, 2 * q, 4 * q, 2 + 2 * q, 4]
+        self._increments = [0, q / 2, q, (1 + q) / 2, 1]
+
+    @property
+    def value(self) -> float:
+        """float: The current estimate of the quantile, NaN if no samples have been added."""
+        if self.count == 0:
+            return np.nan
+        if self.count < 5:
+            return float(np.quantile(self._heights, self.q))
+        return self._heights[2]
+
+    def extend(self, values: Sequence[float] | np.ndarray) -> None:
+        """
+        Add several samples.
+
+        Parameters
+        ----------
+        values : array-like
+            The new samples.
+        """
+        for value in values:
+            self.update(value)
+
+    def update(self, value: float) -> None:
+        """
+        Add a single sample.
+
+        Parameters
+        ----------
+        value : float
+            The new sample.
+        """
+        if np.isnan(value):
+            return
+        h, n = self._heights, self._positions
+        self.count += 1
+        if self.count <= 5:
+            h.append(float(value))
+            h.sort()
+            return
+        # find the cell k containing the new sample and adjust the extreme markers
+        if value < h[0]:
+            h[0] = float(value)
+            k = 0
+        elif value >= h[4]:
+            h[4] = float(value)
+            k = 3
+        else:
+            k = next(i for i in range(4) if h[i] <= value < h[i + 1])
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+        # adjust the heights of the middle markers if necessary
+        for i in range(1, 4):
+            d = self._desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                parabolic = h[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (h[i + 1] - h[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (h[i] - h[i - 1]) / (n[i] - n[i - 1])
+                )
+                if h[i - 1] < parabolic < h[i + 1]:
+                    h[i] = parabolic
+                else:
+                    h[i] = h[i] + d * (h[i + d] - h[i]) / (n[i + d] - n[i])
+                n[i] += d
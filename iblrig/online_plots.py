@@ -1,23 +1,28 @@
 import datetime
 import json
 import logging
+import select
+import socket
 import time
 from pathlib import Path
+from typing import Any
 
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import seaborn as sns
-from pandas.api.types import CategoricalDtype
 
 import one.alf.io
 from iblrig.choiceworld import get_subject_training_info
-from iblrig.misc import online_std
-from iblrig.raw_data_loaders import load_task_jsonable
+from iblrig.constants import ONLINE_PLOTS_PORT
+from iblrig.misc import StreamingQuantile
+from iblrig.raw_data_loaders import JsonableReader, load_task_jsonable, states_timestamps_array
 from iblutil.util import Bunch
 
 NTRIALS_INIT = 2000
 NTRIALS_PLOT = 20  # do not edit - this is used also to enforce the completion criteria
+GUI_REFRESH_SECS = 0.05  # maximum time between processing GUI events while waiting for new trials
+POLLING_SECS = 0.4  # polling interval of the new trial flag file
 CONTRAST_SET = np.array([0, 1 / 16, 1 / 8, 1 / 4, 1 / 2, 1])  # used as a default if instantiated without settings
 PROBABILITY_SET = np.array([0.2, 0.5, 0.8])  # used as a default if instantiated without settings
 # if the mouse does less than 400 trials in the first 45mins it's disengaged
@@ -31,10 +36,12 @@ class DataModel:
     """
     The data model is a pure numpy / pandas container for the choice world task.
     It contains:
-    - a psychometrics dataframe that contains the count / choice and response time
-    per signed contrast and block contingency
-    - a last trials dataframe that contains 20 trials worth of data for the timeline view
+    - dense count / mean / M2 arrays of the choice and response time per block contingency (rows) and signed contrast
+      (columns), exposed as the psychometrics dataframe
+    - a ring buffer that contains 20 trials worth of data for the timeline view, exposed as the last trials dataframe
     - various counters such as ntrials and water delivered
+
+    The cost of updating the model with a single trial does not depend on the number of trials.
     """
 
     task_settings = None
@@ -48,13 +55,11 @@ class DataModel:
     percent_error = np.nan
     water_delivered = 0.0
     time_elapsed = 0.0
+    LAST_TRIALS_COLUMNS = ('correct', 'signed_contrast', 'stim_on', 'play_tone', 'reward_time', 'error_time', 'response_time')
+    PSYCHOMETRICS_COLUMNS = ('count', 'response_time', 'choice', 'response_time_std', 'choice_std')
 
     def __init__(self, settings_file: Path | None):
         self.session_path = one.alf.files.get_session_path(settings_file) or ''
-        self.last_trials = pd.DataFrame(
-            columns=['correct', 'signed_contrast', 'stim_on', 'play_tone', 'reward_time', 'error_time', 'response_time'],
-            index=np.arange(NTRIALS_PLOT),
-        )
         if settings_file is not None and settings_file.exists():
             # most of the IBL tasks have a predefined set of probabilities (0.2, 0.5, 0.8), but in the
             # case of the advanced choice world task, the probabilities are defined in the task settings
@@ -68,25 +73,20 @@ class DataModel:
                 f'Settings file not found - using default probabilities {self.probability_set} and contrasts {CONTRAST_SET}'
             )
 
-        # instantiate the psychometrics dataframe
-        signed_contrasts = np.r_[-np.flipud(np.unique(np.abs(self.contrast_set))[1:]), np.unique(np.abs(self.contrast_set))]
-        self.psychometrics = pd.DataFrame(
-            columns=['count', 'response_time', 'choice', 'response_time_std', 'choice_std'],
-            index=pd.MultiIndex.from_product([self.probability_set, signed_contrasts]),
-        )
-        self.psychometrics['count'] = 0
-        self.trials_table = pd.DataFrame(columns=['response_time'], index=np.arange(NTRIALS_INIT))
-
-        # for the trials plots this is the background image showing green if correct, red if incorrect
-        self.rgb_background = np.ones((NTRIALS_PLOT, 1, 3), dtype=np.uint8) * 229
-        self.rgb_background[self.last_trials.correct == False, 0, 0] = 255  # noqa
-        self.rgb_background[self.last_trials.correct == True, 0, 1] = 255  # noqa
-        # keep the last contrasts as a 20 by 2 array
-        ileft = np.where(self.last_trials.signed_contrast < 0)[0]  # negative position is left
-        iright = np.where(self.last_trials.signed_contrast > 0)[0]
-        self.last_contrasts = np.zeros((NTRIALS_PLOT, 2))
-        self.last_contrasts[ileft, 0] = np.abs(self.last_trials.signed_contrast[ileft])
-        self.last_contrasts[iright, 1] = np.abs(self.last_trials.signed_contrast[iright])
+        # instantiate the psychometrics arrays: one row per block probability, one column per signed contrast
+        self.signed_contrasts = np.r_[-np.flipud(np.unique(np.abs(self.contrast_set))[1:]), np.unique(np.abs(self.contrast_set))]
+        self._iprobability = {p: i for i, p in enumerate(self.probability_set)}
+        self._icontrast = {c: i for i, c in enumerate(self.signed_contrasts)}
+        shape = (len(self.probability_set), self.signed_contrasts.size)
+        self.count = np.zeros(shape, dtype=int)
+        self.response_time_count = np.zeros(shape, dtype=int)  # trials with a response time
+        self.response_time_mean, self.response_time_m2 = np.full(shape, np.nan), np.zeros(shape)
+        self.choice_mean, self.choice_m2 = np.full(shape, np.nan), np.zeros(shape)
+        self.response_time_median = StreamingQuantile(0.5)
+
+        # ring buffer holding the last trials, self._ilast points to the oldest trial
+        self._last = {k: np.full(NTRIALS_PLOT, np.nan) for k in self.LAST_TRIALS_COLUMNS}
+        self._ilast = 0
 
     def update_trial(self, trial_data, bpod_data) -> None:
         # update counters
@@ -94,55 +94,218 @@ class DataModel:
         if self.time_elapsed <= (ENGAGED_CRITIERION['secs']):
             self.ntrials_engaged += 1
         self.ntrials += 1
-        self.water_delivered += trial_data.reward_amount
-        self.ntrials_correct += trial_data.trial_correct
+        self.water_delivered += trial_data['reward_amount']
+        self.ntrials_correct += trial_data['trial_correct']
         signed_contrast = np.sign(trial_data['position']) * trial_data['contrast']
-        choice = trial_data.position > 0 if trial_data.trial_correct else trial_data.position < 0
-        self.trials_table.at[self.ntrials, 'response_time'] = trial_data.response_time
-
-        # update psychometrics using online statistics method
-        indexer = (trial_data.stim_probability_left, signed_contrast)
-        if indexer not in self.psychometrics.index:
-            self.psychometrics.loc[indexer, :] = np.NaN
-            self.psychometrics.loc[indexer, ('count')] = 0
-        self.psychometrics.loc[indexer, ('count')] += 1
-        self.psychometrics.loc[indexer, ('response_time')], self.psychometrics.loc[indexer, ('response_time_std')] = online_std(
-            new_sample=trial_data.response_time,
-            new_count=self.psychometrics.loc[indexer, ('count')],
-            old_mean=self.psychometrics.loc[indexer, ('response_time')],
-            old_std=self.psychometrics.loc[indexer, ('response_time_std')],
-        )
-        self.psychometrics.loc[indexer, ('choice')], self.psychometrics.loc[indexer, ('choice_std')] = online_std(
-            new_sample=float(choice),
-            new_count=self.psychometrics.loc[indexer, ('count')],
-            old_mean=self.psychometrics.loc[indexer, ('choice')],
-            old_std=self.psychometrics.loc[indexer, ('choice_std')],
-        )
-        # update last trials table
-        self.last_trials = self.last_trials.shift(-1)
-        i = NTRIALS_PLOT - 1
-        self.last_trials.at[i, 'correct'] = trial_data.trial_correct
-        self.last_trials.at[i, 'signed_contrast'] = signed_contrast
-        self.last_trials.at[i, 'stim_on'] = bpod_data['States timestamps'].get('stim_on', [[np.nan]])[0][0]
-        self.last_trials.at[i, 'play_tone'] = bpod_data['States timestamps'].get('play_tone', [[np.nan]])[0][0]
-        self.last_trials.at[i, 'reward_time'] = bpod_data['States timestamps'].get('reward', [[np.nan]])[0][0]
-        self.last_trials.at[i, 'error_time'] = bpod_data['States timestamps'].get('error', [[np.nan]])[0][0]
-        self.last_trials.at[i, 'response_time'] = trial_data.response_time
-        # update rgb image
-        self.rgb_background = np.roll(self.rgb_background, -1, axis=0)
-        self.rgb_background[-1] = np.array([0, 255, 0]) if trial_data.trial_correct else np.array([255, 0, 0])
-        # update contrasts
-        self.last_contrasts = np.roll(self.last_contrasts, -1, axis=0)
-        self.last_contrasts[-1, :] = 0
-        self.last_contrasts[-1, int(self.last_trials.signed_contrast.iloc[-1] > 0)] = abs(
-            self.last_trials.signed_contrast.iloc[-1]
+        choice = trial_data['position'] > 0 if trial_data['trial_correct'] else trial_data['position'] < 0
+        response_time = trial_data['response_time']
+        self.response_time_median.update(response_time)
+
+        # update psychometrics using Welford's online algorithm, trials without a response time are skipped for the latter
+        i, j = self._psychometrics_bin(trial_data['stim_probability_left'], signed_contrast)
+        samples = [(self.count, self.choice_mean, self.choice_m2, float(choice))]
+        if not np.isnan(response_time):
+            samples.append((self.response_time_count, self.response_time_mean, self.response_time_m2, response_time))
+        for count, mean, m2, sample in samples:
+            count[i, j] += 1
+            n = count[i, j]
+            if n == 1:
+                mean[i, j], m2[i, j] = sample, 0.0
+                continue
+            delta = sample - mean[i, j]
+            mean[i, j] += delta / n
+            m2[i, j] += delta * (sample - mean[i, j])
+
+        # update last trials ring buffer
+        states = bpod_data['States timestamps']
+        for key, value in (
+            ('correct', trial_data['trial_correct']),
+            ('signed_contrast', signed_contrast),
+            ('stim_on', states.get('stim_on', [[np.nan]])[0][0]),
+            ('play_tone', states.get('play_tone', [[np.nan]])[0][0]),
+            ('reward_time', states.get('reward', [[np.nan]])[0][0]),
+            ('error_time', states.get('error', [[np.nan]])[0][0]),
+            ('response_time', response_time),
+        ):
+            self._last[key][self._ilast] = value
+        self._ilast = (self._ilast + 1) % NTRIALS_PLOT
+        self.ntrials_nan = self.ntrials if self.ntrials > 0 else np.nan
+        self.percent_correct = self.ntrials_correct / self.ntrials_nan * 100
+
+    def update_trials(self, trials_table: pd.DataFrame, bpod_data: list[dict[str, Any]]) -> None:
+        """
+        Update the model with a batch of trials.
+
+        Equivalent to calling :meth:`update_trial` for each trial: the psychometrics of the batch are aggregated with
+        :func:`numpy.bincount` and merged with those of the previous trials, and only the state timestamps of the last
+        trials are read.
+
+        Parameters
+        ----------
+        trials_table : pandas.DataFrame
+            The trials table of the batch.
+        bpod_data : list of dict
+            Timing data of each trial of the batch, as returned by :func:`iblrig.raw_data_loaders.load_task_jsonable`.
+        """
+        ntrials = len(bpod_data)
+        if ntrials == 0:
+            return
+        # update counters
+        time_elapsed = np.array([bd['Trial end timestamp'] - bd['Bpod start timestamp'] for bd in bpod_data])
+        self.time_elapsed = time_elapsed[-1]
+        self.ntrials_engaged += int(np.sum(time_elapsed <= ENGAGED_CRITIERION['secs']))
+        self.ntrials += ntrials
+        self.water_delivered += float(trials_table['reward_amount'].sum())
+        correct = trials_table['trial_correct'].to_numpy(dtype=bool)
+        position = trials_table['position'].to_numpy(dtype=float)
+        self.ntrials_correct += int(np.sum(correct))
+        signed_contrast = np.sign(position) * trials_table['contrast'].to_numpy(dtype=float)
+        choice = np.where(correct, position > 0, position < 0).astype(float)
+        response_time = trials_table['response_time'].to_numpy(dtype=float)
+        self.response_time_median.extend(response_time)
+
+        # update psychometrics: add missing rows and columns first, as inserting columns shifts the bins
+        pairs, inverse = np.unique(
+            np.c_[trials_table['stim_probability_left'].to_numpy(dtype=float), signed_contrast], axis=0, return_inverse=True
         )
+        for probability_left, contrast in pairs:
+            self._psychometrics_bin(probability_left, contrast)
+        bins = np.array([self._psychometrics_bin(probability_left, contrast) for probability_left, contrast in pairs])
+        ibin = np.ravel_multi_index(bins[inverse.reshape(-1)].T, self.count.shape)
+        has_response_time = ~np.isnan(response_time)
+        for name, ivalid, samples in (
+            ('response_time', has_response_time, response_time[has_response_time]),
+            ('choice', np.ones(ntrials, dtype=bool), choice),
+        ):
+            previous = self.response_time_count if name == 'response_time' else self.count
+            mean, m2 = getattr(self, f'{name}_mean'), getattr(self, f'{name}_m2')
+            count = np.bincount(ibin[ivalid], minlength=previous.size)
+            batch_mean = np.bincount(ibin[ivalid], weights=samples, minlength=previous.size) / np.maximum(count, 1)
+            batch_m2 = np.bincount(ibin[ivalid], weights=(samples - batch_mean[ibin[ivalid]]) ** 2, minlength=previous.size)
+            count, batch_mean, batch_m2 = (x.reshape(previous.shape) for x in (count, batch_mean, batch_m2))
+            # merge with the previous trials (parallel variant of Welford's algorithm)
+            total = previous + count
+            iok = count > 0
+            delta = batch_mean - np.nan_to_num(mean)
+            m2[iok] += batch_m2[iok] + delta[iok] ** 2 * previous[iok] * count[iok] / total[iok]
+            mean[iok] = (np.nan_to_num(mean[iok]) * previous[iok] + batch_mean[iok] * count[iok]) / total[iok]
+            previous += count
+
+        # update last trials ring buffer
+        nlast = min(ntrials, NTRIALS_PLOT)
+        ilast = (self._ilast + np.arange(ntrials - nlast, ntrials)) % NTRIALS_PLOT
+        timestamps, _ = states_timestamps_array(bpod_data[-nlast:], ['stim_on', 'play_tone', 'reward', 'error'])
+        for key, values in (
+            ('correct', correct),
+            ('signed_contrast', signed_contrast),
+            ('stim_on', timestamps[:, 0, 0]),
+            ('play_tone', timestamps[:, 1, 0]),
+            ('reward_time', timestamps[:, 2, 0]),
+            ('error_time', timestamps[:, 3, 0]),
+            ('response_time', response_time),
+        ):
+            self._last[key][ilast] = values[-nlast:]
+        self._ilast = (self._ilast + ntrials) % NTRIALS_PLOT
         self.ntrials_nan = self.ntrials if self.ntrials > 0 else np.nan
         self.percent_correct = self.ntrials_correct / self.ntrials_nan * 100
 
+    def _psychometrics_bin(self, probability_left: float, signed_contrast: float) -> tuple[int, int]:
+        """Return the row and column of the psychometrics arrays, adding them if necessary."""
+        if probability_left not in self._iprobability:
+            self._iprobability[probability_left] = len(self._iprobability)
+            self.probability_set = list(self.probability_set) + [probability_left]
+            for name in ('count', 'response_time_count', 'response_time_mean', 'response_time_m2', 'choice_mean', 'choice_m2'):
+                array = getattr(self, name)
+                fill = np.nan if name.endswith('mean') else 0
+                setattr(self, name, np.r_[array, np.full((1, array.shape[1]), fill, dtype=array.dtype)])
+        if signed_contrast not in self._icontrast:
+            j = np.searchsorted(self.signed_contrasts, signed_contrast)
+            self.signed_contrasts = np.insert(self.signed_contrasts, j, signed_contrast)
+            self._icontrast = {c: i for i, c in enumerate(self.signed_contrasts)}
+            for name in ('count', 'response_time_count', 'response_time_mean', 'response_time_m2', 'choice_mean', 'choice_m2'):
+                fill = np.nan if name.endswith('mean') else 0
+                setattr(self, name, np.insert(getattr(self, name), j, fill, axis=1))
+        return self._iprobability[probability_left], self._icontrast[signed_contrast]
+
+    def get_psychometric_curve(self, probability_left: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return the psychometric and chronometric curves of a block contingency.
+
+        Parameters
+        ----------
+        probability_left : float
+            The block probability of the stimulus appearing on the left.
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray, np.ndarray]
+            The signed contrasts with at least one trial, the mean choice and the mean response time.
+        """
+        i = self._iprobability[probability_left]
+        iok = self.count[i] > 0
+        return self.signed_contrasts[iok], self.choice_mean[i, iok], self.response_time_mean[i, iok]
+
+    def get_last_trials(self, column: str) -> np.ndarray:
+        """
+        Return a column of the last trials in chronological order.
+
+        Parameters
+        ----------
+        column : str
+            One of `DataModel.LAST_TRIALS_COLUMNS`.
+
+        Returns
+        -------
+        np.ndarray
+            The values of the last 20 trials, the last element being the most recent trial. Missing trials are NaN.
+        """
+        return np.roll(self._last[column], -self._ilast)
+
+    @property
+    def last_trials(self) -> pd.DataFrame:
+        """pandas.DataFrame: The last 20 trials in chronological order, for the timeline view."""
+        return pd.DataFrame({k: self.get_last_trials(k) for k in self.LAST_TRIALS_COLUMNS}, index=np.arange(NTRIALS_PLOT))
+
+    @property
+    def psychometrics(self) -> pd.DataFrame:
+        """pandas.DataFrame: The count, choice and response time per block contingency and signed contrast."""
+        count, response_time_count = np.maximum(self.count, 1), np.maximum(self.response_time_count, 1)
+        values = {
+            'count': self.count,
+            'response_time': self.response_time_mean,
+            'choice': self.choice_mean,
+            'response_time_std': np.where(
+                self.response_time_count > 0, np.sqrt(self.response_time_m2 / response_time_count), np.nan
+            ),
+            'choice_std': np.where(self.count > 0, np.sqrt(self.choice_m2 / count), np.nan),
+        }
+        return pd.DataFrame(
+            {k: v.flatten() for k, v in values.items()},
+            index=pd.MultiIndex.from_product([self.probability_set, self.signed_contrasts]),
+        )
+
+    @property
+    def rgb_background(self) -> np.ndarray:
+        """np.ndarray: For the trials plots, background image showing green if correct, red if incorrect."""
+        correct = self.get_last_trials('correct')
+        rgb_background = np.full((NTRIALS_PLOT, 1, 3), 229, dtype=np.uint8)
+        rgb_background[correct == 1] = [0, 255, 0]
+        rgb_background[correct == 0] = [255, 0, 0]
+        return rgb_background
+
+    @property
+    def last_contrasts(self) -> np.ndarray:
+        """np.ndarray: The absolute contrasts of the last trials as a 20 by 2 array (left, right)."""
+        signed_contrast = np.nan_to_num(self.get_last_trials('signed_contrast'))
+        last_contrasts = np.zeros((NTRIALS_PLOT, 2))
+        last_contrasts[:, 0] = np.where(signed_contrast < 0, -signed_contrast, 0)  # negative position is left
+        last_contrasts[:, 1] = np.where(signed_contrast > 0, signed_contrast, 0)
+        return last_contrasts
+
     def compute_end_session_criteria(self):
         """Implement critera to change the color of the figure display, according to the specifications of the task."""
         colour = {'red': '#eb5757', 'green': '#57eb8b', 'yellow': '#ede34e', 'white': '#ffffff'}
+        last_response_times = self._last['response_time'][~np.isnan(self._last['response_time'])]
         # Within the first part of the session we don't apply response time criterion
         if self.time_elapsed < ENGAGED_CRITIERION['secs']:
             return colour['white']
@@ -153,13 +316,97 @@ class DataModel:
         elif self.ntrials_engaged <= ENGAGED_CRITIERION['trial_count']:
             return colour['green']
         # the subject reaction time over the last 20 trials is more than 5 times greater than the overall reaction time
-        elif (self.trials_table['response_time'][: self.ntrials].median() * 5) < self.last_trials['response_time'].median():
+        elif last_response_times.size > 0 and (self.response_time_median.value * 5) < np.median(last_response_times):
             return colour['yellow']
         # 90 > time > 45 min and subject's avg response time hasn't significantly decreased
         else:
             return colour['white']
 
 
+class NewTrialListener:
+    """
+    Wait for new trials to be written to a task data file.
+
+    The task notifies the online plots of each new trial by sending the path of its task data file over UDP (see
+    :meth:`iblrig.base_choice_world.ChoiceWorldSession.notify_online_plots`), so that waiting does not use any CPU.
+    If the port can't be bound, or for tasks that don't send notifications, the listener falls back on polling the
+    `new_trial.flag` file written next to the task data file. Polling stops once a notification has been received.
+    """
+
+    def __init__(self, file_jsonable: Path | str, port: int = ONLINE_PLOTS_PORT):
+        """
+        Wait for new trials to be written to a task data file.
+
+        Parameters
+        ----------
+        file_jsonable : Path or str
+            The session's task data file.
+        port : int, optional
+            The local UDP port to listen on. Use 0 to bind to any free port.
+        """
+        self.file_jsonable = Path(file_jsonable)
+        self.flag_file = self.file_jsonable.parent.joinpath('new_trial.flag')
+        self._time_last_poll = 0.0
+        self._notified = False  # whether the task sends notifications
+        self.socket: socket.socket | None = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            self.socket.bind(('127.0.0.1', port))
+            self.socket.setblocking(False)
+        except OSError as e:
+            log.warning(f'Could not listen for new trials on port {port} ({e}), polling {self.flag_file.name} instead')
+            self.socket.close()
+            self.socket = None
+
+    @property
+    def port(self) -> int | None:
+        """int: The UDP port the listener is bound to, None if polling."""
+        return None if self.socket is None else self.socket.getsockname()[1]
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Wait for a new trial.
+
+        Parameters
+        ----------
+        timeout : float
+            Maximum time to wait, in seconds.
+
+        Returns
+        -------
+        bool
+            True if new trials have been written to the task data file.
+        """
+        if self.socket is None:
+            time.sleep(timeout)
+        elif select.select([self.socket], [], [], timeout)[0] and self._receive():
+            self.flag_file.unlink(missing_ok=True)
+            return True
+        # fallback for tasks that don't send notifications
+        if not self._notified and time.time() - self._time_last_poll >= POLLING_SECS:
+            self._time_last_poll = time.time()
+            if self.flag_file.exists():
+                self.flag_file.unlink(missing_ok=True)
+                return True
+        return False
+
+    def close(self) -> None:
+        """Close the socket."""
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+
+    def _receive(self) -> bool:
+        """Read all pending notifications and return True if any relates to the task data file."""
+        new_trial = False
+        while True:
+            try:
+                message = self.socket.recv(4096)
+            except OSError:  # no more pending messages
+                return new_trial
+            new_trial |= Path(message.decode('utf-8', errors='replace')) == self.file_jsonable
+            self._notified |= new_trial
+
+
 class OnlinePlots:
     """
     Full object to implement the online plots
@@ -205,19 +452,7 @@ class OnlinePlots:
         h.curve_psych = {}
         h.curve_reaction = {}
         for p in self.data.probability_set:
-            h.curve_psych[p] = h.ax_psych.plot(
-                self.data.psychometrics.loc[p].index,
-                self.data.psychometrics.loc[p]['choice'],
-                '.-',
-                zorder=10,
-                clip_on=False,
-                label=f'p = {p}',
-            )
-            h.curve_reaction[p] = h.ax_reaction.plot(
-                self.data.psychometrics.loc[p].index, self.data.psychometrics.loc[p]['response_time'], '.-', label=f'p = {p}'
-            )
-        h.ax_psych.legend()
-        h.ax_reaction.legend()
+            self._add_psychometric_curves(p, h)
 
         # create the two bars on the right side
         h.bar_correct = h.ax_performance.bar(0, self.data.percent_correct, label='correct', color='k')
@@ -294,22 +529,35 @@ class OnlinePlots:
         for p in self.data.probability_set:
             if pupdate is not None and p != pupdate:
                 continue
-            if self.data.psychometrics.loc[p]['count'].sum() == 0:
+            xval, choice, response_time = self.data.get_psychometric_curve(p)
+            if xval.size == 0:
                 continue
-            # update psychometric curves
-            iok = ~np.isnan(self.data.psychometrics.loc[p]['choice'].values.astype(np.float32))
-            xval = self.data.psychometrics.loc[p].index[iok]
-            h.curve_psych[p][0].set(xdata=xval, ydata=self.data.psychometrics.loc[p]['choice'][iok])
-            h.curve_reaction[p][0].set(xdata=xval, ydata=self.data.psychometrics.loc[p]['response_time'][iok])
+            # update psychometric curves, probabilities that were not in the task settings get new curves
+            if p not in h.curve_psych:
+                self._add_psychometric_curves(p, h)
+            h.curve_psych[p][0].set(xdata=xval, ydata=choice)
+            h.curve_reaction[p][0].set(xdata=xval, ydata=response_time)
             # update the last trials plot
             self.h.im_trials.set_array(self.data.rgb_background)
             for k in ['stim_on', 'reward_time', 'error_time', 'play_tone']:
-                h.lines_trials[k][0].set(xdata=self.data.last_trials[k])
+                h.lines_trials[k][0].set(xdata=self.data.get_last_trials(k))
             self.h.scatter_contrast.set_array(self.data.last_contrasts.T.flatten())
             # update barplots
             self.h.bar_correct[0].set(height=self.data.percent_correct)
             self.h.bar_water[0].set(height=self.data.water_delivered)
 
+    def _add_psychometric_curves(self, probability_left: float, h: Bunch) -> None:
+        """Create the psychometric and chronometric curves of a block contingency."""
+        psychometrics = self.data.psychometrics.loc[probability_left]
+        h.curve_psych[probability_left] = h.ax_psych.plot(
+            psychometrics.index, psychometrics['choice'], '.-', zorder=10, clip_on=False, label=f'p = {probability_left}'
+        )
+        h.curve_reaction[probability_left] = h.ax_reaction.plot(
+            psychometrics.index, psychometrics['response_time'], '.-', label=f'p = {probability_left}'
+        )
+        h.ax_psych.legend()
+        h.ax_reaction.legend()
+
     def _set_session_string(self) -> None:
         self._session_string = ''
         try:
@@ -344,67 +592,26 @@ class OnlinePlots:
         self._set_session_string()
         self.update_titles()
         self.h.fig.canvas.flush_events()
-        self.real_time = Bunch({'fseek': 0, 'time_last_check': 0})
-        flag_file = file_jsonable.parent.joinpath('new_trial.flag')
+        self.real_time = Bunch({'reader': JsonableReader(file_jsonable), 'time_last_check': 0})
+        listener = NewTrialListener(file_jsonable)
 
-        while True:
-            self.h.fig.canvas.draw_idle()
-            self.h.fig.canvas.flush_events()
-            time.sleep(0.4)
-            if not plt.fignum_exists(self.h.fig.number):
-                break
-            if flag_file.exists():
-                trial_data, bpod_data = load_task_jsonable(file_jsonable, offset=self.real_time.fseek)
-                new_size = file_jsonable.stat().st_size
-                for i in np.arange(len(bpod_data)):
-                    self.update_trial(trial_data.iloc[i], bpod_data[i])
-                self.real_time.fseek = new_size
-                self.real_time.time_last_check = time.time()
-                flag_file.unlink()
+        try:
+            while plt.fignum_exists(self.h.fig.number):
+                # wait for a new trial while keeping the figure responsive
+                if listener.wait(timeout=GUI_REFRESH_SECS):
+                    # only the trials appended since the last check are parsed
+                    trial_data, bpod_data = self.real_time.reader.read()
+                    for i in np.arange(len(bpod_data)):
+                        self.update_trial(trial_data.iloc[i], bpod_data[i])
+                    self.real_time.time_last_check = time.time()
+                    self.h.fig.canvas.draw_idle()
+                self.h.fig.canvas.flush_events()
+        finally:
+            listener.close()
 
     def display_full_jsonable(self, jsonable_file: Path | str):
         trials_table, bpod_data = load_task_jsonable(jsonable_file)
+        self.data.update_trials(trials_table, bpod_data)
         # here we take the end time of the first trial as reference to avoid factoring in the delay
         self.data.time_elapsed = bpod_data[-1]['Trial end timestamp'] - bpod_data[0]['Trial end timestamp']
-        trials_table['signed_contrast'] = np.sign(trials_table['position']) * trials_table['contrast']
-        trials_table['choice'] = trials_table['position'] > 0
-        trials_table.loc[~trials_table.trial_correct, 'choice'] = ~trials_table['choice'][~trials_table.trial_correct]
-        trials_table['contrast'] = trials_table['contrast'].astype(
-            CategoricalDtype(categories=np.unique(np.r_[-CONTRAST_SET, CONTRAST_SET]), ordered=True)
-        )
-        trials_table['stim_probability_left'] = trials_table['stim_probability_left'].astype(
-            CategoricalDtype(categories=self.data.probability_set, ordered=True)
-        )
-        self.data.psychometrics = trials_table.groupby(['stim_probability_left', 'signed_contrast']).agg(
-            count=pd.NamedAgg(column='signed_contrast', aggfunc='count'),
-            response_time=pd.NamedAgg(column='response_time', aggfunc=np.nanmean),
-            choice=pd.NamedAgg(column='choice', aggfunc='mean'),
-            response_time_std=pd.NamedAgg(column='response_time', aggfunc=np.nanstd),
-            choice_std=pd.NamedAgg(column='choice', aggfunc=np.nanmean),
-        )
-        self.data.ntrials = trials_table.shape[0]
-        self.data.ntrials_correct = np.sum(trials_table.trial_correct)
-        self.data.ntrials_nan = self.data.ntrials if self.data.ntrials > 0 else np.nan
-        self.data.percent_correct = self.data.ntrials_correct / self.data.ntrials_nan * 100
-        # agg.water_delivered = trials_table.water_delivered.iloc[-1]
-        self.data.water_delivered = trials_table.reward_amount.sum()
-        # init the last trials table
-        it = self.data.last_trials.index[-np.minimum(self.data.ntrials, NTRIALS_PLOT) :]
-        self.data.last_trials.loc[it, 'correct'] = trials_table.trial_correct.iloc[-NTRIALS_PLOT:].values
-        self.data.last_trials.loc[it, 'signed_contrast'] = trials_table.signed_contrast.iloc[-NTRIALS_PLOT:].values
-        self.data.last_trials.loc[it, 'response_time'] = trials_table.response_time.iloc[-NTRIALS_PLOT:].values
-        self.data.last_trials.loc[it, 'stim_on'] = np.array(
-            [bpod_data[i]['States timestamps']['stim_on'][0][0] for i in np.arange(-it.size, 0)]
-        )
-        self.data.last_trials.loc[it, 'play_tone'] = np.array(
-            [bpod_data[i]['States timestamps']['play_tone'][0][0] for i in np.arange(-it.size, 0)]
-        )
-        self.data.last_trials.loc[it, 'reward_time'] = np.array(
-            [bpod_data[i]['States timestamps']['reward'][0][0] for i in np.arange(-it.size, 0)]
-        )
-        self.data.last_trials.loc[it, 'error_time'] = np.array(
-            [bpod_data[i]['States timestamps']['error'][0][0] for i in np.arange(-it.size, 0)]
-        )
-        # we keep only a single column as buffer
-        self.data.trials_table = trials_table[['response_time']]
         self.update_graphics()
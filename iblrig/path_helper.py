@@ -12,12 +12,10 @@ from packaging import version
 from pydantic import BaseModel, ValidationError
 
 import iblrig
-from ibllib.io import session_params
-from ibllib.io.raw_data_loaders import load_settings
 from iblrig.constants import HARDWARE_SETTINGS_YAML, RIG_SETTINGS_YAML
 from iblrig.pydantic_definitions import HardwareSettings, RigSettings
+from iblrig.subject_history import REMOTE_HISTORY_FILE, SubjectHistory
 from iblutil.util import Bunch
-from one.alf.spec import is_session_path
 
 log = logging.getLogger(__name__)
 T = TypeVar('T', bound=BaseModel)
@@ -50,7 +48,11 @@ def iterate_previous_sessions(subject_name: str, task_name: str, n: int = 1, **k
     remote_subjects_folder = rig_paths['remote_subjects_folder']
     sessions = _iterate_protocols(local_subjects_folder.joinpath(subject_name), task_name=task_name, n=n)
     if remote_subjects_folder is not None:
-        remote_sessions = _iterate_protocols(remote_subjects_folder.joinpath(subject_name), task_name=task_name, n=n)
+        # the server is shared between rigs: its index is kept on the rig
+        file_index = local_subjects_folder.joinpath(subject_name, REMOTE_HISTORY_FILE)
+        remote_sessions = _iterate_protocols(
+            remote_subjects_folder.joinpath(subject_name), task_name=task_name, n=n, file_index=file_index
+        )
         if remote_sessions is not None:
             sessions.extend(remote_sessions)
         # here we rely on the fact that np.unique sort and then we output sessions with the last one first
@@ -59,7 +61,9 @@ def iterate_previous_sessions(subject_name: str, task_name: str, n: int = 1, **k
     return sessions
 
 
-def _iterate_protocols(subject_folder: Path, task_name: str, n: int = 1, min_trials: int = 43) -> list[dict]:
+def _iterate_protocols(
+    subject_folder: Path, task_name: str, n: int = 1, min_trials: int = 43, file_index: Path | None = None
+) -> list[dict]:
     """
     Return information on the last n sessions with matching protocol.
 
@@ -75,54 +79,22 @@ def _iterate_protocols(subject_folder: Path, task_name: str, n: int = 1, min_tri
         The number of previous protocols to return.
     min_trials : int
         Skips sessions with fewer than this number of trials.
+    file_index : Path, optional
+        The file caching the sessions' information, defaults to an index file within the subject folder.
 
     Returns
     -------
     list[dict]
-        list of dictionaries with keys: session_stub, session_path, experiment_description,
-        task_settings, file_task_data.
-    """
+        list of dictionaries with keys: session_stub, session_path, task_collection, experiment_description,
+        task_settings, file_task_data, file_subject_history.
 
-    def proc_num(x):
-        """Return protocol number.
-
-        Use 'protocol_number' key if present (unlikely), otherwise use collection name.
-        """
-        i = (x or {}).get('collection', '00').split('_')
-        collection_int = int(i[-1]) if i[-1].isnumeric() else 0
-        return x.get('protocol_number', collection_int)
-
-    protocols = []
-    if subject_folder is None or Path(subject_folder).exists() is False:
-        return protocols
-    sessions = subject_folder.glob('????-??-??/*/_ibl_experiment.description*.yaml')  # seq may be X or XXX
-    # Make extra sure to only include valid sessions
-    sessions = filter(lambda x: is_session_path(x.relative_to(subject_folder.parent).parent), sessions)
-    for file_experiment in sorted(sessions, reverse=True):
-        session_path = file_experiment.parent
-        ad = session_params.read_params(file_experiment)
-        # reversed: we look for the last task first if the protocol ran twice
-        tasks = filter(None, map(lambda x: x.get(task_name), ad.get('tasks', [])))
-        for adt in sorted(tasks, key=proc_num, reverse=True):
-            if not (task_settings := load_settings(session_path, task_collection=adt['collection'])):
-                continue
-            if task_settings.get('NTRIALS', min_trials + 1) < min_trials:  # ignore sessions with too few trials
-                continue
-            protocols.append(
-                Bunch(
-                    {
-                        'session_stub': '_'.join(file_experiment.parent.parts[-2:]),  # 2019-01-01_001
-                        'session_path': file_experiment.parent,
-                        'task_collection': adt['collection'],
-                        'experiment_description': ad,
-                        'task_settings': task_settings,
-                        'file_task_data': session_path.joinpath(adt['collection'], '_iblrig_taskData.raw.jsonable'),
-                    }
-                )
-            )
-            if len(protocols) >= n:
-                return protocols
-    return protocols
+    Notes
+    -----
+    The sessions' information is cached in an index file, see :class:`iblrig.subject_history.SubjectHistory`.
+    """
+    if subject_folder is None:
+        return []
+    return SubjectHistory(subject_folder, file_index=file_index).iterate_protocols(task_name, n=n, min_trials=min_trials)
 
 
 def get_local_and_remote_paths(
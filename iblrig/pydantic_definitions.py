@@ -1,8 +1,9 @@
 from collections import abc
 from datetime import date
 from pathlib import Path
-from typing import Annotated, Literal
+from typing import Annotated, Any, Literal
 
+import numpy as np
 import pandas as pd
 from annotated_types import Ge, Le
 from pydantic import (
@@ -18,6 +19,7 @@ from pydantic import (
     field_serializer,
     field_validator,
 )
+from pydantic.fields import FieldInfo
 from pydantic_core._pydantic_core import PydanticUndefined
 
 from iblrig.constants import BASE_PATH
@@ -122,6 +124,8 @@ class HardwareSettingsSound(BunchModel):
     OUTPUT: Literal['harp', 'xonar', 'hifi', 'sysdefault']
     COM_SOUND: str | None = None
     AMP_TYPE: Literal['harp', 'AMP2X15'] | None = None
+    SKIP_UNCHANGED_UPLOAD: bool = False  # HiFi only: don't re-upload the sounds if the module already holds them
+    CACHE_WHITE_NOISE: bool = False  # re-use the same white noise in each session instead of rendering it anew
     # ATTENUATION_DB: float = Field(default=0, le=0)
 
 
@@ -212,13 +216,49 @@ class TrialDataModel(BaseModel):
 
     model_config = ConfigDict(extra='allow')  # allow adding extra fields
 
+    @staticmethod
+    def _field_dtype(field_info: FieldInfo) -> np.dtype | pd.api.extensions.ExtensionDtype:
+        """
+        Get the pandas dtype of a field from its annotation.
+
+        Fields without default values get pandas' nullable dtypes so that unset values are represented by pandas.NA.
+        Integers use the smallest dtype that fits the bounds declared in the field's metadata.
+
+        Parameters
+        ----------
+        field_info : FieldInfo
+            The field's Pydantic FieldInfo.
+
+        Returns
+        -------
+        np.dtype or pd.api.extensions.ExtensionDtype
+            The dtype of the field's column in the trials table.
+        """
+        nullable = field_info.default is PydanticUndefined
+        if field_info.annotation is bool:
+            return pd.BooleanDtype() if nullable else np.dtype(bool)
+        if field_info.annotation is float:
+            return pd.Float64Dtype() if nullable else np.dtype(np.float64)
+        if field_info.annotation is int:
+            lower = [b for m in field_info.metadata for b in (getattr(m, 'ge', None), getattr(m, 'gt', None)) if b is not None]
+            upper = [b for m in field_info.metadata for b in (getattr(m, 'le', None), getattr(m, 'lt', None)) if b is not None]
+            dtype = np.dtype(np.int64)
+            if len(lower) > 0 and len(upper) > 0:
+                for int_type in (np.int8, np.int16, np.int32):
+                    if np.iinfo(int_type).min <= max(lower) and min(upper) <= np.iinfo(int_type).max:
+                        dtype = np.dtype(int_type)
+                        break
+            return pd.api.types.pandas_dtype(dtype.name.capitalize()) if nullable else dtype
+        return np.dtype(object)
+
     @classmethod
     def preallocate_dataframe(cls, n_rows: int) -> pd.DataFrame:
         """
         Preallocate a DataFrame with specified number of rows, using default values or pandas.NA.
 
         This method creates a pandas DataFrame with the same columns as the fields defined in the Pydantic model.
-        Each column is initialized with the field's default value if available, otherwise with pandas.NA.
+        Each column is initialized with the field's default value if available, otherwise with pandas.NA. The dtypes of
+        the columns are derived from the fields' annotations, see :meth:`_field_dtype`.
 
         We use Pandas.NA for default values rather than NaN, None or Zero. This allows us to clearly indicate missing
         values - which will raise a Pydantic ValidationError.
@@ -235,6 +275,37 @@ class TrialDataModel(BaseModel):
         """
         data = {}
         for field, field_info in cls.model_fields.items():
-            default_value = field_info.default if field_info.default is not PydanticUndefined else pd.NA
-            data[field] = [default_value] * n_rows
+            dtype = cls._field_dtype(field_info)
+            if field_info.default is PydanticUndefined:
+                data[field] = pd.array([pd.NA] * n_rows, dtype=dtype)
+            elif dtype.kind == 'O':
+                data[field] = [field_info.default] * n_rows
+            else:
+                data[field] = np.full(n_rows, field_info.default, dtype=dtype)
         return pd.DataFrame(data)
+
+    @staticmethod
+    def dataframe_row(trials_table: pd.DataFrame, index: int) -> dict[str, Any]:
+        """
+        Get a row of the trials table as a dict.
+
+        The values are read from the columns' arrays directly. Contrary to ``trials_table.iloc[index].to_dict()`` this
+        doesn't cast the row to a Series of dtype object. NumPy scalars are converted to their Python equivalent.
+
+        Parameters
+        ----------
+        trials_table : pd.DataFrame
+            The trials table.
+        index : int
+            The position of the row.
+
+        Returns
+        -------
+        dict
+            The row's values, keyed by column name.
+        """
+        row = {}
+        for key, column in trials_table.items():
+            value = column.array[index]
+            row[key] = value.item() if isinstance(value, np.generic) else value
+        return row
@@ -3,7 +3,9 @@ import logging
 from pathlib import Path
 from typing import Any
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 
 log = logging.getLogger(__name__)
 
@@ -37,3 +39,285 @@ def load_task_jsonable(jsonable_file: str | Path, offset: int | None = None) ->
 
     trials_table = pd.DataFrame(trials_table)
     return trials_table, bpod_data
+
+
+def states_timestamps_array(bpod_data: list[dict[str, Any]], states: list[str] | None = None) -> tuple[np.ndarray, list[str]]:
+    """
+    Flatten the state timestamps of a list of trials into a dense array.
+
+    Parameters
+    ----------
+    bpod_data : list of dict
+        Timing data of each trial, as returned by :func:`load_task_jsonable`.
+    states : list of str, optional
+        The states to extract. Defaults to all states, in order of first appearance.
+
+    Returns
+    -------
+    np.ndarray
+        A float array of shape (n_trials, n_states, 2) containing the onset and offset of the first occurrence of each
+        state within each trial. States that were not visited are NaN.
+    list of str
+        The names of the states along the second axis.
+    """
+    if states is None:
+        states = list(dict.fromkeys(state for trial in bpod_data for state in trial['States timestamps']))
+    timestamps = np.full((len(bpod_data), len(states), 2), np.nan)
+    for i, trial in enumerate(bpod_data):
+        trial_states = trial['States timestamps']
+        for j, state in enumerate(states):
+            if (state_timestamps := trial_states.get(state)) is not None:
+                timestamps[i, j] = state_timestamps[0]
+    return timestamps, states
+
+
+def load_task_arrow(arrow_file: str | Path, columns: list[str] | None = None) -> pd.DataFrame:
+    """
+    Reads in selected columns of a task data Arrow IPC stream.
+
+    The file is memory-mapped and only the requested columns are converted to pandas. Record batches that were
+    not written completely (e.g. the task crashed during a write) are ignored.
+
+    Parameters
+    ----------
+    arrow_file : str or Path
+        Full path to the Arrow IPC stream, see :mod:`iblrig.trial_store`.
+    columns : list of str, optional
+        The columns to load. Columns that are missing from the file are ignored. Defaults to all columns.
+
+    Returns
+    -------
+    pandas.DataFrame
+        A DataFrame with the trial info and the flattened Bpod data.
+    """
+    reader = pa.ipc.open_stream(pa.memory_map(str(arrow_file)))
+    batches = []
+    while True:
+        try:
+            batches.append(reader.read_next_batch())
+        except StopIteration:
+            break
+        except pa.ArrowInvalid:
+            log.warning(f'{arrow_file} is truncated, only the first {sum(b.num_rows for b in batches)} trials are loaded')
+            break
+    table = pa.Table.from_batches(batches, schema=reader.schema)
+    if columns is not None:
+        table = table.select([c for c in columns if c in table.column_names])
+    return table.to_pandas()
+
+
+class JsonableReader:
+    """
+    Incremental reader for task data jsonable files.
+
+    The reader keeps track of the byte offset of each trial (line) within the jsonable file so that subsequent calls to
+    :meth:`read` only parse the trials that have been appended since the last call. Scalar trial fields are appended to
+    a preallocated columnar buffer (one numpy array per field) that grows geometrically, so that the per-trial cost
+    remains constant regardless of the session length.
+
+    The line-offset index can optionally be saved next to the jsonable file, which allows other consumers to access
+    single trials or the number of trials without parsing the whole file.
+
+    Examples
+    --------
+    >>> reader = JsonableReader('/path/to/_iblrig_taskData.raw.jsonable')
+    >>> trials_table, bpod_data = reader.read()  # all trials written so far
+    >>> trials_table, bpod_data = reader.read()  # only the trials written since the previous call
+    >>> reader.table  # all trials read so far, as a DataFrame
+    """
+
+    INDEX_SUFFIX = '.index.npy'
+
+    def __init__(self, jsonable_file: str | Path, save_index: bool = False, capacity: int = 2048):
+        """
+        Incremental reader for task data jsonable files.
+
+        Parameters
+        ----------
+        jsonable_file : str or Path
+            Full path to the jsonable file.
+        save_index : bool, optional
+            If True, the line-offset index is loaded from and saved to a file next to the jsonable file.
+            Trials covered by a saved index are not parsed again by :meth:`read` - use :meth:`read_trial` to
+            access them. Defaults to False.
+        capacity : int, optional
+            Initial number of rows of the columnar buffer. Defaults to 2048.
+        """
+        self.jsonable_file = Path(jsonable_file)
+        self.save_index = save_index
+        self._offsets = np.zeros(capacity + 1, dtype=np.int64)  # offsets[i] is the start of trial i
+        self._n_indexed = 0  # number of trials in the offset index
+        self._n_buffered = 0  # number of trials in the columnar buffer
+        self._first_buffered = 0  # trial number of the first row in the columnar buffer
+        self._capacity = capacity
+        self._columns: dict[str, np.ndarray] = {}
+        if self.save_index:
+            self._load_index()
+
+    @property
+    def file_index(self) -> Path:
+        """Path: The location of the persistent line-offset index."""
+        return self.jsonable_file.with_name(self.jsonable_file.name + self.INDEX_SUFFIX)
+
+    @property
+    def ntrials(self) -> int:
+        """int: The number of complete trials found in the jsonable file so far."""
+        return self._n_indexed
+
+    @property
+    def offsets(self) -> np.ndarray:
+        """numpy.ndarray: The byte offset of each trial within the jsonable file, followed by the end offset."""
+        return self._offsets[: self._n_indexed + 1]
+
+    @property
+    def table(self) -> pd.DataFrame:
+        """pandas.DataFrame: The scalar fields of all trials held in the columnar buffer."""
+        index = np.arange(self._first_buffered, self._first_buffered + self._n_buffered)
+        return pd.DataFrame({k: v[: self._n_buffered] for k, v in self._columns.items()}, index=index)
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        Return a view on a single column of the columnar buffer.
+
+        Parameters
+        ----------
+        name : str
+            The name of the trial field.
+
+        Returns
+        -------
+        numpy.ndarray
+            The values of the field for all trials held in the buffer.
+        """
+        return self._columns[name][: self._n_buffered]
+
+    def reset(self) -> None:
+        """Forget everything that has been read so far."""
+        self._n_indexed = 0
+        self._n_buffered = 0
+        self._first_buffered = 0
+        self._offsets[0] = 0
+        self._columns = {}
+
+    def read(self) -> tuple[pd.DataFrame, list[Any]]:
+        """
+        Read the trials appended to the jsonable file since the last call.
+
+        Incomplete lines (i.e. a trial currently being written) are left for the next call.
+
+        Returns
+        -------
+        - tuple: A tuple containing:
+            - trials_table (pandas.DataFrame): The new trials in the same format as the Session trials table.
+            - bpod_data (list): timing data for each new trial
+        """
+        trials, bpod_data = [], []
+        if not self.jsonable_file.exists():
+            return pd.DataFrame(trials), bpod_data
+        position = self._offsets[self._n_indexed]
+        if self.jsonable_file.stat().st_size < position:
+            log.warning(f'{self.jsonable_file} has been truncated, re-reading from start')
+            self.reset()
+            position = 0
+        with open(self.jsonable_file, 'rb') as f:
+            f.seek(position, 0)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # the trial is still being written
+                position += len(line)
+                trial = json.loads(line)
+                bpod_data.append(trial.pop('behavior_data', None))
+                trials.append(trial)
+                self._append(trial, position)
+        if len(trials) > 0 and self.save_index:
+            self._save_index()
+        index = np.arange(self._n_indexed - len(trials), self._n_indexed)
+        return pd.DataFrame(trials, index=index if trials else None), bpod_data
+
+    def read_trial(self, trial_num: int) -> dict[str, Any]:
+        """
+        Read a single trial from the jsonable file using the line-offset index.
+
+        Parameters
+        ----------
+        trial_num : int
+            The trial number (negative values index from the last trial read).
+
+        Returns
+        -------
+        dict
+            The full trial record, including the 'behavior_data' field.
+        """
+        if trial_num < 0:
+            trial_num += self._n_indexed
+        if not 0 <= trial_num < self._n_indexed:
+            raise IndexError(f'Trial {trial_num} out of range ({self._n_indexed} trials indexed)')
+        with open(self.jsonable_file, 'rb') as f:
+            f.seek(self._offsets[trial_num], 0)
+            return json.loads(f.read(self._offsets[trial_num + 1] - self._offsets[trial_num]))
+
+    def _grow(self) -> None:
+        self._capacity *= 2
+        offsets = np.zeros(self._capacity + 1, dtype=np.int64)
+        offsets[: self._offsets.size] = self._offsets
+        self._offsets = offsets
+        for key, values in self._columns.items():
+            self._columns[key] = np.resize(values, self._capacity)
+            self._columns[key][self._n_buffered :] = self._empty_value(values.dtype)
+
+    @staticmethod
+    def _empty_value(dtype: np.dtype) -> Any:
+        return {np.dtype(bool): False, np.dtype(np.float64): np.nan}.get(np.dtype(dtype))
+
+    @staticmethod
+    def _column_dtype(value: Any) -> np.dtype:
+        if isinstance(value, bool):
+            return np.dtype(bool)
+        if isinstance(value, int | float):
+            return np.dtype(np.float64)
+        return np.dtype(object)
+
+    def _append(self, trial: dict[str, Any], end_position: int) -> None:
+        if self._n_indexed >= self._capacity or self._n_buffered >= self._capacity:
+            self._grow()
+        if self._n_buffered == 0:
+            self._first_buffered = self._n_indexed
+        i = self._n_buffered
+        for key, value in trial.items():
+            if key not in self._columns:
+                dtype = self._column_dtype(value)
+                self._columns[key] = np.full(self._capacity, self._empty_value(dtype), dtype=dtype)
+            column = self._columns[key]
+            if column.dtype == np.float64 and value is None:
+                column[i] = np.nan
+                continue
+            if column.dtype != object and self._column_dtype(value) != column.dtype:
+                column = self._columns[key] = column.astype(object)  # mixed types: fall back to python objects
+            column[i] = value
+        self._n_buffered += 1
+        self._n_indexed += 1
+        self._offsets[self._n_indexed] = end_position
+
+    def _load_index(self) -> None:
+        if not self.file_index.exists() or not self.jsonable_file.exists():
+            return
+        try:
+            offsets = np.load(self.file_index)
+        except (OSError, ValueError):
+            log.warning(f'Could not load {self.file_index}, the jsonable file will be read from start')
+            return
+        # the index is only valid if the file has not been truncated or rewritten in the meantime
+        if offsets.size == 0 or offsets[0] != 0 or offsets[-1] > self.jsonable_file.stat().st_size:
+            log.warning(f'{self.file_index} does not match {self.jsonable_file.name}, the jsonable file will be read from start')
+            return
+        while offsets.size > self._capacity + 1:
+            self._grow()
+        self._offsets[: offsets.size] = offsets
+        self._n_indexed = offsets.size - 1
+
+    def _save_index(self) -> None:
+        try:
+            with open(self.file_index, 'wb') as fp:
+                np.save(fp, self.offsets)
+        except OSError:
+            log.warning(f'Could not save {self.file_index}')
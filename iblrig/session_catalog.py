@@ -0,0 +1,264 @@
+"""
+Catalog of the local sessions.
+
+Listing the local sessions along with their size requires walking the complete tree of each session folder, which takes
+minutes on rigs with a year of data. :class:`SessionCatalog` keeps the date, size and last known copy state of each
+session in a catalog file within the local subjects folder. The entries of the catalog are validated against the
+modification times of the session folder, its collections and the transfer flag file, and are only updated if those have
+changed. The copy state is re-read from the session's transfer manifest only if the manifest has changed. Sessions are
+probed by a bounded pool of threads.
+"""
+
+import json
+import logging
+import os
+import re
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from iblrig.transfer_experiments import MANIFEST_FILE, TransferManifest
+from iblutil.util import dir_size
+
+log = logging.getLogger(__name__)
+
+CATALOG_FILE = '.iblrig_session_catalog.json'
+CATALOG_VERSION = 1
+DATE_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}')
+NUMBER_PATTERN = re.compile(r'\d{3}')
+
+
+def _file_signature(file_path: Path) -> list[int] | None:
+    """Return modification time and size of a file, or None if it doesn't exist."""
+    try:
+        stat = file_path.stat()
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _session_signature(session_path: Path) -> dict[str, int] | None:
+    """
+    Return the modification times of a session folder, its sub-folders and its transfer flag file.
+
+    The modification time of a folder changes when files are added to or removed from it. Files that are modified in
+    place, such as the task data file of a running session, are covered by the transfer flag file which is touched after
+    each trial.
+
+    Parameters
+    ----------
+    session_path : Path
+        The session folder.
+
+    Returns
+    -------
+    dict or None
+        The modification times in nanoseconds, keyed by name ('.' for the session folder itself). None if the session
+        folder doesn't exist.
+    """
+    try:
+        signature = {'.': session_path.stat().st_mtime_ns}
+        with os.scandir(session_path) as it:
+            for entry in it:
+                if entry.name == 'transfer_me.flag' or entry.is_dir():
+                    signature[entry.name] = entry.stat().st_mtime_ns
+    except OSError:
+        return None
+    return signature
+
+
+def _session_date(session_path: Path) -> float:
+    """Return the creation time of a session folder, or its date if the creation time doesn't match the folder name."""
+    date = datetime.strptime(session_path.parent.name, '%Y-%m-%d')
+    time = datetime.fromtimestamp(session_path.stat().st_ctime)
+    return (time if time.date() == date.date() else date).timestamp()
+
+
+def _probe_session(session_path: Path, record: dict[str, Any], force: bool = False) -> dict[str, Any] | None:
+    """
+    Probe a session and return its updated catalog entry.
+
+    Parameters
+    ----------
+    session_path : Path
+        The session folder.
+    record : dict
+        The session's current catalog entry.
+    force : bool, optional
+        If True, the size and copy state are re-read regardless of the signatures. Defaults to False.
+
+    Returns
+    -------
+    dict or None
+        The updated catalog entry, None if it is unchanged.
+    """
+    updated = dict(record)
+    signature = _session_signature(session_path)
+    if force or signature != record.get('signature'):
+        updated['signature'] = signature
+        updated['date'] = _session_date(session_path)
+        updated['size'] = dir_size(session_path)
+    manifest_signature = _file_signature(session_path.joinpath(MANIFEST_FILE))
+    if force or 'copy_state' not in record or manifest_signature != record.get('manifest_signature'):
+        # last known state, as recorded by the copiers - this does not require access to the remote server
+        state = TransferManifest(session_path).get_copy_state() if manifest_signature else None
+        updated['copy_state'] = None if state is None else int(state)
+        updated['manifest_signature'] = manifest_signature
+    return None if updated == record else updated
+
+
+class SessionCatalog:
+    """
+    Catalog of the sessions within the local subjects folder.
+
+    :meth:`records` returns the cached entries without accessing the session folders, :meth:`refresh` detects new and
+    removed sessions and updates the entries of changed sessions.
+
+    Examples
+    --------
+    >>> catalog = SessionCatalog('/mnt/s0/Data/Subjects')
+    >>> cached = catalog.records()
+    >>> for record in catalog.refresh():
+    ...     print(record['session_path'], record['size'], record['copy_state'])
+    """
+
+    def __init__(self, subjects_folder: str | Path):
+        """
+        Catalog of the sessions within the local subjects folder.
+
+        Parameters
+        ----------
+        subjects_folder : str or Path
+            The local subjects folder.
+        """
+        self.subjects_folder = Path(subjects_folder)
+        self._catalog: dict[str, Any] = {'version': CATALOG_VERSION, 'dates': {}, 'sessions': {}}
+        self._modified = False
+        self._load()
+
+    @property
+    def file_catalog(self) -> Path:
+        """Path: The catalog file."""
+        return self.subjects_folder.joinpath(CATALOG_FILE)
+
+    def records(self) -> list[dict[str, Any]]:
+        """
+        Return the cached entries of all sessions.
+
+        Returns
+        -------
+        list of dict
+            One dictionary per session with keys: session, session_path, subject, date, size, copy_state. Date is a POSIX
+            timestamp, the copy state an integer value of :class:`iblrig.transfer_experiments.CopyState` or None. Sessions
+            that have not been probed yet have a size and date of None.
+        """
+        return [self._record(session) for session in self._catalog['sessions']]
+
+    def refresh(self, max_workers: int = 4, force: bool = False) -> Iterator[dict[str, Any]]:
+        """
+        Update the catalog and yield the entries of new and changed sessions.
+
+        The catalog is saved once all sessions have been probed.
+
+        Parameters
+        ----------
+        max_workers : int, optional
+            The maximum number of sessions probed concurrently. Defaults to 4.
+        force : bool, optional
+            If True, the size and copy state of all sessions are re-read. Defaults to False.
+
+        Yields
+        ------
+        dict
+            The updated entry of a session, see :meth:`records`, in order of completion.
+        """
+        try:
+            self._update_dates()
+            sessions = self._catalog['sessions']
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='session_catalog') as executor:
+                futures = {
+                    executor.submit(_probe_session, self.subjects_folder.joinpath(session), record, force): session
+                    for session, record in sessions.items()
+                }
+                for future in as_completed(futures):
+                    session = futures[future]
+                    try:
+                        updated = future.result()
+                    except (OSError, ValueError) as e:
+                        log.warning(f'Could not probe session {session}: {e}')
+                        continue
+                    if updated is not None:
+                        sessions[session] = updated
+                        self._modified = True
+                        yield self._record(session)
+        finally:
+            self.save()
+
+    def save(self) -> None:
+        """Save the catalog if it has been modified."""
+        if not self._modified:
+            return
+        file_tmp = self.file_catalog.with_suffix('.tmp')
+        try:
+            with open(file_tmp, 'w') as fp:
+                json.dump(self._catalog, fp)
+            os.replace(file_tmp, self.file_catalog)
+        except OSError as e:
+            log.debug(f'Could not save {self.file_catalog}: {e}')
+        else:
+            self._modified = False
+
+    def _record(self, session: str) -> dict[str, Any]:
+        record = self._catalog['sessions'][session]
+        return {
+            'session': session,
+            'session_path': self.subjects_folder.joinpath(session),
+            'subject': session.split('/', maxsplit=1)[0],
+            'date': record.get('date'),
+            'size': record.get('size'),
+            'copy_state': record.get('copy_state'),
+        }
+
+    def _load(self) -> None:
+        if not self.file_catalog.exists():
+            return
+        try:
+            with open(self.file_catalog) as fp:
+                catalog = json.load(fp)
+        except (OSError, ValueError):
+            log.warning(f'Could not load {self.file_catalog}, the local sessions will be cataloged from scratch')
+            return
+        if catalog.get('version') == CATALOG_VERSION:
+            self._catalog = catalog
+
+    def _update_dates(self) -> None:
+        """Detect new and removed sessions through the modification time of the date folders."""
+        dates = {}
+        if self.subjects_folder.exists():
+            with os.scandir(self.subjects_folder) as subjects:
+                for subject in subjects:
+                    if not subject.is_dir():
+                        continue
+                    with os.scandir(subject.path) as it:
+                        for entry in it:
+                            if DATE_PATTERN.fullmatch(entry.name) and entry.is_dir():
+                                dates[f'{subject.name}/{entry.name}'] = entry.stat().st_mtime_ns
+        if dates == self._catalog['dates']:
+            return
+        sessions = self._catalog['sessions']
+        for date in set(self._catalog['dates']).union(dates):
+            if date in dates and self._catalog['dates'].get(date) == dates[date]:
+                continue
+            current = {s for s in sessions if s.startswith(f'{date}/')}
+            found = set()
+            if date in dates:
+                with os.scandir(self.subjects_folder.joinpath(date)) as it:
+                    found = {f'{date}/{e.name}' for e in it if NUMBER_PATTERN.fullmatch(e.name) and e.is_dir()}
+            for session in current - found:
+                sessions.pop(session)
+            for session in found - current:
+                sessions[session] = {}
+        self._catalog['dates'] = dates
+        self._modified = True
@@ -1,9 +1,21 @@
 """Creates sessions, pre-generates stim and ephys sessions."""
 
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
 import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 from iblrig import misc
 
+log = logging.getLogger(__name__)
+
+EPHYSCW_CONTRASTS = [1.0, 0.25, 0.125, 0.0625, 0.0]
+EPHYSCW_MIN_TRIALS = 2001
+
 
 def draw_position(position_set, stim_probability_left) -> int:
     return int(np.random.choice(position_set, p=[stim_probability_left, 1 - stim_probability_left]))
@@ -14,7 +26,7 @@ def draw_block_len(factor, min_=20, max_=100):
 
 
 # EPHYS CHOICE WORLD
-def make_ephyscw_pc(prob_type='biased'):
+def make_ephyscw_pc(prob_type='biased', rng: np.random.Generator | None = None):
     """
     Create positions, contrasts and block lengths for ephysCW.
 
@@ -24,23 +36,198 @@ def make_ephyscw_pc(prob_type='biased'):
     ----------
     prob_type : str
         'biased': 0 contrast half has likely to be drawn, 'uniform': 0 contrast as likely as other contrasts
+    rng : numpy.random.Generator, optional
+        Random number generator. Defaults to NumPy's global random state.
     """
-    contrasts = [1.0, 0.25, 0.125, 0.0625, 0.0]
+    gen = np.random if rng is None else rng
+    contrasts = EPHYSCW_CONTRASTS
     len_block = [90]
     pos = [-35] * int(len_block[0] / 2) + [35] * int(len_block[0] / 2)
     cont = np.sort(contrasts * 10)[::-1][:-5].tolist()
     prob = [0.5] * len_block[0]
     pc = np.array([pos, cont + cont, prob]).T
-    np.random.shuffle(pc)  # only shuffles on the first dimension
-
-    prob_left = 0.8 if draw_position([-35, 35], 0.5) < 0 else 0.2
-    while len(pc) < 2001:
-        len_block.append(draw_block_len(60, min_=20, max_=100))
-        for _x in range(len_block[-1]):
-            p = draw_position([-35, 35], prob_left)
-            c = misc.draw_contrast(contrasts, probability_type=prob_type)
-            pc = np.append(pc, np.array([[p, c, prob_left]]), axis=0)
-            # do this in PC space
-        prob_left = np.round(np.abs(1 - prob_left), 1)
+    gen.shuffle(pc)  # only shuffles on the first dimension
 
+    # draw the biased blocks until the session has at least EPHYSCW_MIN_TRIALS trials
+    n_remaining = EPHYSCW_MIN_TRIALS - len_block[0]
+    block_lengths = misc.truncated_exponential(60, 20, 100, size=int(np.ceil(n_remaining / 20)), rng=rng).astype(int)
+    block_lengths = block_lengths[: np.searchsorted(np.cumsum(block_lengths), n_remaining) + 1]
+    len_block.extend(block_lengths.tolist())
+    prob_left = 0.8 if gen.random() < 0.5 else 0.2
+    block_prob_left = np.where(np.arange(block_lengths.size) % 2 == 0, prob_left, np.round(np.abs(1 - prob_left), 1))
+    prob = np.repeat(block_prob_left, block_lengths)
+    pos = np.where(gen.random(prob.size) < prob, -35, 35)
+    cont = misc.draw_contrast(contrasts, probability_type=prob_type, size=prob.size, rng=rng)
+    pc = np.r_[pc, np.c_[pos, cont, prob]]
     return pc, len_block
+
+
+def make_ephyscw_template(prob_type: str = 'biased', rng: np.random.Generator | None = None) -> pd.DataFrame:
+    """
+    Create the trials table of an ephysChoiceWorld session template.
+
+    Parameters
+    ----------
+    prob_type : str
+        'biased': 0 contrast half has likely to be drawn, 'uniform': 0 contrast as likely as other contrasts
+    rng : numpy.random.Generator, optional
+        Random number generator. Defaults to NumPy's global random state.
+
+    Returns
+    -------
+    pd.DataFrame
+        The trials table, with the columns of the ephysChoiceWorld templates.
+    """
+    gen = np.random if rng is None else rng
+    pc, len_block = make_ephyscw_pc(prob_type=prob_type, rng=rng)
+    n_trials = pc.shape[0]
+    block_num = np.repeat(np.arange(len(len_block)), len_block)
+    block_start = np.cumsum(len_block) - len_block
+    return pd.DataFrame(
+        {
+            'contrast': pc[:, 1],
+            'position': pc[:, 0],
+            'quiescent_period': 0.2 + misc.truncated_exponential(0.35, 0.2, 0.5, size=n_trials, rng=rng),
+            'response_side': np.zeros(n_trials, dtype=np.int8),
+            'response_time': np.full(n_trials, np.nan),
+            'reward_amount': np.full(n_trials, 1.5),
+            'reward_valve_time': np.full(n_trials, np.nan),
+            'stim_angle': np.zeros(n_trials),
+            'stim_freq': np.full(n_trials, 0.1),
+            'stim_gain': np.full(n_trials, 4.0),
+            'stim_phase': gen.random(n_trials) * 2 * np.pi,
+            'stim_probability_left': pc[:, 2],
+            'stim_reverse': np.zeros(n_trials, dtype=bool),
+            'stim_sigma': np.full(n_trials, 7.0),
+            'trial_correct': np.zeros(n_trials, dtype=bool),
+            'trial_num': np.arange(n_trials, dtype=np.int16),
+            'block_num': block_num,
+            'block_trial_num': np.arange(n_trials) - block_start[block_num],
+        }
+    )
+
+
+def validate_ephyscw_template(trials_table: pd.DataFrame, prob_type: str = 'biased', tolerance: float = 0.3) -> None:
+    """
+    Validate the block and contrast statistics of an ephysChoiceWorld session template.
+
+    Parameters
+    ----------
+    trials_table : pd.DataFrame
+        The trials table of the template.
+    prob_type : str
+        The contrast probability type the template was generated with.
+    tolerance : float
+        The tolerated relative deviation of the frequencies of the signed contrasts from their expected values.
+
+    Raises
+    ------
+    ValueError
+        If the template doesn't comply with the ephysChoiceWorld design.
+    """
+    blocks = trials_table.groupby('block_num').agg(
+        length=pd.NamedAgg(column='trial_num', aggfunc='count'),
+        probability_left=pd.NamedAgg(column='stim_probability_left', aggfunc='first'),
+        n_probability_left=pd.NamedAgg(column='stim_probability_left', aggfunc='nunique'),
+        left=pd.NamedAgg(column='position', aggfunc=lambda x: np.sum(x < 0)),
+    )
+    if trials_table.shape[0] < EPHYSCW_MIN_TRIALS:
+        raise ValueError(f'The template has less than {EPHYSCW_MIN_TRIALS} trials')
+    if np.any(blocks['n_probability_left'] != 1):
+        raise ValueError('The probability of a left stimulus changes within blocks')
+    if blocks['length'].iloc[0] != 90 or blocks['probability_left'].iloc[0] != 0.5 or blocks['left'].iloc[0] != 45:
+        raise ValueError('The first block needs to be an unbiased block of 90 trials')
+    if not blocks['length'].iloc[1:].between(20, 100).all():
+        raise ValueError('The lengths of the biased blocks need to be between 20 and 100 trials')
+    if not np.allclose(np.abs(np.diff(blocks['probability_left'].iloc[1:])), 0.6):
+        raise ValueError('The biased blocks need to alternate between 0.2 and 0.8 probability of a left stimulus')
+    signed_contrast = trials_table['contrast'] * np.sign(trials_table['position'])
+    frequencies = signed_contrast.value_counts(normalize=True).sort_index().values
+    expected = np.ones(2 * len(EPHYSCW_CONTRASTS) - 1)
+    if prob_type == 'uniform':
+        expected[len(EPHYSCW_CONTRASTS) - 1] = 2  # the 0 contrast is drawn on either side
+    expected /= expected.sum()
+    if frequencies.size != expected.size or np.any(np.abs(frequencies / expected - 1) > tolerance):
+        raise ValueError('The frequencies of the signed contrasts deviate from the expected ones')
+
+
+def _make_validated_ephyscw_template(seed: np.random.SeedSequence, prob_type: str, max_attempts: int = 10) -> pd.DataFrame:
+    # runs in the worker processes of make_ephyscw_templates()
+    for seed_attempt in seed.spawn(max_attempts):
+        trials_table = make_ephyscw_template(prob_type=prob_type, rng=np.random.default_rng(seed_attempt))
+        try:
+            validate_ephyscw_template(trials_table, prob_type=prob_type)
+            return trials_table
+        except ValueError as e:
+            log.debug(f'Discarding template: {e}')
+    raise RuntimeError(f'Could not generate a valid template in {max_attempts} attempts')
+
+
+def make_ephyscw_templates(
+    file: str | Path,
+    n_templates: int = 12,
+    seed: int | None = None,
+    prob_type: str = 'biased',
+    max_workers: int | None = None,
+) -> Path:
+    """
+    Generate ephysChoiceWorld session templates and save them as Parquet file.
+
+    The templates are generated and validated in parallel worker processes. Each template is saved as a separate row
+    group so that a single template can be read without loading the whole file, see :func:`read_session_template`.
+
+    Parameters
+    ----------
+    file : str or Path
+        The Parquet file to write.
+    n_templates : int
+        The number of templates to generate.
+    seed : int, optional
+        The seed for the random number generators of the templates.
+    prob_type : str
+        'biased': 0 contrast half has likely to be drawn, 'uniform': 0 contrast as likely as other contrasts
+    max_workers : int, optional
+        The number of worker processes, defaults to the number of processors.
+
+    Returns
+    -------
+    Path
+        The Parquet file.
+    """
+    file = Path(file)
+    seeds = np.random.SeedSequence(seed).spawn(n_templates)
+    writer = None
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        templates = executor.map(_make_validated_ephyscw_template, seeds, [prob_type] * n_templates)
+        try:
+            for session_id, trials_table in enumerate(templates):
+                trials_table.insert(0, 'session_id', session_id)
+                table = pa.Table.from_pandas(trials_table, preserve_index=False)
+                writer = writer or pq.ParquetWriter(file, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+    log.info(f'Saved {n_templates} session templates to {file}')
+    return file
+
+
+def read_session_template(file: str | Path, session_template_id: int) -> pd.DataFrame:
+    """
+    Read a session template from a Parquet file containing several templates.
+
+    Only the row groups that may contain the template are read, see :func:`make_ephyscw_templates`.
+
+    Parameters
+    ----------
+    file : str or Path
+        The Parquet file.
+    session_template_id : int
+        The ID of the template.
+
+    Returns
+    -------
+    pd.DataFrame
+        The trials table of the template.
+    """
+    return pd.read_parquet(file, filters=[('session_id', '==', session_template_id)])
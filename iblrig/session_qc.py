@@ -0,0 +1,184 @@
+"""
+Offline quality control of completed sessions.
+
+:func:`session_metrics` computes a set of quality metrics from a task data jsonable file: the performance, the reward
+delivered, the correlation between reward amounts and valve opening times, the number of trials without sync pulses (as
+in :meth:`iblrig.base_choice_world.ChoiceWorldSession.check_sync_pulses`) and the jitter of the inter-trial intervals.
+
+:func:`make_qc_report` collects the metrics of all sessions within a subjects folder in a single Parquet table. The task
+data files are processed by a pool of processes and the report is updated incrementally: sessions whose task data file
+hasn't changed since the last run are not processed again.
+"""
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from iblrig.raw_data_loaders import load_task_jsonable, states_timestamps_array
+
+log = logging.getLogger(__name__)
+
+TASK_DATA_GLOB = '*/[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]/[0-9][0-9][0-9]/*/_iblrig_taskData.raw.jsonable'
+QC_REPORT_FILE = '_iblrig_qc_report.pqt'
+SYNC_CHANNELS = {'BNC1': 'frame2ttl', 'BNC2': 'sound', 'Port1': 'camera'}
+"""dict: Bpod inputs receiving sync pulses, and the names of the corresponding metrics."""
+
+
+def _column(trials_table: pd.DataFrame, name: str, default: float) -> np.ndarray:
+    """Return a column of the trials table as a float array, filled with a default value if it doesn't exist."""
+    if name in trials_table:
+        return trials_table[name].to_numpy(dtype=float)
+    return np.full(trials_table.shape[0], default)
+
+
+def _missing_sync_pulses(bpod_data: list[dict[str, Any]], name: str) -> int:
+    """Return the number of trials without events on a Bpod input, see :func:`iblrig.misc.get_port_events`."""
+    return sum(not any(name in event for event in trial['Events timestamps']) for trial in bpod_data)
+
+
+def session_metrics(file_task_data: str | Path) -> dict[str, Any]:
+    """
+    Compute the quality metrics of a session.
+
+    Parameters
+    ----------
+    file_task_data : str or Path
+        Full path to the task data jsonable file.
+
+    Returns
+    -------
+    dict
+        Dictionary with keys:
+
+        - n_trials: the number of trials,
+        - performance: the fraction of correct trials,
+        - performance_easy: the fraction of correct trials with a contrast of at least 50 %,
+        - reward_delivered: the total reward amount in µl,
+        - reward_valve_r: the correlation between the reward amounts and the durations of the reward states,
+        - n_missing_frame2ttl, n_missing_sound, n_missing_camera: the number of trials without sync pulses on BNC1, BNC2
+          and Port1 respectively,
+        - iti_median, iti_jitter: the median and standard deviation, in seconds, of the intervals between the end of a
+          trial and the start of the next one.
+
+        Metrics that can't be computed are NaN.
+    """
+    trials_table, bpod_data = load_task_jsonable(file_task_data)
+    n_trials = len(bpod_data)
+    metrics = {'n_trials': n_trials}
+    correct = _column(trials_table, 'trial_correct', np.nan)
+    easy = _column(trials_table, 'contrast', np.nan) >= 0.5
+    metrics['performance'] = np.mean(correct) if n_trials else np.nan
+    metrics['performance_easy'] = np.mean(correct[easy]) if np.any(easy) else np.nan
+    reward_amount = _column(trials_table, 'reward_amount', 0.0)
+    metrics['reward_delivered'] = float(np.sum(reward_amount))
+
+    # the valve opening time should be proportional to the reward amount
+    timestamps, _ = states_timestamps_array(bpod_data, ['reward'])
+    valve_time = np.diff(timestamps[:, 0, :], axis=1).flatten()
+    rewarded = (reward_amount > 0) & ~np.isnan(valve_time)
+    metrics['reward_valve_r'] = np.nan
+    if np.sum(rewarded) > 1 and np.std(reward_amount[rewarded]) > 0 and np.std(valve_time[rewarded]) > 0:
+        metrics['reward_valve_r'] = np.corrcoef(reward_amount[rewarded], valve_time[rewarded])[0, 1]
+
+    for channel, name in SYNC_CHANNELS.items():
+        metrics[f'n_missing_{name}'] = _missing_sync_pulses(bpod_data, channel)
+
+    trial_start = np.array([trial['Trial start timestamp'] for trial in bpod_data])
+    trial_end = np.array([trial['Trial end timestamp'] for trial in bpod_data])
+    iti = trial_start[1:] - trial_end[:-1]
+    metrics['iti_median'] = np.median(iti) if iti.size else np.nan
+    metrics['iti_jitter'] = np.std(iti) if iti.size else np.nan
+    return metrics
+
+
+def _process_task_data(file_task_data: Path) -> dict[str, Any]:
+    """Compute the quality metrics of a session, recording the error if the file can't be processed."""
+    try:
+        return session_metrics(file_task_data) | {'error': None}
+    except Exception as e:
+        return {'error': f'{type(e).__name__}: {e}'}
+
+
+def make_qc_report(
+    subjects_folder: str | Path,
+    file_report: str | Path | None = None,
+    max_workers: int | None = None,
+    force: bool = False,
+) -> pd.DataFrame:
+    """
+    Compute the quality metrics of all sessions within a subjects folder and save them as a Parquet table.
+
+    Parameters
+    ----------
+    subjects_folder : str or Path
+        The subjects folder.
+    file_report : str or Path, optional
+        The Parquet file holding the report. Defaults to `_iblrig_qc_report.pqt` within the subjects folder. If the
+        file exists, the metrics of task data files that haven't changed since are reused.
+    max_workers : int, optional
+        The maximum number of processes. Defaults to the number of processors.
+    force : bool, optional
+        If True, all task data files are processed. Defaults to False.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per task data file, see :func:`session_metrics`, along with the subject, date, number and collection
+        of the protocol. The column `error` holds the error message for files that could not be processed.
+    """
+    subjects_folder = Path(subjects_folder)
+    file_report = Path(file_report) if file_report is not None else subjects_folder.joinpath(QC_REPORT_FILE)
+    files = {}
+    for file_task_data in sorted(subjects_folder.glob(TASK_DATA_GLOB)):
+        stat = file_task_data.stat()
+        files[file_task_data.relative_to(subjects_folder).as_posix()] = (stat.st_mtime_ns, stat.st_size)
+
+    # reuse the metrics of unchanged files
+    previous = pd.DataFrame()
+    if file_report.exists() and not force:
+        try:
+            previous = pd.read_parquet(file_report).set_index('file_task_data')
+        except (OSError, ValueError) as e:
+            log.warning(f'Could not read {file_report} ({e}), all sessions will be processed')
+    unchanged = {
+        file
+        for file, (mtime_ns, size) in files.items()
+        if file in previous.index and (previous.at[file, 'mtime_ns'], previous.at[file, 'size']) == (mtime_ns, size)
+    }
+    pending = [file for file in files if file not in unchanged]
+    log.info(f'{len(files)} task data files found, {len(pending)} to be processed')
+
+    rows = []
+    if pending:
+        paths = [subjects_folder.joinpath(file) for file in pending]
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            chunksize = max(1, len(paths) // (4 * (max_workers or os.cpu_count() or 1)))
+            for i, (file, metrics) in enumerate(
+                zip(pending, executor.map(_process_task_data, paths, chunksize=chunksize), strict=True)
+            ):
+                subject, date, number, collection, _ = file.split('/')
+                mtime_ns, size = files[file]
+                rows.append(
+                    {'file_task_data': file, 'subject': subject, 'date': date, 'number': number, 'task_collection': collection}
+                    | {'mtime_ns': mtime_ns, 'size': size}
+                    | metrics
+                )
+                if metrics['error'] is not None:
+                    log.warning(f'Could not process {file}: {metrics["error"]}')
+                if (i + 1) % 500 == 0:
+                    log.info(f'{i + 1}/{len(pending)} task data files processed')
+
+    report = pd.DataFrame(rows)
+    if unchanged:
+        report = pd.concat([previous.loc[sorted(unchanged)].reset_index(), report], ignore_index=True)
+    if report.shape[0] > 0:
+        report = report.sort_values('file_task_data', ignore_index=True)
+    file_tmp = file_report.with_suffix('.tmp')
+    report.to_parquet(file_tmp, index=False)
+    os.replace(file_tmp, file_report)
+    return report
@@ -1,17 +1,111 @@
+import hashlib
 import logging
+from collections.abc import Sequence
+from pathlib import Path
 
 import numpy as np
+from numpy.typing import DTypeLike
 
+from iblrig.constants import CACHE_PATH
 from pybpod_soundcard_module.module_api import DataType, SampleRate, SoundCardModule
 
 log = logging.getLogger(__name__)
 
+SOUND_CACHE_PATH = CACHE_PATH.joinpath('sounds')
+SOUND_CACHE_VERSION = 1  # increment whenever make_sound() changes the waveforms it renders
+
+
+_TONE_CHANNELS = {'mono': (0,), 'L': (0,), 'R': (1,), 'stereo': (0, 1), 'L+TTL': (0,), 'TTL+R': (1,)}
+_TTL_CHANNEL = {'L+TTL': 1, 'TTL+R': 0}
+
+
+def make_sounds(
+    *,
+    rate: int = 44100,
+    frequencies: float | Sequence[float] = 5000,
+    duration: float = 0.1,
+    amplitudes: float | Sequence[float] = 1,
+    fade: float = 0.01,
+    chans: str = 'L+TTL',
+    dtype: DTypeLike = np.float64,
+    rng: np.random.Generator | None = None,
+) -> np.ndarray:
+    """
+    Render a batch of sounds of equal duration into a single buffer.
+
+    Each sound is synthesized in place in one row of a work buffer, which is then written to the channels of the output.
+    The output is C-contiguous with interleaved channels: it can be passed to :func:`format_sound`,
+    :func:`configure_sound_card` or :meth:`iblrig.hifi.HiFi.load` without further copies.
+
+    Parameters
+    ----------
+    rate : int, optional
+        The sample rate of the sound card, defaults to 44100.
+    frequencies : float or sequence of float, optional
+        The frequency of each sound's tone (Hz). A frequency of -1 creates uniform random white noise. Defaults to 5000.
+    duration : float, optional
+        The duration of the sounds (s), defaults to 0.1.
+    amplitudes : float or sequence of float, optional
+        The amplitude of each sound, between 0 and 1. Defaults to 1.
+    fade : float, optional
+        The duration of the fade-in and fade-out windows of the tones (s), defaults to 0.01.
+    chans : str, optional
+        The channel layout, one of 'mono', 'L', 'R', 'stereo', 'L+TTL' or 'TTL+R'. Defaults to 'L+TTL'.
+    dtype : numpy dtype, optional
+        The dtype of the output. Integer dtypes are scaled to their full range, as in :func:`format_sound`. Defaults
+        to float64.
+    rng : numpy.random.Generator, optional
+        Random number generator for the white noise. Defaults to NumPy's global random state.
+
+    Returns
+    -------
+    np.ndarray
+        The sounds, with shape (n_sounds, n_samples, n_channels). There is one channel for 'mono' and two otherwise.
+    """
+    chans = chans if isinstance(chans, str) else chans[0]
+    frequencies = np.atleast_1d(frequencies)
+    amplitudes = np.broadcast_to(amplitudes, frequencies.shape)
+    n_samples = int(duration * rate)
+    tvec = np.linspace(0, duration, n_samples)
+    len_fade = int(fade * rate)
+    fade_io = np.hanning(len_fade * 2)
+
+    # synthesize the sounds in place, one row per sound
+    work = np.empty((frequencies.size, n_samples))
+    for row, frequency, amplitude in zip(work, frequencies, amplitudes, strict=True):
+        if frequency == -1:
+            if rng is None:
+                np.multiply(np.random.rand(n_samples), amplitude, out=row)
+            else:
+                rng.random(out=row)
+                np.multiply(row, amplitude, out=row)
+            continue
+        np.multiply(tvec, 2 * np.pi * frequency, out=row)
+        np.sin(row, out=row)
+        np.multiply(row, amplitude, out=row)
+        if len_fade > 0:
+            np.multiply(row[:len_fade], fade_io[:len_fade], out=row[:len_fade])
+            np.multiply(row[-len_fade:], fade_io[len_fade:], out=row[-len_fade:])
+
+    # write the sounds and the TTL to the channels of the output buffer
+    dtype = np.dtype(dtype)
+    scale = np.iinfo(dtype).max if dtype.kind in 'iu' else 1
+    sounds = np.zeros((frequencies.size, n_samples, 1 if chans == 'mono' else 2), dtype=dtype)
+    for channel in _TONE_CHANNELS[chans]:
+        np.multiply(work, scale, out=sounds[:, :, channel], casting='unsafe')
+    if chans in _TTL_CHANNEL:
+        one_ms = round(rate / 1000) * 10
+        sounds[:, :one_ms, _TTL_CHANNEL[chans]] = 0.99 * scale
+    return sounds
+
 
 def make_sound(rate=44100, frequency=5000, duration=0.1, amplitude=1, fade=0.01, chans='L+TTL'):
     """
     Build sounds and save bin file for upload to soundcard or play via
     sounddevice lib.
 
+    See :func:`make_sounds` for rendering several sounds at once.
+
     :param rate: sample rate of the soundcard use 96000 for Bpod,
                     defaults to 44100 for soundcard
     :type rate: int, optional
@@ -30,43 +124,79 @@ def make_sound(rate=44100, frequency=5000, duration=0.1, amplitude=1, fade=0.01,
     :return: streo sound from mono definitions
     :rtype: np.ndarray with shape (Nsamples, 2)
     """
-    sample_rate = rate  # Sound card dependent,
-    tone_duration = duration  # sec
-    fade_duration = fade  # sec
+    sounds = make_sounds(rate=rate, frequencies=frequency, duration=duration, amplitudes=amplitude, fade=fade, chans=chans)
+    return sounds[0, :, 0] if sounds.shape[2] == 1 else sounds[0]
+
+
+def sound_cache_key(*, rate, frequency, duration, amplitude, fade, chans) -> str:
+    """
+    Get the key identifying a waveform rendered by :func:`make_sound` in the sound cache.
+
+    Parameters
+    ----------
+    rate, frequency, duration, amplitude, fade, chans
+        The arguments passed to :func:`make_sound`.
+
+    Returns
+    -------
+    str
+        The SHA-1 digest of the arguments.
+    """
     chans = chans if isinstance(chans, str) else chans[0]
-    tvec = np.linspace(0, tone_duration, int(tone_duration * sample_rate))
-    tone = amplitude * np.sin(2 * np.pi * frequency * tvec)  # tone vec
+    parameters = (SOUND_CACHE_VERSION, float(rate), float(frequency), float(duration), float(amplitude), float(fade), chans)
+    return hashlib.sha1(repr(parameters).encode()).hexdigest()
 
-    len_fade = int(fade_duration * sample_rate)
-    fade_io = np.hanning(len_fade * 2)
-    fadein = fade_io[:len_fade]
-    fadeout = fade_io[len_fade:]
-    win = np.ones(len(tvec))
-    win[:len_fade] = fadein
-    win[-len_fade:] = fadeout
-
-    tone = tone * win
-    ttl = np.ones(len(tone)) * 0.99
-    one_ms = round(sample_rate / 1000) * 10
-    ttl[one_ms:] = 0
-    null = np.zeros(len(tone))
-
-    if frequency == -1:
-        tone = amplitude * np.random.rand(tone.size)
-
-    if chans == 'mono':
-        sound = np.array(tone)
-    elif chans == 'L':
-        sound = np.array([tone, null]).T
-    elif chans == 'R':
-        sound = np.array([null, tone]).T
-    elif chans == 'stereo':
-        sound = np.array([tone, tone]).T
-    elif chans == 'L+TTL':
-        sound = np.array([tone, ttl]).T
-    elif chans == 'TTL+R':
-        sound = np.array([ttl, tone]).T
 
+def make_sound_cached(
+    *,
+    rate=44100,
+    frequency=5000,
+    duration=0.1,
+    amplitude=1,
+    fade=0.01,
+    chans='L+TTL',
+    cache_dir: str | Path | None = SOUND_CACHE_PATH,
+    cache_white_noise: bool = False,
+) -> np.ndarray:
+    """
+    Build a sound with :func:`make_sound`, re-using the waveform rendered by a previous call with the same arguments.
+
+    The waveforms are stored as NumPy files in `cache_dir`, keyed by their arguments (see :func:`sound_cache_key`). White
+    noise (frequency -1) is rendered anew by default, as a cached noise would be identical across sessions.
+
+    Parameters
+    ----------
+    rate, frequency, duration, amplitude, fade, chans
+        The arguments passed to :func:`make_sound`.
+    cache_dir : str or Path, optional
+        The directory containing the rendered waveforms. If None, the sound is rendered without using the cache.
+    cache_white_noise : bool, optional
+        Whether to cache white noise too, re-using the same noise in each session. Defaults to False.
+
+    Returns
+    -------
+    np.ndarray
+        The sound, as returned by :func:`make_sound`.
+    """
+    kwargs = dict(rate=rate, frequency=frequency, duration=duration, amplitude=amplitude, fade=fade, chans=chans)
+    if cache_dir is None or (frequency == -1 and not cache_white_noise):
+        return make_sound(**kwargs)
+    cache_file = Path(cache_dir).joinpath(f'{sound_cache_key(**kwargs)}.npy')
+    try:
+        return np.load(cache_file)
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        log.warning(f'Could not read cached sound {cache_file.name}: {e}')
+    sound = make_sound(**kwargs)
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = cache_file.with_suffix('.tmp')
+        with open(temp_file, 'wb') as f:
+            np.save(f, sound)
+        temp_file.replace(cache_file)
+    except OSError as e:
+        log.warning(f'Could not cache sound {cache_file.name}: {e}')
     return sound
 
 
@@ -83,7 +213,8 @@ def format_sound(sound, file_path=None, flat=False):
     :param file_path: full path of file. [default: None]
     :type file_path: str
     """
-    bin_sound = (sound * ((2**31) - 1)).astype(np.int32)
+    # sounds rendered by make_sounds(..., dtype=np.int32) are already scaled
+    bin_sound = sound if sound.dtype == np.int32 else (sound * ((2**31) - 1)).astype(np.int32)
 
     if bin_sound.flags.f_contiguous:
         bin_sound = np.ascontiguousarray(bin_sound)
@@ -96,7 +227,7 @@ def format_sound(sound, file_path=None, flat=False):
             bf.writelines(bin_save)
             bf.flush()
 
-    return bin_sound.flatten() if flat else bin_sound
+    return bin_sound.ravel() if flat else bin_sound
 
 
 def configure_sound_card(card=None, sounds=None, indexes=None, sample_rate=96):
@@ -0,0 +1,363 @@
+"""
+Per-subject index of previous sessions.
+
+Finding the previous sessions of a given protocol requires globbing all session folders of a subject and parsing the
+experiment description and task settings files of each session. On a network share this can take several seconds.
+:class:`SubjectHistory` keeps this information, along with a summary of each protocol's trials, in an index file. Entries
+of the index are validated against the modification time and size of the underlying files and are only re-read if those
+have changed. The index of a local subject folder is stored within the folder, while the index of a subject folder on the
+server is stored on the rig, next to the local index: it is never written to the server.
+"""
+
+import json
+import logging
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from ibllib.io import session_params
+from ibllib.io.raw_data_loaders import load_settings
+from iblrig.raw_data_loaders import load_task_arrow, load_task_jsonable
+from iblrig.trial_store import arrow_file_from_jsonable
+from iblutil.util import Bunch
+from one.alf.spec import is_session_path
+
+log = logging.getLogger(__name__)
+
+HISTORY_FILE = '.iblrig_subject_history.json'
+REMOTE_HISTORY_FILE = '.iblrig_subject_history_remote.json'
+INDEX_VERSION = 1
+DATE_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+
+def _signature(file_path: Path) -> list[int] | None:
+    """Return modification time and size of a file or folder, or None if it doesn't exist."""
+    try:
+        stat = file_path.stat()
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _protocol_number(x: dict) -> int:
+    """Return protocol number.
+
+    Use 'protocol_number' key if present (unlikely), otherwise use collection name.
+    """
+    i = (x or {}).get('collection', '00').split('_')
+    collection_int = int(i[-1]) if i[-1].isnumeric() else 0
+    return x.get('protocol_number', collection_int)
+
+
+def _jsonable_layout(file_task_data: Path) -> tuple[int, set[str]]:
+    """Return the number of trials of a task data jsonable file and the fields of its first trial."""
+    ntrials, fields = 0, set()
+    with open(file_task_data, 'rb') as fp:
+        for line in fp:
+            if ntrials == 0:
+                fields = set(json.loads(line))
+            ntrials += 1
+    return ntrials, fields
+
+
+def summarize_task_data(file_task_data: str | Path) -> dict[str, Any]:
+    """
+    Summarize the trials of a protocol.
+
+    Parameters
+    ----------
+    file_task_data : str or Path
+        Full path to the task data jsonable file. If available, the columnar trial store is read instead, unless its
+        number of trials or its columns don't match the jsonable file.
+
+    Returns
+    -------
+    dict
+        Dictionary with keys: ntrials, reward_delivered, training_phase, n_responses.
+    """
+    columns = ['reward_amount', 'training_phase', 'response_side']
+    file_arrow = arrow_file_from_jsonable(file_task_data)
+    trials_data = None
+    if file_arrow.exists():
+        try:
+            trials_data = load_task_arrow(file_arrow, columns=columns)
+        except (OSError, ValueError) as e:  # pyarrow's errors derive from these
+            log.warning(f'Could not read {file_arrow.name}: {e}')
+        else:
+            ntrials, fields = _jsonable_layout(Path(file_task_data))
+            if trials_data.shape[0] != ntrials or set(columns).intersection(fields).difference(trials_data.columns):
+                log.warning(f'{file_arrow.name} does not match {Path(file_task_data).name}, the jsonable file is read instead')
+                trials_data = None
+    if trials_data is None:
+        trials_data, _ = load_task_jsonable(file_task_data)
+    ntrials = trials_data.shape[0]
+    return {
+        'ntrials': ntrials,
+        'reward_delivered': float(trials_data['reward_amount'].sum()) if 'reward_amount' in trials_data else 0.0,
+        'training_phase': trials_data['training_phase'].values[-1].item()
+        if 'training_phase' in trials_data and ntrials > 0
+        else None,
+        'n_responses': int(np.sum(trials_data['response_side'] != 0)) if 'response_side' in trials_data else 0,
+    }
+
+
+class SubjectHistory:
+    """
+    Index of the sessions within a subject folder.
+
+    The index is updated lazily: new and removed sessions are detected through the modification time of the date
+    folders, while the experiment description, task settings and trials summary of a session are only re-read when they
+    are accessed and their files have changed.
+
+    Examples
+    --------
+    >>> history = SubjectHistory('/mnt/s0/Data/Subjects/SW_001')
+    >>> last_session = history.iterate_protocols('_iblrig_tasks_trainingChoiceWorld', n=1)[0]
+    >>> history.trials_summary(last_session['session_path'], last_session['task_collection'])
+    """
+
+    def __init__(self, subject_folder: str | Path, file_index: str | Path | None = None):
+        """
+        Index of the sessions within a subject folder.
+
+        Parameters
+        ----------
+        subject_folder : str or Path
+            A subject folder containing dated folders.
+        file_index : str or Path, optional
+            The index file. Defaults to `.iblrig_subject_history.json` within the subject folder. Subject folders on the
+            server should be indexed in a local file, as the server is shared between rigs.
+        """
+        self.subject_folder = Path(subject_folder)
+        self._file_index = self.subject_folder.joinpath(HISTORY_FILE) if file_index is None else Path(file_index)
+        self._index: dict[str, Any] = {'version': INDEX_VERSION, 'dates': {}, 'sessions': {}}
+        self._modified = False
+        self._load()
+
+    @property
+    def file_index(self) -> Path:
+        """Path: The index file."""
+        return self._file_index
+
+    def iterate_protocols(self, task_name: str, n: int = 1, min_trials: int = 43) -> list[Bunch]:
+        """
+        Return information on the last n sessions with matching protocol.
+
+        Parameters
+        ----------
+        task_name : str
+            The task protocol name to look for.
+        n : int
+            The number of previous protocols to return.
+        min_trials : int
+            Skips sessions with fewer than this number of trials.
+
+        Returns
+        -------
+        list[Bunch]
+            list of dictionaries with keys: session_stub, session_path, task_collection, experiment_description,
+            task_settings, file_task_data, file_subject_history.
+        """
+        protocols = []
+        if not self.subject_folder.exists():
+            return protocols
+        self._update_dates()
+        for session in sorted(self._index['sessions'], reverse=True):
+            session_path = self.subject_folder.joinpath(session)
+            record = self._update_session(session)
+            for description_file in sorted(record['descriptions'], reverse=True):
+                ad = record['descriptions'][description_file]['experiment_description']
+                # reversed: we look for the last task first if the protocol ran twice
+                tasks = filter(None, map(lambda x: x.get(task_name), ad.get('tasks', [])))
+                for adt in sorted(tasks, key=_protocol_number, reverse=True):
+                    if not (task_settings := self._update_collection(record, session_path, adt['collection'])):
+                        continue
+                    if task_settings.get('NTRIALS', min_trials + 1) < min_trials:  # ignore sessions with too few trials
+                        continue
+                    protocols.append(
+                        Bunch(
+                            {
+                                'session_stub': '_'.join(session_path.parts[-2:]),  # 2019-01-01_001
+                                'session_path': session_path,
+                                'task_collection': adt['collection'],
+                                'experiment_description': ad,
+                                'task_settings': task_settings,
+                                'file_task_data': session_path.joinpath(adt['collection'], '_iblrig_taskData.raw.jsonable'),
+                                'file_subject_history': self.file_index,
+                            }
+                        )
+                    )
+                    if len(protocols) >= n:
+                        self.save()
+                        return protocols
+        self.save()
+        return protocols
+
+    def trials_summary(self, session_path: str | Path, task_collection: str) -> dict[str, Any]:
+        """
+        Return the summary of a protocol's trials, see :func:`summarize_task_data`.
+
+        Parameters
+        ----------
+        session_path : str or Path
+            The session folder, within the subject folder.
+        task_collection : str
+            The collection of the protocol, e.g. `raw_task_data_00`.
+
+        Returns
+        -------
+        dict
+            Dictionary with keys: ntrials, reward_delivered, training_phase, n_responses.
+
+        Raises
+        ------
+        FileNotFoundError
+            If the protocol doesn't have a task data file.
+        """
+        session_path = Path(session_path)
+        file_task_data = session_path.joinpath(task_collection, '_iblrig_taskData.raw.jsonable')
+        if (signature := _signature(file_task_data)) is None:
+            raise FileNotFoundError(file_task_data)
+        session = session_path.relative_to(self.subject_folder).as_posix()
+        record = self._index['sessions'].setdefault(session, {})
+        entry = record.setdefault('collections', {}).setdefault(task_collection, {})
+        if signature != entry.get('data_signature'):
+            entry['trials_summary'] = summarize_task_data(file_task_data)
+            entry['data_signature'] = signature
+            self._modified = True
+            self.save()
+        return entry['trials_summary']
+
+    def update_session(self, session_path: str | Path, task_collection: str) -> None:
+        """
+        Update the index with a finished protocol.
+
+        Parameters
+        ----------
+        session_path : str or Path
+            The session folder, within the subject folder.
+        task_collection : str
+            The collection of the protocol, e.g. `raw_task_data_00`.
+        """
+        session_path = Path(session_path)
+        self._update_dates()
+        session = session_path.relative_to(self.subject_folder).as_posix()
+        self._index['sessions'].setdefault(session, {})
+        self._update_collection(self._update_session(session), session_path, task_collection)
+        if session_path.joinpath(task_collection, '_iblrig_taskData.raw.jsonable').exists():
+            self.trials_summary(session_path, task_collection)
+        self.save()
+
+    def save(self) -> None:
+        """Save the index if it has been modified."""
+        if not self._modified:
+            return
+        file_tmp = None
+        try:
+            # the temporary file is unique, the index may be saved by several processes at once
+            with tempfile.NamedTemporaryFile(
+                'w', dir=self.file_index.parent, prefix=f'{self.file_index.name}.', suffix='.tmp', delete=False
+            ) as fp:
+                file_tmp = Path(fp.name)
+                json.dump(self._index, fp, default=str)
+            os.replace(file_tmp, self.file_index)  # atomic, the index is never read partially written
+        except OSError as e:
+            log.debug(f'Could not save {self.file_index}: {e}')
+            if file_tmp is not None:
+                file_tmp.unlink(missing_ok=True)
+        else:
+            self._modified = False
+
+    def _load(self) -> None:
+        if not self.file_index.exists():
+            return
+        try:
+            with open(self.file_index) as fp:
+                index = json.load(fp)
+        except (OSError, ValueError):
+            log.warning(f'Could not load {self.file_index}, the subject folder will be indexed from scratch')
+            return
+        if index.get('version') == INDEX_VERSION:
+            self._index = index
+
+    def _update_dates(self) -> None:
+        """Detect new and removed sessions through the modification time of the date folders."""
+        dates = {}
+        with os.scandir(self.subject_folder) as it:
+            for entry in it:
+                if DATE_PATTERN.fullmatch(entry.name) and entry.is_dir():
+                    dates[entry.name] = entry.stat().st_mtime_ns
+        if dates == self._index['dates']:
+            return
+        sessions = self._index['sessions']
+        for date in set(self._index['dates']).union(dates):
+            if date in dates and self._index['dates'].get(date) == dates[date]:
+                continue
+            current = {s for s in sessions if s.startswith(f'{date}/')}
+            found = set()
+            if date in dates:
+                date_folder = self.subject_folder.joinpath(date)
+                found = {
+                    f'{date}/{p.name}'
+                    for p in date_folder.iterdir()
+                    if p.is_dir() and is_session_path(Path(self.subject_folder.name, date, p.name))
+                }
+            for session in current - found:
+                sessions.pop(session)
+            for session in found - current:
+                sessions[session] = {}
+        self._index['dates'] = dates
+        self._modified = True
+
+    def _update_session(self, session: str) -> dict[str, Any]:
+        """Update the experiment descriptions of a session if they have changed."""
+        record = self._index['sessions'][session]
+        session_path = self.subject_folder.joinpath(session)
+        # the folder's modification time changes when files are added or removed
+        if (signature := _signature(session_path)) != record.get('signature'):
+            names = {f.name for f in session_path.glob('_ibl_experiment.description*.yaml')}
+            descriptions = record.get('descriptions', {})
+            record['descriptions'] = {name: descriptions.get(name, {}) for name in names}
+            record['signature'] = signature
+            self._modified = True
+        for name, description in record['descriptions'].items():
+            if (signature := _signature(session_path.joinpath(name))) != description.get('signature'):
+                description['experiment_description'] = session_params.read_params(session_path.joinpath(name)) or {}
+                description['signature'] = signature
+                self._modified = True
+        record.setdefault('collections', {})
+        return record
+
+    def _update_collection(self, record: dict[str, Any], session_path: Path, collection: str) -> dict[str, Any] | None:
+        """Update the task settings of a protocol if they have changed and return them."""
+        entry = record['collections'].setdefault(collection, {})
+        signature = _signature(session_path.joinpath(collection, '_iblrig_taskSettings.raw.json'))
+        if 'task_settings' not in entry or signature != entry.get('settings_signature'):
+            entry['task_settings'] = load_settings(session_path, task_collection=collection) if signature else None
+            entry['settings_signature'] = signature
+            self._modified = True
+        return entry['task_settings']
+
+
+def get_trials_summary(session_info: dict) -> dict[str, Any]:
+    """
+    Return the summary of a previous protocol's trials.
+
+    Parameters
+    ----------
+    session_info : dict
+        A previous protocol, as returned by :func:`iblrig.path_helper.iterate_previous_sessions`. The summary is stored
+        in the index the protocol was found in.
+
+    Returns
+    -------
+    dict
+        Dictionary with keys: ntrials, reward_delivered, training_phase, n_responses.
+    """
+    session_path = Path(session_info['session_path'])
+    history = SubjectHistory(session_path.parents[1], file_index=session_info.get('file_subject_history'))
+    return history.trials_summary(session_path, session_info['task_collection'])
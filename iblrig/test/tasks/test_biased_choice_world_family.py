@@ -1,15 +1,31 @@
 import datetime
 import time
+from unittest import mock
 
 import numpy as np
 import pandas as pd
 
+from iblrig.hardware import Bpod
 from iblrig.raw_data_loaders import load_task_jsonable
 from iblrig.test.base import PATH_FIXTURES, BaseTestCases, IntegrationFullRuns
 from iblrig_tasks._iblrig_tasks_biasedChoiceWorld.task import Session as BiasedChoiceWorldSession
 from iblrig_tasks._iblrig_tasks_ephysChoiceWorld.task import Session as EphysChoiceWorldSession
 from iblrig_tasks._iblrig_tasks_ImagingChoiceWorld.task import Session as ImagingChoiceWorldSession
 from iblrig_tasks._iblrig_tasks_neuroModulatorChoiceWorld.task import Session as NeuroModulatorChoiceWorldSession
+from pybpodapi.bpod.hardware.hardware import Hardware
+from pybpodapi.bpod_modules.bpod_module import BpodModule
+
+
+def get_hardware() -> Hardware:
+    """Describe a Bpod 2.x with a rotary encoder and a sound card, as obtained from a connected device."""
+    hardware = Hardware()
+    hardware.max_states, hardware.cycle_period, hardware.max_serial_events = 256, 100, 60
+    hardware.n_global_timers, hardware.n_global_counters, hardware.n_conditions = 16, 8, 16
+    hardware.inputs, hardware.outputs = 'UUUXBBWWPPPP', 'UUUXVVVVBBWWPPPP'
+    hardware.inputs_enabled = [1] * len(hardware.inputs)
+    modules = [BpodModule(True, 'RotaryEncoder1', n_serial_events=15), BpodModule(True, 'SoundCard1', n_serial_events=15)]
+    hardware.setup(modules + [BpodModule(n_serial_events=15)])
+    return hardware
 
 
 class TestInstantiationBiased(BaseTestCases.CommonTestInstantiateTask):
@@ -68,6 +84,28 @@ class TestInstantiationBiased(BaseTestCases.CommonTestInstantiateTask):
         # assert quiescent period
         self.check_quiescent_period()
 
+    def test_state_machine_templates(self):
+        """Check that the state machines rendered from the templates are identical to the ones built for each trial."""
+        task = self.task
+        task.mock()
+        del task.get_state_machine_template_key  # the mock builds the state machine of each trial
+        actions = {action: ('Serial1', 1) for action in task.bpod.actions if action.startswith(('bonsai', 'rotary'))}
+        actions.update({action: ('Serial2', 1) for action in ('play_tone', 'play_noise', 'stop_sound')})
+        with (
+            mock.patch.object(Bpod, 'hardware', get_hardware()),
+            mock.patch.object(task.bpod, 'serialize_state_machine', Bpod.serialize_state_machine),
+            mock.patch.dict(task.bpod.actions, actions),
+        ):
+            for i in range(20):
+                self.next_trial()
+                sma, message = task._get_serialized_state_machine(i)
+                self.assertEqual(message, Bpod.serialize_state_machine(task.get_state_machine_trial(i)))
+        # the state machines of the first trial and of each stimulus position
+        self.assertGreaterEqual(len(task._state_machine_templates), 3)
+
+    def next_trial(self):
+        self.task.next_trial()
+
     def check_quiescent_period(self):
         """
         Check the quiescence period
@@ -127,6 +165,11 @@ class TestNeuroModulatorBiasedChoiceWorld(TestInstantiationBiased):
         # we expect 10% of null feedback trials
         assert np.abs(0.05 - np.mean(self.task.trials_table['omit_feedback'])) < 0.05
 
+    def next_trial(self):
+        # make sure that the state machines with and without feedback are both covered
+        super().next_trial()
+        self.task.trials_table.at[self.task.trial_num, 'omit_feedback'] = self.task.trial_num % 3 == 1
+
 
 class TestIntegrationFullRun(IntegrationFullRuns):
     def setUp(self) -> None:
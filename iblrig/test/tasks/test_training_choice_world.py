@@ -51,7 +51,7 @@ class TestTrainingPhaseChoiceWorld(BaseTestCases.CommonTestInstantiateTask):
                 )
                 np.testing.assert_equal(trials_table['stim_probability_left'].values, 0.5)
                 np.testing.assert_equal(np.unique(trials_table['reward_amount'].values), np.array([0, adaptive_reward]))
-                np.testing.assert_equal(trials_table['training_phase'].values, training_phase)
+                np.testing.assert_equal(trials_table['training_phase'].to_numpy(), training_phase)
                 debias = True
                 probas = 1
                 match training_phase:
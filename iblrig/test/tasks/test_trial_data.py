@@ -0,0 +1,95 @@
+import os
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from iblrig.raw_data_loaders import load_task_arrow, load_task_jsonable
+from iblrig.test.base import BaseTestCases
+from iblrig.test.tasks.test_biased_choice_world_family import get_fixtures
+from iblrig.trial_store import arrow_file_from_jsonable
+from iblrig_tasks._iblrig_tasks_advancedChoiceWorld.task import Session as AdvancedChoiceWorldSession
+from iblrig_tasks._iblrig_tasks_biasedChoiceWorld.task import Session as BiasedChoiceWorldSession
+from iblrig_tasks._iblrig_tasks_neuroModulatorChoiceWorld.task import Session as NeuroModulatorChoiceWorldSession
+from iblrig_tasks._iblrig_tasks_trainingChoiceWorld.task import Session as TrainingChoiceWorldSession
+
+
+class TestSaveTrialData(BaseTestCases.CommonTestTask):
+    task_classes = {
+        'biased': BiasedChoiceWorldSession,
+        'training': TrainingChoiceWorldSession,
+        'neuroModulator': NeuroModulatorChoiceWorldSession,
+        'advanced': AdvancedChoiceWorldSession,
+    }
+
+    def setUp(self) -> None:
+        self.get_task_kwargs()
+
+    def run_task(self, task, ntrials: int) -> None:
+        """Run a mock task for a number of trials."""
+        trial_fixtures = get_fixtures()
+        for _ in range(ntrials):
+            task.next_trial()
+            trial_type = np.random.choice(['correct', 'error', 'no_go'], p=[0.9, 0.05, 0.05])
+            task.trial_completed(trial_fixtures[trial_type])
+
+    def test_save_trial_data(self):
+        """The data of each trial is validated and written to the task data file."""
+        ntrials = 200
+        for name, task_class in self.task_classes.items():
+            with self.subTest(task=name):
+                np.random.seed(2024)
+                task = task_class(**self.task_kwargs)
+                task.create_session()
+                with mock.patch.object(task, 'save_trial_data_to_json', wraps=task.save_trial_data_to_json) as save:
+                    self.run_task(task, ntrials)
+                self.assertEqual(save.call_count, ntrials)
+                # the trials are written in the background and can be read back once flushed
+                task.flush_trial_data(close=True)
+                self.assertTrue(task.paths.SESSION_FOLDER.joinpath('transfer_me.flag').exists())
+                trials_table, bpod_data = load_task_jsonable(task.paths.DATA_FILE_PATH)
+                self.assertEqual(ntrials, trials_table.shape[0])
+                self.assertEqual(ntrials, len(bpod_data))
+                np.testing.assert_array_equal(trials_table['trial_num'], np.arange(ntrials))
+
+    @unittest.skipUnless(os.environ.get('IBLRIG_BENCHMARK'), 'set IBLRIG_BENCHMARK=1 to run the benchmarks')
+    def test_save_trial_data_benchmark(self):
+        """Print the time taken by save_trial_data_to_json, without asserting as timings depend on the machine."""
+        ntrials = 200
+        for name, task_class in self.task_classes.items():
+            with self.subTest(task=name):
+                np.random.seed(2024)
+                task = task_class(**self.task_kwargs)
+                task.create_session()
+                durations = []
+                save_trial_data_to_json = task.save_trial_data_to_json
+
+                def timed_save_trial_data_to_json(*args, save=save_trial_data_to_json, durations=durations, **kwargs):
+                    t0 = time.perf_counter()
+                    save(*args, **kwargs)
+                    durations.append(time.perf_counter() - t0)
+
+                with mock.patch.object(task, 'save_trial_data_to_json', side_effect=timed_save_trial_data_to_json):
+                    self.run_task(task, ntrials)
+                task.flush_trial_data(close=True)
+                print(
+                    f'{name}ChoiceWorld save_trial_data_to_json: {np.median(durations) * 1e6:.0f} µs/trial (median), '
+                    f'{np.max(durations) * 1e6:.0f} µs/trial (max)'
+                )
+
+    def test_save_trial_data_arrow(self):
+        """All trials are stored in the Arrow stream, although their states and events differ."""
+        ntrials = 50
+        np.random.seed(2024)
+        task = TrainingChoiceWorldSession(**self.task_kwargs)
+        task.task_params.SAVE_TRIAL_DATA_ARROW = True
+        task.create_session()
+        self.run_task(task, ntrials)
+        task.flush_trial_data(close=True)
+        trials_table, bpod_data = load_task_jsonable(task.paths.DATA_FILE_PATH)
+        trials_arrow = load_task_arrow(arrow_file_from_jsonable(task.paths.DATA_FILE_PATH))
+        self.assertEqual(ntrials, trials_arrow.shape[0])
+        np.testing.assert_array_equal(trials_arrow['reward_amount'], trials_table['reward_amount'])
+        for event in {event for trial in bpod_data for event in trial['Events timestamps']}:
+            self.assertIn(f'event_{event}', trials_arrow.columns)
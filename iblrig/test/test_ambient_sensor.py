@@ -0,0 +1,68 @@
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from iblrig.ambient_sensor import AMBIENT_SENSOR_DTYPE, AMBIENT_SENSOR_FILE, AmbientSensorSampler
+
+
+class TestAmbientSensorSampler(unittest.TestCase):
+    def setUp(self):
+        self.nreads = 0
+        self.reading = threading.Event()  # set while the fake module is being read
+
+    def _read(self) -> dict[str, float]:
+        self.reading.set()
+        time.sleep(0.01)
+        self.nreads += 1
+        self.reading.clear()
+        return {'Temperature_C': 20.0 + self.nreads, 'AirPressure_mb': 1000.0, 'RelativeHumidity': 50.0}
+
+    def test_sampler(self):
+        sampler = AmbientSensorSampler(self._read, interval_s=0.02, min_window_s=0.015, capacity=2)
+        self.assertTrue(np.isnan(list(sampler.latest().values())).all())
+        sampler.start()
+        self.addCleanup(sampler.stop)
+        self.assertEqual(sampler.nsamples, 1)
+        self.assertEqual(sampler.latest()['Temperature_C'], 21.0)
+
+        # the module is not read outside the sampling windows
+        time.sleep(0.1)
+        self.assertEqual(sampler.nsamples, 1)
+        with sampler.window(0.2):
+            time.sleep(0.2)
+        self.assertFalse(self.reading.is_set())
+        self.assertGreater(sampler.nsamples, 3)
+        nsamples = sampler.nsamples
+        # the window is too short for a reading to complete
+        with sampler.window(0.01):
+            time.sleep(0.1)
+        self.assertEqual(sampler.nsamples, nsamples)
+        with sampler.window():
+            time.sleep(0.1)
+        sampler.stop()
+        self.assertFalse(self.reading.is_set())
+
+        # the preallocated array has been grown
+        samples = sampler.samples
+        self.assertEqual(samples.dtype, AMBIENT_SENSOR_DTYPE)
+        self.assertEqual(samples.size, self.nreads)
+        np.testing.assert_array_equal(samples['Temperature_C'], 20.0 + np.arange(1, self.nreads + 1))
+        self.assertTrue(np.all(np.diff(samples['timestamp']) >= 0.019))
+        self.assertEqual(sampler.latest()['Temperature_C'], samples['Temperature_C'][-1])
+        with tempfile.TemporaryDirectory() as tmpdir:
+            file_path = Path(tmpdir).joinpath(AMBIENT_SENSOR_FILE)
+            sampler.save(file_path)
+            saved = pd.read_csv(file_path)
+        self.assertEqual(saved.columns.tolist(), list(AMBIENT_SENSOR_DTYPE.names))
+        np.testing.assert_allclose(saved['Temperature_C'], samples['Temperature_C'])
+
+    def test_read_error(self):
+        sampler = AmbientSensorSampler(lambda: 1 / 0)
+        with self.assertLogs('iblrig.ambient_sensor', 'WARNING'):
+            sampler.sample()
+        self.assertEqual(sampler.nsamples, 0)
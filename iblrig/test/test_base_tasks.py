@@ -17,6 +17,7 @@ import yaml
 
 import ibllib.io.session_params as ses_params
 from ibllib.io.session_params import read_params
+from iblrig.ambient_sensor import AMBIENT_SENSOR_FILE
 from iblrig.base_choice_world import BiasedChoiceWorldSession, ChoiceWorldSession
 from iblrig.base_tasks import BaseSession, BonsaiRecordingMixin
 from iblrig.misc import _post_parse_arguments, get_task_argument_parser
@@ -246,6 +247,19 @@ class TestRun(BaseTestCases.CommonTestTask):
         self.assertIsNone(second_task.session_info['SUBJECT_WEIGHT'])
         self.assertEqual(35, second_task.session_info['POOP_COUNT'])
 
+    def test_trial_data_error(self):
+        """Test that an error writing the trial data doesn't hide the error of the task."""
+        self.task_kwargs['interactive'] = False
+        self.task = EmptyHardwareSession(**self.task_kwargs)
+        with (
+            mock.patch.object(self.task, '_run', side_effect=ValueError('task error')),
+            mock.patch.object(self.task, 'flush_trial_data', side_effect=OSError('writer error')),
+            self.assertLogs('iblrig.base_tasks', 'ERROR') as lg,
+            self.assertRaises(ValueError),
+        ):
+            self.task.run()
+        self.assertIn('writer error', lg.output[-1])
+
 
 class _PauseChoiceWorldSession(ChoiceWorldSession):
     protocol_name = 'pause_session_for_testing'
@@ -313,6 +327,33 @@ class TestBaseChoiceWorld(BaseTestCases.CommonTestTask):
         (idx,) = np.where(self.task.trials_table['pause_duration'][: self.task.task_params.NTRIALS] > 0)
         self.assertCountEqual(idx, [self.task.pause_trial], 'failed to correctly update pause_duration field')
 
+    def test_ambient_sensor_sampling(self):
+        """Test that the ambient module is read in between the trials with the default inter-trial parameters."""
+        self.task = _PauseChoiceWorldSession(**self.task_kwargs)
+        self.task.mock(file_jsonable_fixture=PATH_FIXTURES.joinpath('task_data_short.jsonable'))
+        self.task.task_params.NTRIALS = 10
+        self.task.task_params.AMBIENT_SENSOR_INTERVAL_SECS = 0
+        self.assertGreaterEqual(self.task.task_params.DEAD_TIME, self.task.task_params.ITI_DELAY_SECS)
+        readings = []
+
+        def read():
+            readings.append({'Temperature_C': 20.0 + len(readings), 'AirPressure_mb': 1000.0, 'RelativeHumidity': 50.0})
+            return readings[-1]
+
+        with (
+            mock.patch('iblrig.hardware.Bpod.ambient_module', new_callable=mock.PropertyMock),
+            mock.patch.object(self.task.bpod, 'get_ambient_sensor_reading', side_effect=read),
+            mock.patch.object(self.task, '_get_serialized_state_machine', return_value=(None, b'')),
+        ):
+            self.task.run()
+        # the module is read after each trial in addition to the reading before the first trial
+        self.assertEqual(self.task.ambient_sensor_sampler.nsamples, len(readings))
+        self.assertGreater(len(readings), 5)
+        temperature = self.task.ambient_sensor_table['Temperature_C'][: self.task.task_params.NTRIALS]
+        self.assertFalse(temperature.isna().any())
+        self.assertGreater(temperature.nunique(), 5)
+        self.assertTrue(self.task.paths.SESSION_RAW_DATA_FOLDER.joinpath(AMBIENT_SENSOR_FILE).exists())
+
 
 class TestClassMethods(unittest.TestCase):
     def test_get_task_file(self):
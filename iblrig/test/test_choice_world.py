@@ -11,11 +11,14 @@ from unittest.mock import patch
 
 import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 
 import iblrig.choiceworld
+import iblrig_tasks
 from iblrig import session_creator
 from iblrig.path_helper import iterate_previous_sessions
 from iblrig.raw_data_loaders import load_task_jsonable
+from iblrig.subject_history import get_trials_summary
 from iblrig.test.base import BaseTestCases
 from iblrig_tasks._iblrig_tasks_passiveChoiceWorld.task import Session as PassiveChoiceWorldSession
 from iblrig_tasks._iblrig_tasks_spontaneous.task import Session as SpontaneousSession
@@ -125,9 +128,11 @@ class TestGetPreviousSession(BaseTestCases.CommonTestTask):
         self.assertEqual(8, t.task_params.AG_INIT_VALUE)
 
         # previous session with > 200 correct trials -> should return adaptive gain of STIM_GAIN = 4
-        with patch('iblrig.choiceworld.np.sum', return_value=400) as mock_sum:
+        paths = self.session_b.paths
+        summary = get_trials_summary({'session_path': paths.SESSION_FOLDER, 'task_collection': paths.TASK_COLLECTION})
+        with patch('iblrig.choiceworld.get_trials_summary', return_value=summary | {'n_responses': 400}) as mock_summary:
             self.assertEqual((2, 2.1, t.task_params.STIM_GAIN), t.get_subject_training_info())
-            mock_sum.assert_called_once()
+            mock_summary.assert_called_once()
             self.assertEqual(t.task_params.STIM_GAIN, 4)
 
         # exception while getting previous session -> should return default values with gain = STIM_GAIN
@@ -189,3 +194,85 @@ class TestsBiasedBlocksGeneration(unittest.TestCase):
         c = self.count_contrasts(pc)
         c[4] /= 2
         assert np.all(np.abs(1 - c * 10) <= 0.2)
+
+
+class TestEphysSessionTemplates(unittest.TestCase):
+    def test_shipped_templates(self):
+        file_fixtures = Path(iblrig_tasks.__file__).parent.joinpath('_iblrig_tasks_ephysChoiceWorld', 'trials_fixtures.pqt')
+        self.assertEqual(12, pq.ParquetFile(file_fixtures).metadata.num_row_groups)
+        for session_template_id in range(12):
+            trials_table = session_creator.read_session_template(file_fixtures, session_template_id)
+            session_creator.validate_ephyscw_template(trials_table)
+
+    def test_make_templates(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            files = [
+                session_creator.make_ephyscw_templates(Path(temp_dir).joinpath(f'templates_{i}.pqt'), 4, seed=12, max_workers=2)
+                for i in range(2)
+            ]
+            self.assertEqual(4, pq.ParquetFile(files[0]).metadata.num_row_groups)
+            pd.testing.assert_frame_equal(pd.read_parquet(files[0]), pd.read_parquet(files[1]))
+            trials_table = session_creator.read_session_template(files[0], 2)
+            session_creator.validate_ephyscw_template(trials_table)
+            np.testing.assert_array_equal(trials_table['trial_num'], np.arange(trials_table.shape[0]))
+        with self.assertRaises(ValueError):
+            session_creator.validate_ephyscw_template(trials_table.iloc[:1000])
+
+
+class TestTrialSchedule(unittest.TestCase):
+    def setUp(self):
+        self.block_parameters = {
+            'block_len_factor': 60,
+            'block_len_min': 20,
+            'block_len_max': 100,
+            'probability_set': [0.2, 0.8],
+            'init_5050': True,
+        }
+
+    def test_reproducible(self):
+        schedules = [
+            iblrig.choiceworld.TrialSchedule(500, [-35, 35], [1.0, 0.25, 0.0], block_parameters=self.block_parameters, seed=seed)
+            for seed in (42, 42, 43)
+        ]
+        pd.testing.assert_frame_equal(schedules[0].table, schedules[1].table)
+        self.assertFalse(schedules[0].table.equals(schedules[2].table))
+        schedule = iblrig.choiceworld.TrialSchedule(10, [-35, 35], [1.0])
+        self.assertIsNotNone(schedule.seed)
+        pd.testing.assert_frame_equal(
+            schedule.table, iblrig.choiceworld.TrialSchedule(10, [-35, 35], [1.0], seed=schedule.seed).table
+        )
+
+    def test_blocks(self):
+        schedule = iblrig.choiceworld.TrialSchedule(2000, [-35, 35], [1.0], block_parameters=self.block_parameters, seed=7)
+        blocks, table = schedule.blocks, schedule.table
+        self.assertGreaterEqual(blocks['block_length'].sum(), 2000)
+        self.assertEqual(90, blocks['block_length'][0])
+        self.assertTrue(np.all(blocks['block_length'][1:].between(20, 100)))
+        self.assertEqual(0.5, blocks['probability_left'][0])
+        np.testing.assert_allclose(np.abs(np.diff(blocks['probability_left'][1:])), 0.6)
+        np.testing.assert_array_equal(table.groupby('block_num')['block_trial_num'].first(), 0)
+        n_complete_blocks = table['block_num'].max()  # the last block is truncated at the end of the session
+        np.testing.assert_array_equal(table.groupby('block_num').size()[:-1], blocks['block_length'][:n_complete_blocks])
+        np.testing.assert_array_equal(table['stim_probability_left'], blocks['probability_left'][table['block_num']])
+        left = table.groupby('block_num')['position'].apply(lambda x: np.mean(x < 0))
+        np.testing.assert_array_less(np.abs(left - blocks['probability_left'][left.index]), 0.3)
+
+    def test_quiescent_period(self):
+        schedule = iblrig.choiceworld.TrialSchedule(5000, [-35, 35], [1.0], quiescent_period=0.2, seed=1)
+        quiescent_period = schedule.columns['quiescent_period']
+        self.assertTrue(np.all((quiescent_period >= 0.4) & (quiescent_period <= 0.7)))
+        self.assertAlmostEqual(quiescent_period.mean() - 0.2, 0.35, delta=0.05)
+
+    def test_redraw(self):
+        contrasts = iblrig.choiceworld.CONTRASTS
+        p0 = iblrig.choiceworld.training_contrasts_probabilities(0)
+        schedule = iblrig.choiceworld.TrialSchedule(400, [-35, 35], contrasts, p0, seed=3)
+        np.testing.assert_array_equal(np.unique(np.abs(schedule.columns['contrast'])), [0.5, 1])
+        before = schedule.table
+        schedule.redraw(200, contrast_probabilities=iblrig.choiceworld.training_contrasts_probabilities(4))
+        pd.testing.assert_frame_equal(before[:200], schedule.table[:200])
+        self.assertIn(0, schedule.columns['contrast'][200:])
+        schedule.redraw(300, probability_left=1.0)
+        np.testing.assert_array_equal(schedule.columns['position'][300:], -35)
+        self.assertEqual(-35, schedule.trial(10, probability_left=1.0)['position'])
+        self.assertEqual(35, schedule.trial(10, probability_left=0.0)['position'])
@@ -1,6 +1,9 @@
 import unittest
+from unittest.mock import MagicMock
 
-from iblrig.hardware import Bpod
+import numpy as np
+
+from iblrig.hardware import Bpod, StateMachineTemplate
 
 
 class TestBpod(unittest.TestCase):
@@ -26,3 +29,36 @@ class TestBpod(unittest.TestCase):
         self.assertEqual(8, bpod.softcode_handler_function(6))
         with self.assertRaises(KeyError):
             bpod.softcode_handler_function(1)
+
+    def test_serialize_state_machine(self):
+        sma = MagicMock()
+        sma.build_message.return_value = b'\x01\x02'
+        sma.build_message_global_timer.return_value = b'\x03'
+        sma.build_message_32_bits.return_value = b'\x04'
+        sma.build_header.return_value = b'\xff'
+        self.assertEqual(b'\xff\x01\x02\x03\x04', Bpod.serialize_state_machine(sma))
+        sma.update_state_numbers.assert_called_once()  # validates the state machine
+        sma.build_header.assert_called_once_with(None, 4)
+
+
+class TestStateMachineTemplate(unittest.TestCase):
+    def test_render(self):
+        sma = MagicMock()
+        sma.hardware.cycle_frequency = 10000
+        sma.state_names = ['trial_start', 'quiescent_period', 'reward']
+        sma.state_timers = [0, 0.2, 0.1]
+        sma.build_message.return_value = b'\x01\x02'
+        sma.build_message_global_timer.return_value = b''
+        sma.build_message_32_bits.side_effect = lambda: np.array(sma.state_timers, dtype='uint32').tobytes()
+        sma.build_header.return_value = b'\xff'
+        template = StateMachineTemplate(sma, ['quiescent_period', 'reward'])
+        sma.update_state_numbers.assert_called_once()
+        sma.current_state = 2
+        sma_trial, message = template.render({'quiescent_period': 0.5, 'reward': 0.0456})
+        self.assertIs(sma, sma_trial)
+        self.assertEqual(0, sma.current_state)
+        self.assertEqual([0, 0.5, 0.0456], sma.state_timers)
+        self.assertEqual(b'\xff\x01\x02', message[:3])
+        np.testing.assert_array_equal(np.frombuffer(message[3:], dtype='uint32'), [0, 5000, 456])
+        with self.assertRaises(KeyError):
+            template.render({'trial_start': 1})
@@ -1,6 +1,18 @@
+import gc
+import threading
+import time
 import unittest
+import weakref
 
-from iblrig.hardware_validation import Result, Status, Validator, run_all_validators
+from iblrig.hardware_validation import (
+    Result,
+    Status,
+    Validator,
+    ValidatorReport,
+    get_all_validators,
+    run_all_validators,
+    run_validators,
+)
 from iblrig.path_helper import load_pydantic_yaml
 from iblrig.pydantic_definitions import HardwareSettings, RigSettings
 
@@ -33,6 +45,110 @@ class TestRunAllValidators(unittest.TestCase):
             self.assertIsInstance(result, Result)
 
 
+def make_sleeping_validator() -> type[Validator]:
+    """
+    Create a validator class that holds its resources for a given duration.
+
+    The class is created for each test so that it isn't picked up by :func:`iblrig.hardware_validation.get_all_validators`
+    once the test is done.
+    """
+
+    class SleepingValidator(Validator):
+        active: dict[str, int] = {}
+        lock = threading.Lock()
+
+        def __init__(
+            self,
+            name: str = 'sleeping',
+            resources: set[str] | None = None,
+            duration: float = 0.1,
+            barrier: threading.Barrier | None = None,
+            **kwargs,
+        ):
+            super().__init__(**kwargs)
+            self._name = name
+            self._resources = resources
+            self.duration = duration
+            self.barrier = barrier
+            self.overlapped = False
+
+        @property
+        def resources(self) -> set[str] | None:
+            return self._resources
+
+        def _run(self):
+            with self.lock:
+                self.overlapped = any(n > 0 for r, n in self.active.items() if self._resources is None or r in self._resources)
+                for resource in self._resources or {'*'}:
+                    self.active[resource] = self.active.get(resource, 0) + 1
+            yield Result(Status.INFO, f'{self.name} started')
+            if self.barrier is not None:
+                self.barrier.wait(timeout=10)  # raises BrokenBarrierError if the validators don't run concurrently
+            time.sleep(self.duration)
+            with self.lock:
+                for resource in self._resources or {'*'}:
+                    self.active[resource] -= 1
+            if self.name == 'broken':
+                raise ValueError('broken validator')
+            yield Result(Status.PASS, f'{self.name} passed')
+            return True
+
+    return SleepingValidator
+
+
+class TestRunValidators(unittest.TestCase):
+    def setUp(self):
+        self.SleepingValidator = make_sleeping_validator()
+        self.addCleanup(gc.collect)
+        self.addCleanup(delattr, self, 'SleepingValidator')
+
+    def run_validators(self, specs, concurrent=()):
+        """Run sleeping validators, those named in `concurrent` wait for each other before completing."""
+        barrier = threading.Barrier(len(concurrent)) if concurrent else None
+        validators = [
+            self.SleepingValidator(name, resources, barrier=barrier if name in concurrent else None, **VALIDATORS_INIT_KWARGS)
+            for name, resources in specs
+        ]
+        t0 = time.perf_counter()
+        events = list(run_validators(validators))
+        return validators, events, time.perf_counter() - t0
+
+    def test_run_validators(self):
+        specs = [('bpod', {'COM1'}), ('alyx', set()), ('module', {'COM1', 'COM2'}), ('f2ttl', {'COM3'}), ('git', set())]
+        # the validators that don't share resources with preceding ones run concurrently
+        validators, events, _ = self.run_validators(specs, concurrent=('bpod', 'alyx', 'f2ttl', 'git'))
+        # the results are streamed in order, each validator's report follows its results
+        self.assertEqual([i for i, _ in events], [i for i in range(len(specs)) for _ in range(3)])
+        for i, (_, name) in enumerate(events[1::3]):
+            self.assertEqual(name.message, f'{specs[i][0]} passed')
+        reports = [e for _, e in events if isinstance(e, ValidatorReport)]
+        self.assertEqual([r.validator for r in reports], validators)
+        self.assertTrue(all(r.success and r.status == Status.PASS and r.duration_s >= 0.1 for r in reports))
+        # only the two validators using COM1 run one after the other
+        self.assertFalse(any(v.overlapped for v in validators))
+
+    def test_exclusive_validators(self):
+        # validators without declared resources don't run concurrently with any other validator
+        validators, events, duration = self.run_validators([('alyx', set()), ('unknown', None), ('git', set())])
+        self.assertFalse(any(v.overlapped for v in validators))
+        self.assertGreaterEqual(duration, 0.3)
+
+    def test_exception(self):
+        validators = [self.SleepingValidator(name, set(), **VALIDATORS_INIT_KWARGS) for name in ('alyx', 'broken', 'git')]
+        results = []
+        with self.assertRaises(ValueError):
+            for _, event in run_validators(validators):
+                results.append(event.validator.name if isinstance(event, ValidatorReport) else event.message)
+        self.assertEqual(results, ['alyx started', 'alyx passed', 'alyx', 'broken started'])
+
+    def test_get_all_validators(self):
+        # the validator classes created for the tests are not picked up once they are released
+        self.assertIn(self.SleepingValidator, get_all_validators())
+        validator_class = weakref.ref(make_sleeping_validator())
+        gc.collect()
+        self.assertIsNone(validator_class())
+
+
 # class TestAlyxValidation(unittest.TestCase):
 #     def test_lab_location(self):
 #         alyx = AlyxClient(**TEST_DB, cache_rest=None)
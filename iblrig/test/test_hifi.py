@@ -0,0 +1,162 @@
+import struct
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import serial
+
+from iblrig import sound
+from iblrig.hifi import HiFi, HiFiException
+from iblrig.serial_singleton import SerialSingleton
+
+
+class StandInHiFi:
+    """
+    A stand-in for the serial device of a Bpod HiFi module.
+
+    Emulates the module's replies to the commands used by :class:`iblrig.hifi.HiFi`. Use :meth:`patch` to route the
+    serial I/O of :class:`serial.Serial` to the stand-in.
+    """
+
+    def __init__(self, bit_depth: int = 32, max_bytes_per_write: int | None = None):
+        self.bit_depth = bit_depth
+        self.info = [True, bit_depth, 20, 0, 192000, 13, 2000]
+        self.max_bytes_per_write = max_bytes_per_write
+        self.waveforms: dict[int, np.ndarray] = {}
+        self.n_writes = 0
+        self.stall_at_byte: int | None = None  # number of waveform bytes received after which the device stalls
+        self.stall_s = 0.0
+        self._stall_end: float | None = None
+        self._n_waveform_bytes = 0
+        self._rx = bytearray()
+        self._tx = bytearray()
+
+    def patch(self):
+        return mock.patch.multiple(
+            serial.Serial,
+            open=lambda s: setattr(s, 'is_open', True),
+            close=lambda s: setattr(s, 'is_open', False),
+            write=lambda s, data: self.write(data),
+            read=lambda s, size=1: self.read(size),
+            out_waiting=property(lambda s: self.out_waiting),
+        )
+
+    @property
+    def out_waiting(self) -> int:
+        if self._stall_end is not None and time.monotonic() < self._stall_end:
+            return 1 << 20
+        return 0
+
+    def read(self, size: int = 1) -> bytes:
+        data, self._tx = bytes(self._tx[:size]), self._tx[size:]
+        return data
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        if self.max_bytes_per_write is not None:
+            data = data[: self.max_bytes_per_write]
+        self.n_writes += 1
+        self._rx.extend(data)
+        while self._rx and self._process():
+            pass
+        return len(data)
+
+    def _process(self) -> bool:
+        """Process a complete command from the received bytes, return False if the command is incomplete."""
+        match bytes(self._rx[:1]):
+            case b'\xf3':
+                n_bytes, reply = 1, b'\xf4'
+            case b'I':
+                n_bytes, reply = 1, struct.pack('<?BBBIII', *self.info)
+            case b'S':
+                n_bytes, reply = 5, b'\x01'
+                if len(self._rx) >= n_bytes:
+                    self.info[4] = struct.unpack_from('<I', self._rx, 1)[0]
+            case b'A':
+                n_bytes, reply = 2, b'\x01'
+            case b'L':
+                n_bytes, reply = 12, b'\x01'
+                if len(self._rx) >= n_bytes:
+                    index, is_stereo, _, _, n_samples = struct.unpack_from('<B??II', self._rx, 1)
+                    n_channels = 2 if is_stereo else 1
+                    n_data = n_samples * n_channels * self.bit_depth // 8
+                    self._n_waveform_bytes = len(self._rx) - n_bytes
+                    if self.stall_at_byte is not None and self._n_waveform_bytes >= self.stall_at_byte:
+                        self._stall_end, self.stall_at_byte = time.monotonic() + self.stall_s, None
+                    n_bytes += n_data
+                    if len(self._rx) >= n_bytes:
+                        dtype = np.int16 if self.bit_depth == 16 else np.int32
+                        data = np.frombuffer(bytes(self._rx[12:n_bytes]), dtype=dtype).reshape(n_samples, n_channels)
+                        self.waveforms[index] = data
+            case b'*' | b'X':
+                n_bytes, reply = 1, b'\x01' if self._rx[:1] == b'*' else b''
+            case b'P' | b'x':
+                n_bytes, reply = 2, b''
+            case _:
+                raise ValueError(f'Unknown command {bytes(self._rx[:1])}')
+        if len(self._rx) < n_bytes:
+            return False
+        del self._rx[:n_bytes]
+        self._tx.extend(reply)
+        return True
+
+
+class TestHiFi(unittest.TestCase):
+    def setUp(self):
+        self.device = StandInHiFi(max_bytes_per_write=5000)
+        patcher = self.device.patch()
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(SerialSingleton._instances.pop, 'STANDIN', None)
+        self.hifi = HiFi(port='STANDIN', sampling_rate_hz=96000)
+        self.addCleanup(self.hifi.close)
+        self.waveform = sound.make_sound(rate=96000, duration=0.5, chans='stereo')
+
+    def test_load(self):
+        progress = []
+        stats = self.hifi.load(3, self.waveform, chunk_size=8192, progress_callback=lambda *args: progress.append(args))
+        expected = (self.waveform * np.iinfo(np.int32).max).astype(np.int32)
+        np.testing.assert_array_equal(self.device.waveforms[3], expected)
+        self.assertEqual(stats.n_bytes, expected.nbytes)
+        self.assertEqual(stats.n_retries, 0)
+        self.assertGreater(stats.throughput_bytes_per_s, 0)
+        # the device accepts at most 5000 bytes per write: the upload resumes after partial writes
+        self.assertEqual(progress[-1], (expected.nbytes, expected.nbytes))
+        np.testing.assert_array_equal(np.diff([p[0] for p in progress])[:-1], 5000)
+        # mono waveforms, passed as row vectors
+        self.hifi.load(0, self.waveform[:, 0].reshape(1, -1))
+        np.testing.assert_array_equal(self.device.waveforms[0][:, 0], expected[:, 0])
+
+    def test_load_stall(self):
+        self.device.stall_at_byte = 100_000
+        self.device.stall_s = 0.05
+        stats = self.hifi.load(1, self.waveform, stall_timeout_s=0.01, max_retries=20)
+        self.assertGreater(stats.n_retries, 0)
+        np.testing.assert_array_equal(self.device.waveforms[1], (self.waveform * np.iinfo(np.int32).max).astype(np.int32))
+        # the upload is aborted if the device doesn't recover
+        self.device.stall_at_byte = 100_000
+        with self.assertRaises(HiFiException), self.assertLogs('iblrig.hifi', 'WARNING'):
+            self.hifi.load(2, self.waveform, stall_timeout_s=0.01, max_retries=2)
+        self.assertNotIn(2, self.device.waveforms)
+
+    def test_load_waveforms(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            record_file = Path(tmpdir).joinpath('hifi_waveforms.json')
+            noise = sound.make_sound(rate=96000, frequency=-1)
+            self.assertTrue(self.hifi.load_waveforms({0: self.waveform, 1: noise}, record_file=record_file))
+            self.assertEqual(set(self.device.waveforms), {0, 1})
+            # the upload of the same waveforms is skipped
+            n_writes = self.device.n_writes
+            self.assertFalse(self.hifi.load_waveforms({0: self.waveform, 1: noise}, record_file=record_file))
+            self.assertEqual(self.device.n_writes, n_writes)
+            # changed waveforms or sampling rates are uploaded
+            self.assertTrue(self.hifi.load_waveforms({0: self.waveform, 1: -noise}, record_file=record_file))
+            self.hifi.sampling_rate_hz = 192000
+            self.assertTrue(self.hifi.load_waveforms({0: self.waveform, 1: -noise}, record_file=record_file))
+            # without record file, the waveforms are always uploaded
+            n_writes = self.device.n_writes
+            self.assertTrue(self.hifi.load_waveforms({0: self.waveform, 1: -noise}))
+            self.assertGreater(self.device.n_writes, n_writes)
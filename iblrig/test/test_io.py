@@ -1,9 +1,19 @@
+import tempfile
+import threading
 import unittest
+from copy import deepcopy
 from pathlib import Path
+from unittest import mock
 
 import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pydantic import NonNegativeInt
 
-from iblrig.raw_data_loaders import load_task_jsonable
+from iblrig.pydantic_definitions import TrialDataModel
+from iblrig.raw_data_loaders import JsonableReader, load_task_arrow, load_task_jsonable, states_timestamps_array
+from iblrig.trial_store import ArrowTrialWriter, arrow_file_from_jsonable, trial_data_schema
+from iblrig.trial_writer import TrialDataWriter, encode_trial_data
 
 
 class TestLoadTaskData(unittest.TestCase):
@@ -26,3 +36,217 @@ class TestLoadTaskData(unittest.TestCase):
                 np.testing.assert_equal(trials_table_full[c].values[-1], trials_table[c][0])
 
         assert bpod_data_full[-1] == bpod_data[0]
+
+    def test_states_timestamps_array(self):
+        jsonable_file = Path(__file__).parent.joinpath('fixtures', 'task_data_short.jsonable')
+        _, bpod_data = load_task_jsonable(jsonable_file)
+        timestamps, states = states_timestamps_array(bpod_data)
+        self.assertEqual(timestamps.shape, (2, len(states), 2))
+        for i, trial in enumerate(bpod_data):
+            for j, state in enumerate(states):
+                expected = trial['States timestamps'].get(state, [[np.nan, np.nan]])[0]
+                np.testing.assert_array_equal(timestamps[i, j], expected)
+        # states that are not visited are NaN
+        timestamps, states = states_timestamps_array(bpod_data, ['stim_on', 'foo'])
+        self.assertEqual(states, ['stim_on', 'foo'])
+        self.assertTrue(np.all(np.isnan(timestamps[:, 1])))
+
+
+class TestJsonableReader(unittest.TestCase):
+    def setUp(self):
+        self.fixture = Path(__file__).parent.joinpath('fixtures', 'task_data_short.jsonable')
+        self.lines = self.fixture.read_bytes().splitlines(keepends=True)
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.jsonable_file = Path(tmpdir.name).joinpath('_iblrig_taskData.raw.jsonable')
+
+    def test_read_full(self):
+        trials_table, bpod_data = JsonableReader(self.fixture).read()
+        trials_table_full, bpod_data_full = load_task_jsonable(self.fixture)
+        pd.testing.assert_frame_equal(trials_table, trials_table_full)
+        self.assertEqual(bpod_data, bpod_data_full)
+
+    def test_read_incremental(self):
+        reader = JsonableReader(self.jsonable_file, capacity=1)
+        trials_table, bpod_data = reader.read()  # file does not exist yet
+        self.assertEqual(len(bpod_data), 0)
+        with open(self.jsonable_file, 'wb') as fp:
+            fp.write(self.lines[0])
+            fp.write(self.lines[1][:100])  # second trial is still being written
+        trials_table, bpod_data = reader.read()
+        self.assertEqual((1, 1), (trials_table.shape[0], len(bpod_data)))
+        self.assertEqual(reader.ntrials, 1)
+        with open(self.jsonable_file, 'ab') as fp:
+            fp.write(self.lines[1][100:])
+        trials_table, bpod_data = reader.read()
+        self.assertEqual((1, 1), (trials_table.shape[0], len(bpod_data)))
+        self.assertEqual([1], trials_table.index.tolist())
+        self.assertEqual(reader.ntrials, 2)
+        # the columnar buffer holds all trials read so far and grows as needed
+        with open(self.jsonable_file, 'ab') as fp:
+            fp.writelines(self.lines * 10)
+        reader.read()
+        self.assertEqual(reader.ntrials, 22)
+        np.testing.assert_array_equal(reader.column('trial_num'), np.tile([0, 1], 11))
+        self.assertEqual(reader.table.shape[0], 22)
+        self.assertEqual(reader.offsets[-1], self.jsonable_file.stat().st_size)
+
+    def test_persistent_index(self):
+        self.jsonable_file.write_bytes(b''.join(self.lines))
+        reader = JsonableReader(self.jsonable_file, save_index=True)
+        reader.read()
+        self.assertTrue(reader.file_index.exists())
+        # a new reader picks up the saved index and only reads new trials
+        with open(self.jsonable_file, 'ab') as fp:
+            fp.write(self.lines[0])
+        reader = JsonableReader(self.jsonable_file, save_index=True)
+        self.assertEqual(reader.ntrials, 2)
+        self.assertEqual(reader.read_trial(-1)['trial_num'], 1)
+        trials_table, _ = reader.read()
+        self.assertEqual([2], trials_table.index.tolist())
+        self.assertEqual(reader.read_trial(2)['behavior_data'], reader.read_trial(0)['behavior_data'])
+        with self.assertRaises(IndexError):
+            reader.read_trial(3)
+        # an index that doesn't match the file is discarded
+        self.jsonable_file.write_bytes(self.lines[0])
+        reader = JsonableReader(self.jsonable_file, save_index=True)
+        self.assertEqual(reader.ntrials, 0)
+        self.assertEqual(reader.read()[0].shape[0], 1)
+
+
+class _TrialData(TrialDataModel):
+    trial_num: NonNegativeInt
+    contrast: float
+
+
+class TestArrowTrialStore(unittest.TestCase):
+    def setUp(self):
+        fixture = Path(__file__).parent.joinpath('fixtures', 'task_data_short.jsonable')
+        self.trials_table, self.bpod_data = load_task_jsonable(fixture)
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.arrow_file = arrow_file_from_jsonable(Path(tmpdir.name).joinpath('_iblrig_taskData.raw.jsonable'))
+
+    def write_trials(self, **kwargs):
+        writer = ArrowTrialWriter(self.arrow_file, **kwargs)
+        for i, trial in self.trials_table.iterrows():
+            writer.append(trial.to_dict(), self.bpod_data[i])
+        return writer
+
+    def test_write_and_load(self):
+        self.write_trials().close()
+        self.assertEqual(self.arrow_file.name, '_iblrig_taskData.raw.arrows')
+        trials = load_task_arrow(self.arrow_file)
+        self.assertEqual(trials.shape[0], self.trials_table.shape[0])
+        pd.testing.assert_series_equal(trials['contrast'], self.trials_table['contrast'])
+        onsets = [bd['States timestamps']['stim_on'][0][0] for bd in self.bpod_data]
+        np.testing.assert_array_equal(trials['state_stim_on_onset'], onsets)
+        np.testing.assert_array_equal(trials['event_BNC1High'][0], self.bpod_data[0]['Events timestamps']['BNC1High'])
+        # selective read of columns, missing columns are ignored
+        trials = load_task_arrow(self.arrow_file, columns=['reward_amount', 'response_side', 'foo'])
+        self.assertEqual(trials.columns.tolist(), ['reward_amount', 'response_side'])
+
+    def test_flush_and_truncation(self):
+        # buffered trials are only written upon flush, the stream can be read before it is closed
+        writer = self.write_trials(flush_every=3)
+        self.assertEqual(load_task_arrow(self.arrow_file).shape[0], 0)
+        writer.flush()
+        self.assertEqual(load_task_arrow(self.arrow_file).shape[0], 2)
+        writer.close()
+        # an incomplete record batch is ignored
+        with open(self.arrow_file, 'ab') as fp:
+            fp.write(self.arrow_file.read_bytes()[-200:-20])
+        self.assertEqual(load_task_arrow(self.arrow_file).shape[0], 2)
+
+    def test_schema(self):
+        schema = trial_data_schema(_TrialData, state_names=['stim_on'], event_names=['BNC1High', 'Port1In'])
+        self.assertEqual(schema.field('trial_num').type, pa.int64())
+        self.assertEqual(schema.field('event_Port1In').type, pa.list_(pa.float64()))
+        writer = ArrowTrialWriter(self.arrow_file, schema=schema)
+        trials = [trial.to_dict() | {'foo': None, 'bar': 1} for _, trial in self.trials_table.iterrows()]
+        writer.append(trials[0], self.bpod_data[0] | {'Events timestamps': {}})
+        # a field that is null in the first trial, a value that doesn't fit its type, states and events that are not declared
+        trials[1].update(foo='baz', bar=1.5)
+        bpod_data = deepcopy(self.bpod_data[1])
+        bpod_data['Events timestamps'].update(Port1In=[1.0], Port2In=[2.0])
+        with self.assertLogs('iblrig.trial_store', 'INFO'):
+            writer.append(trials[1], bpod_data)
+        writer.append(trials[0], self.bpod_data[0])
+        writer.close()
+        loaded = load_task_arrow(self.arrow_file)
+        self.assertEqual(loaded.shape[0], 3)
+        self.assertEqual(loaded['trial_num'].dtype, np.int64)
+        self.assertEqual(loaded['foo'].tolist(), [None, 'baz', None])
+        self.assertEqual(loaded['bar'].tolist(), [1.0, 1.5, 1.0])
+        self.assertEqual(loaded['event_Port1In'][1].tolist(), [1.0])
+        self.assertEqual(loaded['event_Port2In'][1].tolist(), [2.0])
+        self.assertIsNone(loaded['event_Port2In'][0])
+        np.testing.assert_array_equal(loaded['event_BNC1High'][2], self.bpod_data[0]['Events timestamps']['BNC1High'])
+        self.assertIn('state_exit_state_onset', loaded.columns)
+
+
+class TestTrialDataWriter(unittest.TestCase):
+    def setUp(self):
+        fixture = Path(__file__).parent.joinpath('fixtures', 'task_data_short.jsonable')
+        self.trials_table, self.bpod_data = load_task_jsonable(fixture)
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.jsonable_file = Path(tmpdir.name).joinpath('raw_task_data_00', '_iblrig_taskData.raw.jsonable')
+
+    def test_encode_trial_data(self):
+        trial_data = {'trial_num': np.int64(3), 'contrast': np.nan, 'signed_contrast': pd.NA, 'wheel': np.arange(2)}
+        encoded = encode_trial_data(trial_data)
+        self.assertEqual(encoded, b'{"trial_num":3,"contrast":NaN,"signed_contrast":NaN,"wheel":[0,1]}\n')
+
+    def test_write(self):
+        arrow_writer = ArrowTrialWriter(arrow_file_from_jsonable(self.jsonable_file))
+        writer = TrialDataWriter(self.jsonable_file, arrow_writer=arrow_writer, fsync_every=1)
+        written = []
+        # the writer thread is held up: handing over trials doesn't block
+        release = threading.Event()
+        with mock.patch('iblrig.trial_writer.os.fsync') as fsync:
+            writer.put({'trial_num': -1}, {}, callback=release.wait)
+            for i, trial in self.trials_table.iterrows():
+                trial_data = trial.to_dict() | {'trial_num': np.int64(i)}
+                writer.put(trial_data, self.bpod_data[i], callback=lambda i=i: written.append(i))
+            self.assertEqual(written, [])
+            release.set()
+            writer.flush()
+        # the trials are written in order, and synced before flush returns
+        self.assertEqual(written, self.trials_table.index.tolist())
+        self.assertEqual(fsync.call_count, self.trials_table.shape[0] + 1)
+        writer.close()
+        trials_table, bpod_data = load_task_jsonable(self.jsonable_file)
+        self.assertEqual(trials_table['trial_num'].tolist(), [-1] + self.trials_table.index.tolist())
+        self.assertEqual(bpod_data[1]['Trial start timestamp'], self.bpod_data[0]['Trial start timestamp'])
+        np.testing.assert_array_equal(load_task_arrow(arrow_writer.file_path)['trial_num'], trials_table['trial_num'])
+        with self.assertRaises(RuntimeError):
+            writer.put({}, {})
+
+    def test_error(self):
+        writer = TrialDataWriter(self.jsonable_file)
+        with self.assertLogs('iblrig.trial_writer', 'ERROR'):
+            writer.put({'foo': object()}, {})
+            with self.assertRaises(OSError):
+                writer.flush()
+        # the writer keeps going after an error
+        writer.put({'trial_num': 0}, {})
+        writer.close()
+        self.assertEqual(load_task_jsonable(self.jsonable_file)[0]['trial_num'].tolist(), [0])
+
+    def test_arrow_error(self):
+        arrow_writer = ArrowTrialWriter(arrow_file_from_jsonable(self.jsonable_file))
+        writer = TrialDataWriter(self.jsonable_file, arrow_writer=arrow_writer)
+        written = []
+        # an error of the optional Arrow IPC stream is logged and disables it, the jsonable file is still written
+        with (
+            mock.patch.object(arrow_writer, 'append', side_effect=ValueError('foo')),
+            self.assertLogs('iblrig.trial_writer', 'ERROR'),
+        ):
+            writer.put({'trial_num': 0}, {}, callback=lambda: written.append(0))
+            writer.flush()
+        self.assertIsNone(writer.arrow_writer)
+        writer.put({'trial_num': 1}, {}, callback=lambda: written.append(1))
+        writer.close()
+        self.assertEqual(written, [0, 1])
+        self.assertEqual(load_task_jsonable(self.jsonable_file)[0]['trial_num'].tolist(), [0, 1])
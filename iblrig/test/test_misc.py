@@ -16,6 +16,7 @@ from settings.port_settings import main  # FIXME This is not a module
 
 class TestMisc(unittest.TestCase):
     def test_draw_contrast(self):
+        np.random.seed(5000)
         n_draws = 5000
         n_contrasts = 10
         contrast_set = np.linspace(0, 1, n_contrasts)
@@ -39,6 +40,44 @@ class TestMisc(unittest.TestCase):
         self.assertRaises(ValueError, misc.draw_contrast, [], 'incorrect_type')  # assert exception for incorrect type
         self.assertRaises(IndexError, misc.draw_contrast, [0, 1], 'biased', 2)  # assert exception for out-of-range index
 
+    def test_draw_contrast_batch(self):
+        rng = np.random.default_rng(2024)
+        contrast_set = [1.0, 0.25, 0.125, 0.0625, 0.0]
+        contrasts = misc.draw_contrast(contrast_set, 'skew_zero', size=(100, 90), rng=rng)
+        self.assertEqual((100, 90), contrasts.shape)
+        f_obs = np.array([np.sum(contrasts == c) for c in contrast_set])
+        f_exp = np.array(misc.get_biased_probs(len(contrast_set))) * contrasts.size
+        self.assertGreater(stats.chisquare(f_obs, f_exp).pvalue, 0.01)
+        self.assertIsInstance(misc.draw_contrast(contrast_set, 'uniform', rng=rng), float)
+        # the cumulative probabilities are computed once per set of arguments
+        misc._contrast_cdf.cache_clear()
+        for _ in range(3):
+            misc.draw_contrast(contrast_set, 'uniform')
+        self.assertEqual(1, misc._contrast_cdf.cache_info().misses)
+
+    def test_truncated_exponential(self):
+        rng = np.random.default_rng(2024)
+        values = misc.truncated_exponential(scale=0.35, min_value=0.2, max_value=0.5, size=20000, rng=rng)
+        self.assertTrue(np.all((values >= 0.2) & (values <= 0.5)))
+        # compare with rejection sampling from the exponential distribution
+        reference = rng.exponential(0.35, size=200000)
+        reference = reference[(reference >= 0.2) & (reference <= 0.5)]
+        self.assertGreater(stats.ks_2samp(values, reference).pvalue, 0.01)
+        # block lengths
+        values = misc.truncated_exponential(scale=60, min_value=20, max_value=100, size=20000, rng=rng)
+        reference = rng.exponential(60, size=100000)
+        reference = reference[(reference >= 20) & (reference <= 100)]
+        self.assertGreater(stats.ks_2samp(values, reference).pvalue, 0.01)
+        # scalar draws from the global random state
+        np.random.seed(1)
+        value = misc.truncated_exponential()
+        self.assertTrue(np.isscalar(value) and 0.2 <= value <= 0.5)
+        # ranges far in the tail of the distribution do not require repeated draws
+        values = misc.truncated_exponential(scale=0.01, min_value=5, max_value=6, size=100, rng=rng)
+        self.assertTrue(np.all((values >= 5) & (values <= 6)))
+        self.assertRaises(ValueError, misc.truncated_exponential, scale=0)
+        self.assertRaises(ValueError, misc.truncated_exponential, min_value=0.5, max_value=0.2)
+
     def test_online_std(self):
         n = 41
         b = np.random.rand(n)
@@ -47,6 +86,22 @@ class TestMisc(unittest.TestCase):
         np.testing.assert_almost_equal(std, np.std(b))
         np.testing.assert_almost_equal(mu, np.mean(b))
 
+    def test_streaming_quantile(self):
+        rng = np.random.default_rng(42)
+        values = rng.lognormal(size=5000)
+        for q in (0.1, 0.5, 0.9):
+            estimator = misc.StreamingQuantile(q)
+            estimator.extend(values[:3])
+            self.assertEqual(estimator.value, np.quantile(values[:3], q))  # exact for up to 5 samples
+            estimator.extend(values[3:])
+            self.assertEqual(estimator.count, values.size)
+            np.testing.assert_allclose(estimator.value, np.quantile(values, q), rtol=0.05)
+        estimator = misc.StreamingQuantile()
+        self.assertTrue(np.isnan(estimator.value))
+        estimator.extend([np.nan, 1.0])
+        self.assertEqual(estimator.value, 1.0)
+        self.assertRaises(ValueError, misc.StreamingQuantile, 1.5)
+
 
 class TestPortSettings(unittest.TestCase):
     """Test settings/port_settings.py."""
@@ -1,9 +1,14 @@
+import socket
+import tempfile
+import time
 import unittest
 import zipfile
 from pathlib import Path
+from unittest.mock import patch
 
 import matplotlib
 import numpy as np
+import pandas as pd
 
 import iblrig.online_plots as op
 from iblrig.raw_data_loaders import load_task_jsonable
@@ -31,3 +36,154 @@ class TestOnlinePlots(unittest.TestCase):
     @classmethod
     def tearDownClass(cls) -> None:
         cls.task_file.unlink()
+
+
+class TestDataModel(unittest.TestCase):
+    @staticmethod
+    def synthetic_trials(ntrials: int, seed: int = 0) -> tuple[pd.DataFrame, list[dict]]:
+        rng = np.random.default_rng(seed)
+        trials_table = pd.DataFrame(
+            {
+                'position': rng.choice([-35, 35], ntrials),
+                'contrast': rng.choice(op.CONTRAST_SET, ntrials),
+                'stim_probability_left': rng.choice(op.PROBABILITY_SET, ntrials),
+                'trial_correct': rng.random(ntrials) > 0.3,
+                'response_time': rng.lognormal(size=ntrials),
+            }
+        )
+        trials_table['reward_amount'] = trials_table['trial_correct'] * 1.5
+        bpod_data = [
+            {
+                'Bpod start timestamp': 0.0,
+                'Trial end timestamp': i * 5.0 + 4.0,
+                'States timestamps': {'stim_on': [[i * 5.0 + 1, i * 5.0 + 1.1]], 'play_tone': [[i * 5.0 + 1, i * 5.0 + 1.1]]},
+            }
+            for i in range(ntrials)
+        ]
+        return trials_table, bpod_data
+
+    def test_update_trial(self):
+        trials_table, bpod_data = self.synthetic_trials(500)
+        trials_table.loc[[3, 250], 'response_time'] = np.nan
+        data = op.DataModel(settings_file=None)
+        for trial_data, trial_bpod_data in zip(trials_table.to_dict('records'), bpod_data, strict=True):
+            data.update_trial(trial_data, trial_bpod_data)
+        self.assertEqual(data.ntrials, 500)
+        self.assertAlmostEqual(data.water_delivered, trials_table['reward_amount'].sum())
+        # psychometrics are equal to the aggregates of the full trials table
+        trials_table['signed_contrast'] = np.sign(trials_table['position']) * trials_table['contrast']
+        trials_table['choice'] = (trials_table['position'] > 0) == trials_table['trial_correct']
+        expected = trials_table.groupby(['stim_probability_left', 'signed_contrast']).agg(
+            count=('choice', 'count'),
+            response_time=('response_time', 'mean'),
+            choice=('choice', 'mean'),
+            response_time_std=('response_time', lambda x: np.nanstd(x.values)),  # population standard deviation
+        )
+        psychometrics = data.psychometrics.loc[expected.index, expected.columns]
+        pd.testing.assert_frame_equal(psychometrics, expected, check_dtype=False, check_names=False)
+        xval, choice, _ = data.get_psychometric_curve(0.5)
+        np.testing.assert_array_equal(xval, expected.loc[0.5].index)
+        np.testing.assert_allclose(choice, expected.loc[0.5]['choice'])
+        # the last trials are in chronological order
+        last_trials = data.last_trials
+        np.testing.assert_array_equal(last_trials['response_time'], trials_table['response_time'].values[-op.NTRIALS_PLOT :])
+        np.testing.assert_array_equal(
+            last_trials['stim_on'], [bd['States timestamps']['stim_on'][0][0] for bd in bpod_data[-20:]]
+        )
+        self.assertTrue(np.all(np.isnan(last_trials['reward_time'])))
+        correct = trials_table['trial_correct'].values[-op.NTRIALS_PLOT :]
+        np.testing.assert_array_equal(data.rgb_background[correct, 0], [[0, 255, 0]] * np.sum(correct))
+        np.testing.assert_array_equal(data.rgb_background[~correct, 0], [[255, 0, 0]] * np.sum(~correct))
+        signed_contrast = trials_table['signed_contrast'].values[-op.NTRIALS_PLOT :]
+        np.testing.assert_array_equal(data.last_contrasts.sum(axis=1), np.abs(signed_contrast))
+        # contrasts or probabilities that are not in the set are added to the psychometrics
+        trial_data = trials_table.iloc[-1].to_dict() | {'contrast': 0.3, 'stim_probability_left': 0.1}
+        data.update_trial(trial_data, bpod_data[-1])
+        self.assertEqual(1, data.psychometrics.loc[(0.1, 0.3 * np.sign(trial_data['position'])), 'count'])
+        self.assertTrue(np.all(np.diff(data.signed_contrasts) > 0))
+
+    def test_update_trials(self):
+        trials_table, bpod_data = self.synthetic_trials(500)
+        trials_table.loc[400, ['contrast', 'stim_probability_left']] = [0.3, 0.1]
+        trials_table.loc[[5, 100, 400], 'response_time'] = np.nan
+        bpod_data[-1]['States timestamps']['reward'] = [[2496.0, 2496.1]]
+        expected = op.DataModel(settings_file=None)
+        for trial_data, trial_bpod_data in zip(trials_table.to_dict('records'), bpod_data, strict=True):
+            expected.update_trial(trial_data, trial_bpod_data)
+        # the batch update is equivalent to updating the model trial by trial, the second batch adds a contrast
+        data = op.DataModel(settings_file=None)
+        for first, last in ((0, 7), (7, 300), (300, 500)):
+            data.update_trials(trials_table.iloc[first:last].reset_index(drop=True), bpod_data[first:last])
+        for name in ('ntrials', 'ntrials_correct', 'ntrials_engaged', 'water_delivered', 'time_elapsed', 'percent_correct'):
+            self.assertAlmostEqual(getattr(data, name), getattr(expected, name), msg=name)
+        pd.testing.assert_frame_equal(data.psychometrics, expected.psychometrics)
+        pd.testing.assert_frame_equal(data.last_trials, expected.last_trials)
+        self.assertEqual(data.compute_end_session_criteria(), expected.compute_end_session_criteria())
+        self.assertEqual(data.response_time_median.value, expected.response_time_median.value)
+        data.update_trials(trials_table.iloc[:0], [])
+        self.assertEqual(data.ntrials, 500)
+
+    def test_update_trial_constant_memory(self):
+        """The state of the model does not grow with the number of trials."""
+        ntrials = 2000
+        trials_table, bpod_data = self.synthetic_trials(ntrials)
+        data = op.DataModel(settings_file=None)
+        shape = data.count.shape
+        for trial_data, trial_bpod_data in zip(trials_table.to_dict('records'), bpod_data, strict=True):
+            data.update_trial(trial_data, trial_bpod_data)
+        self.assertEqual(data.ntrials, ntrials)
+        self.assertEqual(data.count.shape, shape)
+        self.assertEqual(data.count.sum(), ntrials)
+        for column in op.DataModel.LAST_TRIALS_COLUMNS:
+            self.assertEqual(data.get_last_trials(column).size, op.NTRIALS_PLOT)
+        self.assertEqual(len(data.response_time_median._heights), 5)
+
+    def test_unknown_probability(self):
+        """Block probabilities that are not in the settings get their own psychometric curves."""
+        trials_table, bpod_data = self.synthetic_trials(10)
+        trials_table['stim_probability_left'] = 0.1
+        online_plots = op.OnlinePlots()
+        for i in range(trials_table.shape[0]):
+            online_plots.update_trial(trials_table.iloc[i], bpod_data[i])
+        xval, choice, _ = online_plots.data.get_psychometric_curve(0.1)
+        np.testing.assert_array_equal(online_plots.h.curve_psych[0.1][0].get_xdata(), xval)
+        np.testing.assert_array_equal(online_plots.h.curve_psych[0.1][0].get_ydata(), choice)
+        self.assertIn(0.1, online_plots.h.curve_reaction)
+
+
+class TestNewTrialListener(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.file_jsonable = Path(tmpdir.name).joinpath('_iblrig_taskData.raw.jsonable')
+        self.listener = op.NewTrialListener(self.file_jsonable, port=0)
+        self.addCleanup(self.listener.close)
+        self.sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addCleanup(self.sender.close)
+
+    def test_notification(self):
+        self.assertFalse(self.listener.wait(timeout=0.01))
+        # notifications for other sessions are ignored
+        self.sender.sendto(b'/foo/bar/_iblrig_taskData.raw.jsonable', ('127.0.0.1', self.listener.port))
+        self.assertFalse(self.listener.wait(timeout=0.5))
+        t0 = time.perf_counter()
+        self.sender.sendto(str(self.file_jsonable).encode(), ('127.0.0.1', self.listener.port))
+        self.assertTrue(self.listener.wait(timeout=5))
+        self.assertLess(time.perf_counter() - t0, 1)
+        self.assertFalse(self.listener.wait(timeout=0.01))
+        # once notifications have been received, the flag file is not polled anymore
+        self.listener.flag_file.touch()
+        with patch('iblrig.online_plots.time.time', return_value=time.time() + op.POLLING_SECS):
+            self.assertFalse(self.listener.wait(timeout=0.01))
+        self.assertTrue(self.listener.flag_file.exists())
+
+    def test_polling_fallback(self):
+        # the port is already in use: the listener falls back on polling the flag file
+        with self.assertLogs(op.log, 'WARNING'):
+            listener = op.NewTrialListener(self.file_jsonable, port=self.listener.port)
+        self.assertIsNone(listener.port)
+        self.assertFalse(listener.wait(timeout=0.01))
+        listener.flag_file.touch()
+        with patch('iblrig.online_plots.time.time', return_value=time.time() + op.POLLING_SECS):
+            self.assertTrue(listener.wait(timeout=0.01))
+        self.assertFalse(listener.flag_file.exists())
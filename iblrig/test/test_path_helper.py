@@ -2,10 +2,12 @@
 
 import logging
 import os
+import shutil
 import tempfile
 import unittest
 from copy import deepcopy
 from pathlib import Path
+from unittest.mock import patch
 
 import yaml
 
@@ -14,6 +16,9 @@ from iblrig import path_helper
 from iblrig.constants import BASE_DIR
 from iblrig.path_helper import load_pydantic_yaml, save_pydantic_yaml
 from iblrig.pydantic_definitions import HardwareSettings, RigSettings
+from iblrig.raw_data_loaders import load_task_jsonable
+from iblrig.subject_history import HISTORY_FILE, REMOTE_HISTORY_FILE, SubjectHistory, get_trials_summary, summarize_task_data
+from iblrig.trial_store import ArrowTrialWriter, arrow_file_from_jsonable
 
 
 class TestPathHelper(unittest.TestCase):
@@ -193,6 +198,114 @@ class TestIterateProtocols(unittest.TestCase):
         self.assertEqual([], path_helper._iterate_protocols(subject_folder, task))
 
 
+class TestSubjectHistory(unittest.TestCase):
+    """Test for iblrig.subject_history.SubjectHistory."""
+
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmpdir = Path(tmp.name)
+        self.subject_folder = self.tmpdir / 'fakelab' / 'Subjects' / 'fakemouse'
+        self.task = 'trainingCW'
+
+    def create_session(self, ntrials=400, **kwargs):
+        session_path = fu.create_fake_session_folder(self.tmpdir, **kwargs)
+        p = fu.create_fake_raw_behavior_data_folder(session_path, task=self.task, folder='raw_task_data_00', write_pars_stub=True)
+        fu.populate_task_settings(p, {'NTRIALS': ntrials})
+        return session_path
+
+    def test_index_invalidation(self):
+        session_path = self.create_session()
+        last_valid = path_helper._iterate_protocols(self.subject_folder, self.task)
+        self.assertEqual(session_path, last_valid[0]['session_path'])
+        self.assertTrue(self.subject_folder.joinpath(HISTORY_FILE).exists())
+        # the index is used instead of parsing the experiment description again
+        with patch('iblrig.subject_history.session_params.read_params') as mock_read:
+            last_valid = path_helper._iterate_protocols(self.subject_folder, self.task)
+            mock_read.assert_not_called()
+        self.assertEqual(session_path, last_valid[0]['session_path'])
+        # changes of the task settings are picked up
+        fu.populate_task_settings(session_path.joinpath('raw_task_data_00'), {'NTRIALS': 10})
+        self.assertEqual([], path_helper._iterate_protocols(self.subject_folder, self.task))
+        # new sessions are picked up
+        new_session_path = self.create_session(date='2100-01-01')
+        last_valid = path_helper._iterate_protocols(self.subject_folder, self.task, n=2)
+        self.assertEqual([new_session_path], [s['session_path'] for s in last_valid])
+        # removed sessions are dropped
+        shutil.rmtree(new_session_path)
+        self.assertEqual([], path_helper._iterate_protocols(self.subject_folder, self.task))
+        # a corrupt index is rebuilt
+        self.subject_folder.joinpath(HISTORY_FILE).write_text('foo')
+        with self.assertLogs('iblrig.subject_history', 'WARNING'):
+            self.assertEqual([], path_helper._iterate_protocols(self.subject_folder, self.task))
+
+    def test_trials_summary(self):
+        session_path = self.create_session()
+        history = SubjectHistory(self.subject_folder)
+        with self.assertRaises(FileNotFoundError):
+            history.trials_summary(session_path, 'raw_task_data_00')
+        file_fixture = Path(__file__).parent.joinpath('fixtures', 'task_data_short.jsonable')
+        file_task_data = session_path.joinpath('raw_task_data_00', '_iblrig_taskData.raw.jsonable')
+        shutil.copy(file_fixture, file_task_data)
+        history.update_session(session_path, 'raw_task_data_00')
+        expected = summarize_task_data(file_task_data)
+        self.assertEqual(2, expected['ntrials'])
+        with patch('iblrig.subject_history.summarize_task_data') as mock_summarize:
+            summary = get_trials_summary({'session_path': session_path, 'task_collection': 'raw_task_data_00'})
+            mock_summarize.assert_not_called()
+        self.assertEqual(expected, summary)
+        # the summary is updated once the task data changes
+        with open(file_task_data, 'a') as fp:
+            fp.write(file_fixture.read_text().splitlines(keepends=True)[0])
+        self.assertEqual(3, history.trials_summary(session_path, 'raw_task_data_00')['ntrials'])
+
+    def test_summarize_task_data(self):
+        file_task_data = self.create_session().joinpath('raw_task_data_00', '_iblrig_taskData.raw.jsonable')
+        shutil.copy(Path(__file__).parent.joinpath('fixtures', 'task_data_short.jsonable'), file_task_data)
+        trials_table, bpod_data = load_task_jsonable(file_task_data)
+        expected = summarize_task_data(file_task_data)
+
+        def write_arrow(ntrials):
+            writer = ArrowTrialWriter(arrow_file_from_jsonable(file_task_data))
+            for i in range(ntrials):
+                writer.append(trials_table.iloc[i].to_dict(), bpod_data[i])
+            writer.close()
+
+        # the Arrow stream is read if it holds all trials
+        write_arrow(2)
+        with patch('iblrig.subject_history.load_task_jsonable') as mock_load:
+            self.assertEqual(expected, summarize_task_data(file_task_data))
+            mock_load.assert_not_called()
+        # the jsonable file is read if trials are missing from the Arrow stream
+        write_arrow(1)
+        with self.assertLogs('iblrig.subject_history', 'WARNING'):
+            self.assertEqual(expected, summarize_task_data(file_task_data))
+
+    def test_remote_index(self):
+        """Test that the index of a subject folder on the server is kept on the rig."""
+        local_subject_folder = self.subject_folder
+        self.create_session()
+        self.tmpdir = self.tmpdir.joinpath('remote')
+        self.subject_folder = self.tmpdir / 'fakelab' / 'Subjects' / 'fakemouse'
+        remote_session_path = self.create_session(date='2100-01-01')
+        kwargs = {'local_path': local_subject_folder.parent, 'remote_path': self.subject_folder.parent, 'lab': 'fakelab'}
+        sessions = path_helper.iterate_previous_sessions('fakemouse', self.task, n=2, **kwargs)
+        self.assertEqual(remote_session_path, sessions[0]['session_path'])
+        self.assertEqual(local_subject_folder.joinpath(REMOTE_HISTORY_FILE), sessions[0]['file_subject_history'])
+        self.assertEqual([], list(self.subject_folder.glob('.iblrig_subject_history*')))
+        self.assertEqual(
+            {HISTORY_FILE, REMOTE_HISTORY_FILE}, {f.name for f in local_subject_folder.glob('.iblrig_subject_history*')}
+        )
+        # the trials summary of a remote session is stored in the local index
+        shutil.copy(Path(__file__).parent.joinpath('fixtures', 'task_data_short.jsonable'), sessions[0]['file_task_data'])
+        self.assertEqual(2, get_trials_summary(sessions[0])['ntrials'])
+        self.assertEqual([], list(self.subject_folder.glob('.iblrig_subject_history*')))
+        with patch('iblrig.subject_history.summarize_task_data') as mock_summarize:
+            path_helper.iterate_previous_sessions('fakemouse', self.task, n=2, **kwargs)
+            get_trials_summary(sessions[0])
+            mock_summarize.assert_not_called()
+
+
 class TestPatchSettings(unittest.TestCase):
     """Test for iblrig.path_helper.patch_settings."""
 
@@ -1,7 +1,13 @@
 import unittest
 from pathlib import Path
+from typing import Annotated
 
-from iblrig.pydantic_definitions import BunchModel, RigSettings
+import numpy as np
+import pandas as pd
+from annotated_types import Interval
+from pydantic import NonNegativeInt, ValidationError
+
+from iblrig.pydantic_definitions import BunchModel, RigSettings, TrialDataModel
 
 
 class TestBunchModel(unittest.TestCase):
@@ -56,3 +62,54 @@ class TestRigSettings(unittest.TestCase):
             rig_settings.ALYX_USER = 'John Doe'
         with self.assertRaises(ValueError):
             rig_settings.iblrig_remote_data_path = True
+
+
+class TestTrialDataModel(unittest.TestCase):
+    class TestModel(TrialDataModel):
+        contrast: float
+        trial_num: NonNegativeInt
+        response_side: Annotated[int, Interval(ge=-1, le=1)]
+        trial_correct: bool
+        pause_duration: float = 0.0
+        block_num: NonNegativeInt = 0
+
+    def test_preallocate_dataframe(self):
+        trials_table = self.TestModel.preallocate_dataframe(10)
+        self.assertEqual((10, 6), trials_table.shape)
+        expected_dtypes = {
+            'contrast': pd.Float64Dtype(),
+            'trial_num': pd.Int64Dtype(),
+            'response_side': pd.Int8Dtype(),
+            'trial_correct': pd.BooleanDtype(),
+            'pause_duration': np.dtype(np.float64),
+            'block_num': np.dtype(np.int64),
+        }
+        self.assertEqual(expected_dtypes, trials_table.dtypes.to_dict())
+        self.assertTrue(trials_table['contrast'].isna().all())
+        self.assertTrue(np.all(trials_table['pause_duration'] == 0))
+
+    def test_dataframe_row(self):
+        trials_table = self.TestModel.preallocate_dataframe(10)
+        trials_table['extra'] = np.arange(10)
+        trials_table.at[3, 'contrast'] = 0.5
+        trials_table.at[3, 'trial_num'] = 3
+        trials_table.at[3, 'response_side'] = -np.sign(0.5)
+        trials_table.at[3, 'trial_correct'] = np.True_
+        row = self.TestModel.dataframe_row(trials_table, 3)
+        expected = {
+            'contrast': 0.5,
+            'trial_num': 3,
+            'response_side': -1,
+            'trial_correct': True,
+            'pause_duration': 0.0,
+            'block_num': 0,
+            'extra': 3,
+        }
+        self.assertEqual(expected, row)
+        self.assertTrue(all(type(v) in (int, float, bool) for v in row.values()))
+        self.assertEqual(expected, self.TestModel.model_validate(row).model_dump())
+        # unset values are pandas.NA and fail validation
+        row = self.TestModel.dataframe_row(trials_table, 4)
+        self.assertIs(row['contrast'], pd.NA)
+        with self.assertRaises(ValidationError):
+            self.TestModel.model_validate(row)
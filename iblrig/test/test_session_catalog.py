@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from iblrig.session_catalog import CATALOG_FILE, SessionCatalog
+from iblrig.transfer_experiments import CopyState, TransferManifest
+from iblutil.util import dir_size
+
+
+class TestSessionCatalog(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.subjects_folder = Path(tmpdir.name)
+        self.sessions = ['SW_001/2024-01-01/001', 'SW_001/2024-01-02/001', 'SW_001/2024-01-02/002', 'SW_002/2024-01-01/001']
+        for i, session in enumerate(self.sessions):
+            self._write_file(session, 'raw_task_data_00/_iblrig_taskData.raw.jsonable', 100 * (i + 1))
+        self.subjects_folder.joinpath('SW_001', 'not_a_date').mkdir()
+        self.subjects_folder.joinpath('SW_001', '2024-01-01', 'foo').mkdir()
+
+    def _write_file(self, session: str, relative_path: str, n_bytes: int) -> None:
+        file_path = self.subjects_folder.joinpath(session, relative_path)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_bytes(b'0' * n_bytes)
+        # make sure the modification time of the parent folder changes on file systems with a coarse resolution
+        st_mtime_ns = file_path.parent.stat().st_mtime_ns + 10**9
+        os.utime(file_path.parent, ns=(st_mtime_ns, st_mtime_ns))
+
+    def _refresh(self, catalog: SessionCatalog) -> dict[str, dict]:
+        return {r['session']: r for r in catalog.refresh(max_workers=2)}
+
+    def test_refresh(self):
+        catalog = SessionCatalog(self.subjects_folder)
+        self.assertEqual(catalog.records(), [])
+        updated = self._refresh(catalog)
+        self.assertEqual(set(updated), set(self.sessions))
+        for session, record in updated.items():
+            self.assertEqual(record['session_path'], self.subjects_folder.joinpath(session))
+            self.assertEqual(record['subject'], session.split('/')[0])
+            self.assertEqual(record['size'], dir_size(record['session_path']))
+            self.assertIsNone(record['copy_state'])
+            self.assertIsInstance(record['date'], float)
+        self.assertTrue(self.subjects_folder.joinpath(CATALOG_FILE).exists())
+
+        # the cached entries are loaded from disk, unchanged sessions are not probed again
+        catalog = SessionCatalog(self.subjects_folder)
+        self.assertEqual({r['session']: r for r in catalog.records()}, updated)
+        with mock.patch('iblrig.session_catalog.dir_size', wraps=dir_size) as mock_dir_size:
+            self.assertEqual(self._refresh(catalog), {})
+            mock_dir_size.assert_not_called()
+
+            # a new file within a collection only updates the size of its session
+            self._write_file(self.sessions[1], 'raw_task_data_00/_iblrig_taskSettings.raw.json', 1000)
+            updated = self._refresh(catalog)
+            self.assertEqual(list(updated), [self.sessions[1]])
+            self.assertEqual(updated[self.sessions[1]]['size'], 1200)
+            mock_dir_size.assert_called_once()
+
+            # the copy state is updated from the transfer manifest
+            manifest = TransferManifest(self.subjects_folder.joinpath(self.sessions[2]))
+            manifest.set_copy_state('behavior', CopyState.COMPLETE)
+            manifest.save()
+            updated = self._refresh(catalog)
+            self.assertEqual(list(updated), [self.sessions[2]])
+            self.assertEqual(updated[self.sessions[2]]['copy_state'], CopyState.COMPLETE)
+            self.assertEqual(updated[self.sessions[2]]['size'], dir_size(manifest.file.parent))
+
+            # forcing the refresh re-reads all sessions
+            mock_dir_size.reset_mock()
+            self.assertEqual(self._refresh(catalog), {})
+            list(catalog.refresh(force=True))
+            self.assertEqual(mock_dir_size.call_count, len(self.sessions))
+
+    def test_new_and_removed_sessions(self):
+        catalog = SessionCatalog(self.subjects_folder)
+        self._refresh(catalog)
+        shutil.rmtree(self.subjects_folder.joinpath(self.sessions[0]))
+        self._write_file('SW_003/2024-01-03/001', 'raw_video_data/_iblrig_leftCamera.raw.avi', 10)
+        self.assertEqual(list(self._refresh(catalog)), ['SW_003/2024-01-03/001'])
+        self.assertEqual({r['session'] for r in catalog.records()}, set(self.sessions[1:]) | {'SW_003/2024-01-03/001'})
+
+    def test_corrupt_catalog(self):
+        self.subjects_folder.joinpath(CATALOG_FILE).write_text('foo')
+        with self.assertLogs('iblrig.session_catalog', 'WARNING'):
+            catalog = SessionCatalog(self.subjects_folder)
+        self.assertEqual(set(self._refresh(catalog)), set(self.sessions))
@@ -0,0 +1,99 @@
+import json
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from iblrig import session_qc
+from iblrig.raw_data_loaders import load_task_jsonable
+
+FIXTURE = Path(__file__).parent.joinpath('fixtures', 'task_data_short.jsonable')
+
+
+class TestSessionMetrics(unittest.TestCase):
+    def test_session_metrics(self):
+        trials_table, bpod_data = load_task_jsonable(FIXTURE)
+        metrics = session_qc.session_metrics(FIXTURE)
+        self.assertEqual(metrics['n_trials'], 2)
+        self.assertEqual(metrics['performance'], trials_table['trial_correct'].mean())
+        self.assertEqual(metrics['reward_delivered'], trials_table['reward_amount'].sum())
+        expected_iti = bpod_data[1]['Trial start timestamp'] - bpod_data[0]['Trial end timestamp']
+        self.assertAlmostEqual(metrics['iti_median'], expected_iti)
+        self.assertEqual(metrics['iti_jitter'], 0)
+        self.assertEqual(metrics['n_missing_frame2ttl'], 0)
+
+    def test_synthetic_session(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            file_task_data = Path(tmpdir).joinpath('_iblrig_taskData.raw.jsonable')
+            trial_end, lines = 0.0, []
+            for i, (reward_amount, iti) in enumerate(zip([1.5, 3.0, 0.0, 2.0], [0.5, 0.7, 0.6, 0.5], strict=True)):
+                trial_start = trial_end + iti
+                trial_end = trial_start + 5
+                states = {
+                    'reward': [[trial_start + 1, trial_start + 1 + reward_amount * 0.05]] if reward_amount else [[np.nan] * 2]
+                }
+                events = {'BNC1High': [trial_start + 0.1], 'Port1In': [trial_start + 0.2]} if i != 2 else {'Tup': [trial_start]}
+                behavior_data = {
+                    'Trial start timestamp': trial_start,
+                    'Trial end timestamp': trial_end,
+                    'States timestamps': states,
+                    'Events timestamps': events,
+                }
+                trial_data = {'trial_correct': reward_amount > 0, 'contrast': 1.0, 'reward_amount': reward_amount}
+                lines.append(json.dumps(trial_data | {'behavior_data': behavior_data}))
+            file_task_data.write_text('\n'.join(lines) + '\n')
+            metrics = session_qc.session_metrics(file_task_data)
+        self.assertEqual(metrics['performance'], 0.75)
+        self.assertEqual(metrics['performance_easy'], 0.75)
+        self.assertAlmostEqual(metrics['reward_valve_r'], 1)
+        self.assertEqual(metrics['n_missing_frame2ttl'], 1)
+        self.assertEqual(metrics['n_missing_sound'], 4)
+        self.assertEqual(metrics['n_missing_camera'], 1)
+        self.assertAlmostEqual(metrics['iti_median'], 0.6)
+        self.assertAlmostEqual(metrics['iti_jitter'], np.std([0.7, 0.6, 0.5]))
+
+
+class TestMakeQCReport(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.subjects_folder = Path(tmpdir.name)
+        self.files = [
+            'SW_001/2024-01-01/001/raw_task_data_00/_iblrig_taskData.raw.jsonable',
+            'SW_001/2024-01-01/001/raw_task_data_01/_iblrig_taskData.raw.jsonable',
+            'SW_002/2024-01-02/003/raw_behavior_data/_iblrig_taskData.raw.jsonable',
+        ]
+        for file in self.files:
+            self.subjects_folder.joinpath(file).parent.mkdir(parents=True)
+            shutil.copy(FIXTURE, self.subjects_folder.joinpath(file))
+
+    def test_make_qc_report(self):
+        self.subjects_folder.joinpath(self.files[2]).write_text('foo')
+        with self.assertLogs('iblrig.session_qc', 'WARNING'):
+            report = session_qc.make_qc_report(self.subjects_folder, max_workers=2)
+        pd.testing.assert_frame_equal(report, pd.read_parquet(self.subjects_folder.joinpath(session_qc.QC_REPORT_FILE)))
+        self.assertEqual(report['file_task_data'].tolist(), self.files)
+        self.assertEqual(report['subject'].tolist(), ['SW_001', 'SW_001', 'SW_002'])
+        self.assertEqual(report['task_collection'].tolist(), ['raw_task_data_00', 'raw_task_data_01', 'raw_behavior_data'])
+        self.assertEqual(report['n_trials'].tolist()[:2], [2, 2])
+        self.assertTrue(report['error'][:2].isna().all())
+        self.assertIsNotNone(report['error'][2])
+
+        # unchanged files are not processed again
+        with mock.patch('iblrig.session_qc.ProcessPoolExecutor') as executor:
+            pd.testing.assert_frame_equal(session_qc.make_qc_report(self.subjects_folder), report)
+            executor.assert_not_called()
+        shutil.copy(FIXTURE, self.subjects_folder.joinpath(self.files[2]))
+        shutil.rmtree(self.subjects_folder.joinpath('SW_001', '2024-01-01', '001', 'raw_task_data_01'))
+        with mock.patch('iblrig.session_qc.session_metrics', wraps=session_qc.session_metrics) as session_metrics:
+            # the executor is replaced by a thread pool to count the calls
+            with mock.patch('iblrig.session_qc.ProcessPoolExecutor', ThreadPoolExecutor):
+                report = session_qc.make_qc_report(self.subjects_folder)
+            session_metrics.assert_called_once_with(self.subjects_folder.joinpath(self.files[2]))
+        self.assertEqual(report['file_task_data'].tolist(), [self.files[0], self.files[2]])
+        self.assertTrue(report['error'].isna().all())
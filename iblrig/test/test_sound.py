@@ -0,0 +1,78 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from iblrig import sound
+
+
+class TestSoundCache(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.cache_dir = Path(tmpdir.name)
+        self.kwargs = dict(rate=96000, frequency=5000, duration=0.1, amplitude=0.5, fade=0.01, chans='L+TTL')
+
+    def test_make_sound_cached(self):
+        expected = sound.make_sound(**self.kwargs)
+        with mock.patch('iblrig.sound.make_sound', wraps=sound.make_sound) as make_sound:
+            for _ in range(2):
+                np.testing.assert_array_equal(sound.make_sound_cached(**self.kwargs, cache_dir=self.cache_dir), expected)
+            make_sound.assert_called_once()
+            # other arguments render a new waveform
+            sound.make_sound_cached(**(self.kwargs | {'frequency': 6000}), cache_dir=self.cache_dir)
+            self.assertEqual(make_sound.call_count, 2)
+        self.assertEqual(len(list(self.cache_dir.glob('*.npy'))), 2)
+        # numerically equal arguments share a waveform
+        key = sound.sound_cache_key(**self.kwargs)
+        self.assertEqual(sound.sound_cache_key(**(self.kwargs | {'rate': 96e3, 'chans': ['L+TTL']})), key)
+        # corrupt files are replaced
+        self.cache_dir.joinpath(f'{key}.npy').write_bytes(b'foo')
+        with self.assertLogs('iblrig.sound', 'WARNING'):
+            np.testing.assert_array_equal(sound.make_sound_cached(**self.kwargs, cache_dir=self.cache_dir), expected)
+        np.testing.assert_array_equal(np.load(self.cache_dir.joinpath(f'{key}.npy')), expected)
+
+    def test_white_noise(self):
+        kwargs = self.kwargs | {'frequency': -1}
+        # white noise is rendered anew unless caching it is requested
+        noise = [sound.make_sound_cached(**kwargs, cache_dir=self.cache_dir) for _ in range(2)]
+        self.assertFalse(np.array_equal(*noise))
+        self.assertEqual(list(self.cache_dir.glob('*.npy')), [])
+        noise = [sound.make_sound_cached(**kwargs, cache_dir=self.cache_dir, cache_white_noise=True) for _ in range(2)]
+        np.testing.assert_array_equal(*noise)
+        self.assertEqual(len(list(self.cache_dir.glob('*.npy'))), 1)
+
+
+class TestMakeSound(unittest.TestCase):
+    def test_make_sounds(self):
+        frequencies = [5000, -1, 10000]
+        kwargs = dict(rate=96000, duration=0.1, fade=0.01)
+        for chans in ['mono', 'L', 'R', 'stereo', 'L+TTL', 'TTL+R']:
+            with self.subTest(chans=chans):
+                np.random.seed(0)
+                sounds = sound.make_sounds(frequencies=frequencies, amplitudes=[1, 0.5, 0.1], chans=chans, **kwargs)
+                self.assertEqual(sounds.shape, (3, 9600, 1 if chans == 'mono' else 2))
+                self.assertTrue(sounds.flags.c_contiguous)
+                # the batch matches sounds rendered one by one
+                np.random.seed(0)
+                for i, (frequency, amplitude) in enumerate(zip(frequencies, [1, 0.5, 0.1], strict=True)):
+                    expected = sound.make_sound(frequency=frequency, amplitude=amplitude, chans=chans, **kwargs)
+                    np.testing.assert_array_equal(sounds[i], expected.reshape(sounds.shape[1:]))
+        # tones are faded in and out, the TTL lasts for 10 ms
+        sounds = sound.make_sounds(frequencies=frequencies, chans='L+TTL', **kwargs)
+        np.testing.assert_array_equal(sounds[[0, 2], 0, 0], 0)
+        np.testing.assert_array_equal(np.sum(sounds[:, :, 1] == 0.99, axis=1), 960)
+
+    def test_make_sounds_dtype(self):
+        rng = np.random.default_rng(2024)
+        sounds = sound.make_sounds(frequencies=[5000, -1], rate=192000, dtype=np.int32, rng=rng)
+        self.assertEqual(sounds.dtype, np.int32)
+        expected = sound.make_sounds(frequencies=[5000, -1], rate=192000, rng=np.random.default_rng(2024))
+        for i in range(2):
+            np.testing.assert_array_equal(sounds[i], sound.format_sound(expected[i]))
+            # integer sounds are passed through by format_sound
+            self.assertTrue(np.shares_memory(sound.format_sound(sounds[i], flat=True), sounds))
+        sounds = sound.make_sounds(frequencies=5000, chans='stereo', dtype=np.int16)
+        self.assertEqual(sounds.max(), np.iinfo(np.int16).max - 1)
@@ -1,6 +1,7 @@
 import copy
 import random
 import tempfile
+import time
 import unittest
 from datetime import datetime
 from pathlib import Path
@@ -13,7 +14,19 @@ from ibllib.io import session_params
 from ibllib.tests.fixtures.utils import populate_raw_spikeglx
 from iblrig.path_helper import HardwareSettings, load_pydantic_yaml
 from iblrig.test.base import TASK_KWARGS
-from iblrig.transfer_experiments import BehaviorCopier, EphysCopier, SessionCopier, VideoCopier
+from iblrig.transfer_experiments import (
+    MANIFEST_FILE,
+    BandwidthLimiter,
+    BehaviorCopier,
+    CopyState,
+    EphysCopier,
+    SessionCopier,
+    TransferManifest,
+    TransferScheduler,
+    VideoCopier,
+    _copy_file_checksum,
+    copy_folders,
+)
 from iblrig_tasks._iblrig_tasks_trainingChoiceWorld.task import Session
 
 
@@ -100,6 +113,7 @@ class TestIntegrationTransferExperiments(unittest.TestCase):
                 session_path=session.paths.SESSION_FOLDER, remote_subjects_folder=session.paths.REMOTE_SUBJECT_FOLDER
             )
             self.assertEqual(sc.state, 3)
+            self.assertEqual(CopyState.FINALIZED, TransferManifest(session.paths.SESSION_FOLDER).get_copy_state('behavior'))
         # Check that the settings file is used when no path passed
         session = _create_behavior_session(ntrials=50, hard_crash=hard_crash, kwargs=self.session_kwargs)
         session.paths.SESSION_FOLDER.joinpath('transfer_me.flag').touch()
@@ -123,6 +137,7 @@ class TestIntegrationTransferExperiments(unittest.TestCase):
         self.assertFalse(sc.copy_collections())  # fails because of missing task data
         self.assertEqual(0, sc.state)
         self.assertEqual([], list(filter(Path.is_file, session.paths.REMOTE_SUBJECT_FOLDER.rglob('*'))))
+        self.assertFalse(sc.run())  # the copy can't complete
 
         # Create with task data
         session = _create_behavior_session(kwargs=self.session_kwargs, ntrials=50)
@@ -132,6 +147,7 @@ class TestIntegrationTransferExperiments(unittest.TestCase):
         self.assertEqual(2, sc.state)
         sc.finalize_copy(number_of_expected_devices=1)
         self.assertEqual(3, sc.state)  # this time it's all there and we move on
+        self.assertTrue(sc.run())
 
     def test_behavior_ephys_video_copy(self):
         """
@@ -286,6 +302,150 @@ class TestIntegrationTransferExperiments(unittest.TestCase):
         self.assertTrue(lg.output[-1].endswith('_old/snapshot_00.jpeg'))
 
 
+class TestCopyEngine(unittest.TestCase):
+    """Test iblrig.transfer_experiments.copy_folders and the transfer manifest."""
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.session_path = Path(tmpdir.name).joinpath('local', 'subject', '2024-01-01', '001')
+        self.remote_path = Path(tmpdir.name).joinpath('remote', 'subject', '2024-01-01', '001')
+        self.local_folder = self.session_path.joinpath('raw_task_data_00')
+        self.local_folder.joinpath('sub').mkdir(parents=True)
+        for i, size in enumerate([0, 1000, 250_000]):
+            self.local_folder.joinpath('sub' if i else '', f'file_{i}.bin').write_bytes(random.randbytes(size))
+        self.local_folder.joinpath('transfer_me.flag').touch()
+
+    def test_copy_folders(self):
+        remote_folder = self.remote_path.joinpath('raw_task_data_00')
+        manifest = TransferManifest(self.session_path)
+        self.assertTrue(copy_folders(self.local_folder, remote_folder, manifest=manifest, max_workers=2))
+        local_files = sorted(f.relative_to(self.local_folder) for f in self.local_folder.rglob('*.bin'))
+        self.assertEqual(local_files, sorted(f.relative_to(remote_folder) for f in remote_folder.rglob('*') if f.is_file()))
+        for f in local_files:
+            self.assertEqual(self.local_folder.joinpath(f).read_bytes(), remote_folder.joinpath(f).read_bytes())
+        # the manifest is saved in the session folder and records verified hashes
+        self.assertEqual(len(local_files), len(TransferManifest(self.session_path).files))
+        self.assertTrue(all(entry['verified'] for entry in TransferManifest(self.session_path).files.values()))
+        # without overwrite, copying to an existing folder fails
+        with self.assertLogs('iblrig.transfer_experiments', 'ERROR'):
+            self.assertFalse(copy_folders(self.local_folder, remote_folder))
+        # verified files are neither hashed nor copied again
+        with mock.patch('iblrig.transfer_experiments._hash_file') as hash_file:
+            self.assertTrue(
+                copy_folders(self.local_folder, remote_folder, overwrite=True, manifest=TransferManifest(self.session_path))
+            )
+        hash_file.assert_not_called()
+        # a modified file invalidates its entry and is copied again
+        modified = self.local_folder.joinpath('sub', 'file_1.bin')
+        modified.write_bytes(random.randbytes(1000))
+        self.assertIsNone(manifest.get(modified))
+        self.assertTrue(copy_folders(self.local_folder, remote_folder, overwrite=True, manifest=manifest))
+        self.assertEqual(modified.read_bytes(), remote_folder.joinpath('sub', 'file_1.bin').read_bytes())
+
+    def test_manifest(self):
+        manifest = TransferManifest(self.session_path)
+        self.assertIsNone(manifest.get_copy_state())
+        manifest.set_copy_state('behavior', CopyState.FINALIZED)
+        manifest.set_copy_state('video', CopyState.PENDING)
+        self.assertTrue(copy_folders(self.local_folder, self.remote_path.joinpath('raw_task_data_00'), manifest=manifest))
+        manifest = TransferManifest(self.session_path)
+        self.assertEqual(CopyState.FINALIZED, manifest.get_copy_state('behavior'))
+        self.assertEqual(CopyState.PENDING, manifest.get_copy_state())  # least advanced state of all copiers
+        self.assertEqual([], manifest.modified_files())
+        # files modified after the copy are detected from their status only
+        modified = self.local_folder.joinpath('sub', 'file_2.bin')
+        modified.write_bytes(b'foo')
+        self.local_folder.joinpath('sub', 'file_1.bin').unlink()
+        with mock.patch('iblrig.transfer_experiments._hash_file') as hash_file:
+            self.assertEqual([modified], manifest.modified_files())
+        hash_file.assert_not_called()
+
+    def test_manifest_concurrent(self):
+        # two copiers of the same session share their manifest
+        copiers = [
+            SessionCopier(self.session_path, self.remote_path.parent.parent.parent, tag=tag) for tag in ('behavior', 'video')
+        ]
+        self.assertIs(copiers[0].manifest, copiers[1].manifest)
+        self.assertIs(TransferManifest.for_session(self.session_path), copiers[0].manifest)
+        # manifests loaded at once by different processes are merged on save, no entry is lost
+        files = sorted(self.local_folder.rglob('*.bin'))
+        manifests = [TransferManifest(self.session_path) for _ in range(2)]
+        for manifest, file, tag in zip(manifests, files, ('behavior', 'video'), strict=False):
+            manifest.update(file, 'hash', verified=True)
+            manifest.set_copy_state(tag, CopyState.COMPLETE)
+        for manifest in manifests:
+            manifest.save()
+        manifest = TransferManifest(self.session_path)
+        self.assertEqual({manifest._key(f) for f in files[:2]}, set(manifest.files))
+        self.assertEqual({'behavior', 'video'}, set(manifest.copy_states))
+        self.assertEqual(manifest.files, manifests[1].files)
+        self.assertEqual([MANIFEST_FILE], [f.name for f in self.session_path.glob('transfer_manifest*')])
+
+    def test_resume(self):
+        src = self.local_folder.joinpath('sub', 'file_2.bin')
+        dst = self.remote_path.joinpath('file_2.bin')
+        dst.parent.mkdir(parents=True)
+        part = dst.with_name(dst.name + '.part')
+        # a partial copy is resumed from the last chunk that matches the source
+        part.write_bytes(src.read_bytes()[:100_000])
+        with self.assertLogs('iblrig.transfer_experiments', 'INFO') as lg:
+            _copy_file_checksum(src, dst, chunk_size=2**15)
+        self.assertIn('Resuming copy', lg.output[0])
+        self.assertEqual(src.read_bytes(), dst.read_bytes())
+        self.assertFalse(part.exists())
+        # a partial copy that doesn't match the source is overwritten
+        part.write_bytes(random.randbytes(300_000))
+        dst.unlink()
+        _copy_file_checksum(src, dst, chunk_size=2**15)
+        self.assertEqual(src.read_bytes(), dst.read_bytes())
+        # a hash mismatch raises and leaves the destination untouched
+        dst.unlink()
+        with mock.patch('iblrig.transfer_experiments._hash_file', return_value='foo'), self.assertRaises(OSError):
+            _copy_file_checksum(src, dst)
+        self.assertFalse(dst.exists())
+
+
+class TestTransferScheduler(unittest.TestCase):
+    """Test iblrig.transfer_experiments.TransferScheduler and BandwidthLimiter."""
+
+    def test_bandwidth_limiter(self):
+        limiter = BandwidthLimiter(max_bytes_per_second=2**20)
+        t0 = time.monotonic()
+        for _ in range(6):
+            limiter.consume(2**18)
+        self.assertGreater(time.monotonic() - t0, 1.2)  # 1.5 MiB, of which 1 MiB is spent on an empty bucket
+        self.assertEqual(6 * 2**18, limiter.total_bytes)
+        unlimited = BandwidthLimiter()
+        with mock.patch('iblrig.transfer_experiments.time.sleep') as sleep:
+            unlimited.consume(2**30)
+        sleep.assert_not_called()
+
+    def test_scheduler(self):
+        order = []
+
+        def copier(tag, fail=False, success=True):
+            def run(**_):
+                order.append(tag)
+                if fail:
+                    raise OSError('server unreachable')
+                return success
+
+            return mock.Mock(tag=tag, session_path=Path(tag), run=mock.Mock(side_effect=run))
+
+        copiers = [copier('video'), copier('foo', success=False), copier('behavior', fail=True), copier('ephys')]
+        scheduler = TransferScheduler(copiers, max_sessions=1, max_bandwidth=100)
+        with self.assertLogs('iblrig.transfer_experiments', 'INFO') as lg:
+            failed = scheduler.run(number_of_expected_devices=2)
+        # behavior data are copied first and a failure doesn't abort the queue
+        self.assertEqual(['behavior', 'ephys', 'video', 'foo'], order)
+        self.assertCountEqual([copiers[2], copiers[1]], failed)  # copies completing at once are unordered
+        for c in copiers:
+            c.run.assert_called_once_with(number_of_expected_devices=2)
+            self.assertIs(scheduler.bandwidth_limiter, c.bandwidth_limiter)
+        self.assertIn('4/4 sessions processed (2 failed)', lg.output[-1])
+
+
 class TestBuildGlobPattern(unittest.TestCase):
     """Test iblrig.commands._build_glob_pattern function."""
 
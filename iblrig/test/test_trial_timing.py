@@ -0,0 +1,62 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from iblrig.trial_timing import TIMINGS_FILE, TrialTimer
+
+
+class TestTrialTimer(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.file_path = Path(tmpdir.name).joinpath(TIMINGS_FILE)
+        self.timer = TrialTimer(['next_trial', 'send_state_machine', 'iti_overhead'], file_path=self.file_path, capacity=8)
+
+    def test_measure(self):
+        self.timer.record('iti_overhead', 1.0)  # ignored before the first trial
+        self.timer.start_trial(0)
+        with self.timer.measure('next_trial'):
+            pass
+        self.timer.record('iti_overhead', 0.2)
+        self.timer.record('iti_overhead', 0.1)
+        durations = self.timer.to_dataframe()
+        self.assertEqual(durations.index.tolist(), [0])
+        self.assertGreater(durations.at[0, 'next_trial'], 0)
+        self.assertTrue(np.isnan(durations.at[0, 'send_state_machine']))
+        self.assertAlmostEqual(durations.at[0, 'iti_overhead'], 0.3)
+        with self.assertRaises(KeyError):
+            self.timer.record('foo', 0.1)
+
+    def test_ring_buffer(self):
+        ntrials = 20
+        for i in range(ntrials):
+            self.timer.start_trial(i)
+            self.timer.record('next_trial', i / 1000)
+            if i % 2:
+                self.timer.record('iti_overhead', 0.5)
+        self.assertEqual(self.timer.ntrials, ntrials)
+        # the ring buffer holds the last trials, the earlier trials have been written to the timing file
+        durations = self.timer.to_dataframe()
+        self.assertEqual(durations.index.tolist(), list(range(12, 20)))
+        np.testing.assert_allclose(durations['next_trial'], np.arange(12, 20) / 1000)
+        self.assertEqual(len(pd.read_csv(self.file_path)), 16)
+        self.timer.save()
+        self.timer.save()
+        saved = pd.read_csv(self.file_path, index_col='trial_num')
+        self.assertEqual(saved.index.tolist(), list(range(ntrials)))
+        np.testing.assert_allclose(saved['next_trial'], np.arange(ntrials) / 1000)
+        self.assertEqual(saved['iti_overhead'].isna().sum(), 10)
+        # the summary covers the trials held in the ring buffer
+        summary = self.timer.summary()
+        self.assertEqual(summary.columns.tolist(), ['count', 'p50', 'p95', 'p99', 'max'])
+        self.assertEqual(summary['count'].tolist(), [8, 0, 4])
+        self.assertAlmostEqual(summary.at['next_trial', 'p50'], np.median(np.arange(12, 20) / 1000))
+        self.assertAlmostEqual(summary.at['next_trial', 'max'], 0.019)
+        self.assertTrue(summary.loc['send_state_machine', 'p50':].isna().all())
+        self.assertEqual(summary.at['iti_overhead', 'p99'], 0.5)
+        with self.assertLogs('iblrig.trial_timing', 'INFO') as lg:
+            self.timer.log_summary()
+        self.assertIn('over the last 8 trials', lg.records[0].getMessage())
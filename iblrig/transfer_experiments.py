@@ -1,13 +1,18 @@
 import datetime
+import hashlib
 import json
 import logging
 import os
 import shutil
 import socket
+import tempfile
+import threading
+import time
 import traceback
 import uuid
+import weakref
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 from enum import IntEnum
-from os.path import samestat
 from pathlib import Path
 
 import ibllib.pipes.misc
@@ -16,13 +21,17 @@ import one.alf.files as alfiles
 from ibllib.io import raw_data_loaders, session_params
 from ibllib.pipes.misc import sleepless
 from iblrig.raw_data_loaders import load_task_jsonable
-from iblutil.io import hashfile
 from one.util import ensure_list
 
 log = logging.getLogger(__name__)
 
 ES_CONTINUOUS = 0x80000000
 ES_SYSTEM_REQUIRED = 0x00000001
+COPY_CHUNK_SIZE = 2**24  # 16 MiB
+COPY_MAX_WORKERS = 4
+MANIFEST_FILE = 'transfer_manifest.json'
+TRANSFER_PRIORITY = ('behavior', 'ephys', 'video')
+"""tuple of str: Order in which the data of the different copiers are transferred by the `TransferScheduler`."""
 
 
 class CopyState(IntEnum):
@@ -33,27 +42,278 @@ class CopyState(IntEnum):
     FINALIZED = 3
 
 
-@sleepless
-def _copy2_checksum(src: str, dst: str, *args, **kwargs) -> str:
+class TransferManifest:
+    """
+    Per-session record of the files' hashes and copy state.
+
+    The manifest is stored in the local session folder, next to `transfer_me.flag`. A file's entry is only considered
+    valid as long as the file's size and modification time haven't changed, in which case its hash does not need to be
+    recomputed and, if the copy has been verified, the copy can be skipped altogether. The last known copy state of each
+    copier is recorded as well, so that the status of a session can be displayed without accessing the remote server.
+
+    Several copiers (e.g. behavior and video) share the manifest of a session, see :meth:`for_session`. When saved, the
+    manifest is merged with the file on disk so that the entries recorded by other processes are kept.
+    """
+
+    _instances: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+    _instances_lock = threading.Lock()
+
+    def __init__(self, session_path: str | Path):
+        """
+        Per-session record of the files' hashes and copy state.
+
+        Parameters
+        ----------
+        session_path : str or Path
+            The local session folder.
+        """
+        self.session_path = Path(session_path)
+        self._lock = threading.Lock()
+        self._modified_files: set[str] = set()  # entries recorded since the manifest was last read or saved
+        self._modified_states: set[str] = set()
+        self.files, self.copy_states = self._read()
+
+    @classmethod
+    def for_session(cls, session_path: str | Path) -> 'TransferManifest':
+        """
+        Return the manifest of a session, shared by all its users within the process.
+
+        Parameters
+        ----------
+        session_path : str or Path
+            The local session folder.
+
+        Returns
+        -------
+        TransferManifest
+            The manifest of the session, read from disk if it isn't in use.
+        """
+        key = Path(session_path).resolve()
+        with cls._instances_lock:
+            if (manifest := cls._instances.get(key)) is None:
+                manifest = cls._instances[key] = cls(session_path)
+        return manifest
+
+    def _read(self) -> tuple[dict[str, dict], dict[str, dict]]:
+        """Read the files' entries and the copy states from disk."""
+        if not self.file.exists():
+            return {}, {}
+        try:
+            content = json.loads(self.file.read_text())
+        except (OSError, ValueError):
+            log.warning(f'Could not read {self.file}, all files will be hashed again')
+            return {}, {}
+        return content.get('files', {}), content.get('copy_states', {})
+
+    @property
+    def file(self) -> Path:
+        """Path: The manifest file."""
+        return self.session_path.joinpath(MANIFEST_FILE)
+
+    def _key(self, file: Path) -> str:
+        return Path(file).relative_to(self.session_path).as_posix()
+
+    def get(self, file: str | Path) -> dict | None:
+        """
+        Return the entry of a file if it is still valid.
+
+        Parameters
+        ----------
+        file : str or Path
+            A file within the session folder.
+
+        Returns
+        -------
+        dict or None
+            Dictionary with keys: size, mtime_ns, blake2b, verified. None if the file is not in the manifest or has
+            changed since.
+        """
+        stat = Path(file).stat()
+        with self._lock:
+            entry = self.files.get(self._key(file))
+        if entry is None or (entry['size'], entry['mtime_ns']) != (stat.st_size, stat.st_mtime_ns):
+            return None
+        return entry
+
+    def update(self, file: str | Path, file_hash: str, verified: bool = False, stat: os.stat_result | None = None) -> None:
+        """
+        Record the hash of a file.
+
+        Parameters
+        ----------
+        file : str or Path
+            A file within the session folder.
+        file_hash : str
+            The BLAKE2B hash of the file.
+        verified : bool, optional
+            Whether a copy of the file with the same hash exists at the destination.
+        stat : os.stat_result, optional
+            The file's status at the time it was hashed, defaults to the current status.
+        """
+        stat = stat or Path(file).stat()
+        entry = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'blake2b': file_hash, 'verified': verified}
+        with self._lock:
+            self.files[key := self._key(file)] = entry
+            self._modified_files.add(key)
+
+    def modified_files(self) -> list[Path]:
+        """
+        Return the files that have been modified since they were hashed.
+
+        Only the files' status is read, not their content.
+
+        Returns
+        -------
+        list of Path
+            Files of the manifest whose size or modification time have changed. Files that no longer exist are ignored.
+        """
+        with self._lock:
+            files = [self.session_path.joinpath(f) for f in self.files]
+        return [f for f in files if f.exists() and self.get(f) is None]
+
+    def get_copy_state(self, tag: str | None = None) -> CopyState | None:
+        """
+        Return the last known copy state.
+
+        Parameters
+        ----------
+        tag : str, optional
+            The copier's device name. If None, the least advanced state of all copiers is returned.
+
+        Returns
+        -------
+        CopyState or None
+            The last known copy state, None if it has never been recorded.
+        """
+        with self._lock:
+            states = [v['state'] for k, v in self.copy_states.items() if tag is None or k == tag]
+        return CopyState(min(states)) if states else None
+
+    def set_copy_state(self, tag: str, state: CopyState) -> None:
+        """
+        Record the copy state of a copier.
+
+        Parameters
+        ----------
+        tag : str
+            The copier's device name.
+        state : CopyState
+            The copy state.
+        """
+        with self._lock:
+            self.copy_states[tag] = {'state': int(state), 'timestamp': datetime.datetime.now().isoformat()}
+            self._modified_states.add(tag)
+
+    def save(self) -> None:
+        """Write the manifest to disk, merging the entries recorded in this instance into the ones on disk."""
+        with self._lock:
+            files, copy_states = self._read()
+            files.update({key: self.files[key] for key in self._modified_files})
+            copy_states.update({tag: self.copy_states[tag] for tag in self._modified_states})
+            file_tmp = None
+            try:
+                # the temporary file is unique, the manifest may be saved by several processes at once
+                with tempfile.NamedTemporaryFile(
+                    'w', dir=self.session_path, prefix=f'{MANIFEST_FILE}.', suffix='.tmp', delete=False
+                ) as fp:
+                    file_tmp = Path(fp.name)
+                    json.dump({'files': files, 'copy_states': copy_states}, fp, indent=1)
+                os.replace(file_tmp, self.file)
+            except OSError as e:
+                log.warning(f'Could not write {self.file}: {e}')
+                if file_tmp is not None:
+                    file_tmp.unlink(missing_ok=True)
+                return
+            self.files, self.copy_states = files, copy_states
+            self._modified_files.clear()
+            self._modified_states.clear()
+
+
+class BandwidthLimiter:
+    """
+    Token bucket limiting the rate at which data is written to the remote server.
+
+    A single instance can be shared by several threads: the limit applies to the sum of their rates. The total amount of
+    data that went through the limiter is counted, regardless of whether a limit is set.
+    """
+
+    def __init__(self, max_bytes_per_second: float | None = None):
+        """
+        Token bucket limiting the rate at which data is written to the remote server.
+
+        Parameters
+        ----------
+        max_bytes_per_second : float, optional
+            The maximum rate in bytes per second. No limit is applied if None.
+        """
+        self.max_bytes_per_second = max_bytes_per_second
+        self.total_bytes = 0
+        self._allowance = 0.0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, nbytes: int) -> None:
+        """
+        Account for data that has been written, sleeping if the maximum rate is exceeded.
+
+        Parameters
+        ----------
+        nbytes : int
+            Number of bytes written.
+        """
+        with self._lock:
+            self.total_bytes += nbytes
+            if not self.max_bytes_per_second:
+                return
+            now = time.monotonic()
+            # the bucket holds up to one second worth of data
+            self._allowance = min(self.max_bytes_per_second, self._allowance + (now - self._last) * self.max_bytes_per_second)
+            self._last = now
+            self._allowance -= nbytes
+            delay = -self._allowance / self.max_bytes_per_second
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _hash_file(file: str | Path, chunk_size: int = COPY_CHUNK_SIZE) -> str:
+    """Return the BLAKE2B hash of a file."""
+    file_hash = hashlib.blake2b()
+    with open(file, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def _copy_file_checksum(
+    src: str | Path,
+    dst: str | Path,
+    manifest: TransferManifest | None = None,
+    bandwidth_limiter: BandwidthLimiter | None = None,
+    chunk_size: int = COPY_CHUNK_SIZE,
+) -> Path:
     """
     Copy a file from source to destination with checksum verification.
 
-    This function copies a file from the source path to the destination path
-    while verifying the BLAKE2B hash of the source and destination files. If the
-    BLAKE2B hashes do not match after copying, an OSError is raised.
+    The source file is hashed while it is streamed to a temporary file at the destination (`<dst>.part`), which is
+    then hashed again before being renamed to the destination. If the temporary file already exists, e.g. after an
+    interrupted transfer, the part that matches the source is kept and the copy resumes from there.
 
     Parameters
     ----------
-    src : str
+    src : str or Path
         The path to the source file.
-    dst : str
+    dst : str or Path
         The path to the destination file.
-    *args, **kwargs
-        Additional arguments and keyword arguments to pass to `shutil.copy2`.
+    manifest : TransferManifest, optional
+        The manifest of the source session, used to skip hashing unchanged files and copying verified files.
+    bandwidth_limiter : BandwidthLimiter, optional
+        Limits the rate at which data is written to the destination.
+    chunk_size : int, optional
+        Size of the chunks, in bytes.
 
     Returns
     -------
-    str
+    Path
         The path to the copied file.
 
     Raises
@@ -61,33 +321,69 @@ def _copy2_checksum(src: str, dst: str, *args, **kwargs) -> str:
     OSError
         If the BLAKE2B hashes of the source and destination files do not match.
     """
-    log.info(f'Processing `{src}`:')
-    log.info('  - calculating hash of local file')
-    src_md5 = hashfile.blake2b(src, False)
-    if os.path.exists(dst) and samestat(os.stat(src), os.stat(dst)):
-        log.info('  - file already exists at destination')
-        log.info('  - calculating hash of remote file')
-        if src_md5 == hashfile.blake2b(dst, False):
-            log.info('  - local and remote BLAKE2B hashes match, skipping copy')
+    src, dst = Path(src), Path(dst)
+    src_stat = src.stat()
+    entry = manifest.get(src) if manifest is not None else None
+    if dst.exists() and dst.stat().st_size == src_stat.st_size:
+        if entry is not None and entry['verified']:
+            log.debug(f'`{src}` already copied and verified, skipping')
             return dst
-        else:
-            log.info('  - local and remote hashes DO NOT match')
-    log.info(f'  - copying file to `{dst}`')
-    return_val = shutil.copy2(src, dst, *args, **kwargs)
-    log.info('  - calculating hash of remote file')
-    if not src_md5 == hashfile.blake2b(dst, False):
+        src_hash = entry['blake2b'] if entry is not None else _hash_file(src, chunk_size)
+        if src_hash == _hash_file(dst, chunk_size):
+            log.info(f'`{src}` already exists at destination, local and remote BLAKE2B hashes match, skipping copy')
+            if manifest is not None:
+                manifest.update(src, src_hash, verified=True, stat=src_stat)
+            return dst
+        log.info(f'`{src}` already exists at destination, but local and remote hashes DO NOT match')
+    t0 = time.time()
+    part = dst.with_name(dst.name + '.part')
+    src_hash = hashlib.blake2b()
+    with open(src, 'rb') as fsrc, open(part, 'r+b' if part.exists() else 'w+b') as fdst:
+        # resume an interrupted copy: keep the part of the temporary file that matches the source
+        offset = 0
+        for chunk in iter(lambda: fsrc.read(chunk_size), b''):
+            if fdst.read(len(chunk)) != chunk:
+                break
+            src_hash.update(chunk)
+            offset += len(chunk)
+        if offset > 0:
+            log.info(f'Resuming copy of `{src}` at {offset / 2**20:.1f} MiB')
+        fsrc.seek(offset)
+        fdst.seek(offset)
+        for chunk in iter(lambda: fsrc.read(chunk_size), b''):
+            src_hash.update(chunk)
+            fdst.write(chunk)
+            if bandwidth_limiter is not None:
+                bandwidth_limiter.consume(len(chunk))
+        fdst.truncate()
+    src_hash = src_hash.hexdigest()
+    shutil.copystat(src, part)
+    if src_hash != _hash_file(part, chunk_size):
         raise OSError(f'Error copying {src}: hash mismatch.')
-    log.info('  - local and remote hashes match, copy successful')
-    return return_val
+    os.replace(part, dst)
+    size_mib = src_stat.st_size / 2**20
+    log.info(f'Copied `{src}` to `{dst}` ({size_mib:.1f} MiB at {size_mib / max(time.time() - t0, 1e-6):.1f} MiB/s)')
+    if manifest is not None:
+        manifest.update(src, src_hash, verified=True, stat=src_stat)
+    return dst
 
 
-def copy_folders(local_folder: Path, remote_folder: Path, overwrite: bool = False) -> bool:
+@sleepless
+def copy_folders(
+    local_folder: Path,
+    remote_folder: Path,
+    overwrite: bool = False,
+    *,
+    manifest: TransferManifest | None = None,
+    max_workers: int = COPY_MAX_WORKERS,
+    bandwidth_limiter: BandwidthLimiter | None = None,
+) -> bool:
     """
     Copy folders and files from a local location to a remote location.
 
     This function copies all folders and files from a local directory to a
-    remote directory. It provides options to overwrite existing files in
-    the remote directory and ignore specific file patterns.
+    remote directory. Files are copied concurrently, each of them being verified
+    with its BLAKE2B hash (see `_copy_file_checksum`).
 
     Parameters
     ----------
@@ -97,6 +393,12 @@ def copy_folders(local_folder: Path, remote_folder: Path, overwrite: bool = Fals
         The path to the remote folder to copy to.
     overwrite : bool, optional
         If True, overwrite existing files in the remote folder. Default is False.
+    manifest : TransferManifest, optional
+        The manifest of the local session, used to skip hashing unchanged files and copying verified files.
+    max_workers : int, optional
+        The maximum number of files copied concurrently.
+    bandwidth_limiter : BandwidthLimiter, optional
+        Limits the rate at which data is written to the remote folder.
 
     Returns
     -------
@@ -105,18 +407,30 @@ def copy_folders(local_folder: Path, remote_folder: Path, overwrite: bool = Fals
     """
     status = True
     try:
-        remote_folder.parent.mkdir(parents=True, exist_ok=True)
-        shutil.copytree(
-            local_folder,
-            remote_folder,
-            dirs_exist_ok=overwrite,
-            ignore=shutil.ignore_patterns('transfer_me.flag'),
-            copy_function=_copy2_checksum,
-        )
+        if remote_folder.exists() and not overwrite:
+            raise FileExistsError(f'{remote_folder} already exists')
+        files = []
+        for root, _, file_names in os.walk(local_folder):
+            remote_folder.joinpath(Path(root).relative_to(local_folder)).mkdir(parents=True, exist_ok=True)
+            files.extend(Path(root, f) for f in file_names if f != 'transfer_me.flag')
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(_copy_file_checksum, f, remote_folder / f.relative_to(local_folder), manifest, bandwidth_limiter)
+                for f in files
+            ]
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except OSError:
+                    log.error(traceback.format_exc())
+                    status = False
     except OSError:
         log.error(traceback.format_exc())
-        log.info(f'Could not copy {local_folder} to {remote_folder}')
         status = False
+    if manifest is not None:
+        manifest.save()
+    if not status:
+        log.info(f'Could not copy {local_folder} to {remote_folder}')
     return status
 
 
@@ -132,6 +446,12 @@ class SessionCopier:
     tag = f'{socket.gethostname()}_{uuid.getnode()}'
     """str: The device name (adds this to the experiment description stub file on the remote server)."""
 
+    _manifest = None
+    """TransferManifest: The manifest of the local session."""
+
+    bandwidth_limiter = None
+    """BandwidthLimiter: Limits the rate at which data is written to the remote server, set by the `TransferScheduler`."""
+
     def __init__(self, session_path, remote_subjects_folder=None, tag=None):
         """
         Initialize and copy session data to a remote server.
@@ -154,14 +474,31 @@ class SessionCopier:
 
     @property
     def state(self):
-        return self.get_state()[0]
+        state = self.get_state()[0]
+        # record the state in the manifest so that it is available without access to the remote server
+        if state is not None and self.session_path.exists() and self.manifest.get_copy_state(self.tag) != state:
+            self.manifest.set_copy_state(self.tag, state)
+            self.manifest.save()
+        return state
+
+    @property
+    def manifest(self) -> TransferManifest:
+        """TransferManifest: The manifest of the local session, holding the files' hashes and the copy states."""
+        if self._manifest is None:
+            self._manifest = TransferManifest.for_session(self.session_path)
+        return self._manifest
 
-    def run(self, number_of_expected_devices=None):
+    def run(self, number_of_expected_devices=None) -> bool:
         """
         Run the copy of this device experiment.
 
         Will try to get as far as possible in the copy process (from states 0 init experiment to state 3 finalize experiment)
         if possible, and return earlier if the process can't be completed.
+
+        Returns
+        -------
+        bool
+            True if the data of this device have been copied to the remote, i.e. the copy is complete or finalized.
         """
         if self.state == CopyState.HARD_RESET:  # this case is not implemented automatically and corresponds to a hard reset
             log.info(f'{self.state}, {self.session_path}')
@@ -178,6 +515,7 @@ class SessionCopier:
             self.finalize_copy(number_of_expected_devices=number_of_expected_devices)
         if self.state == CopyState.FINALIZED:
             log.info(f'{self.state}, {self.session_path}')
+        return self.state in (CopyState.COMPLETE, CopyState.FINALIZED)
 
     def get_state(self) -> tuple[CopyState | None, str]:
         """
@@ -273,10 +611,15 @@ class SessionCopier:
             log.info(f'transferring {self.session_path} - {collection}')
             remote_collection = self.remote_session_path.joinpath(collection)
             if remote_collection.exists():
-                # this is far from ideal: we currently recopy all files even if some already copied
-                log.warning(f'Collection {remote_collection} already exists, removing')
-                shutil.rmtree(remote_collection)
-            status &= copy_folders(local_collection, remote_collection)
+                # files that have already been copied are verified and skipped, partial copies are resumed
+                log.warning(f'Collection {remote_collection} already exists, resuming')
+            status &= copy_folders(
+                local_collection,
+                remote_collection,
+                overwrite=True,
+                manifest=self.manifest,
+                bandwidth_limiter=self.bandwidth_limiter,
+            )
         status &= self.copy_snapshots()  # special case: copy snapshots without deleting or overwriting remote files
         return status
 
@@ -314,7 +657,7 @@ class SessionCopier:
             return False
         # 'overwrite' actually means 'don't raise if remote folder exists'.
         # We've already checked that filenames don't conflict.
-        return copy_folders(snapshots, remote_snapshots, overwrite=True)
+        return copy_folders(snapshots, remote_snapshots, overwrite=True, bandwidth_limiter=self.bandwidth_limiter)
 
     def copy_collections(self):
         """
@@ -578,4 +921,109 @@ class EphysCopier(SessionCopier):
             local_folder=self.session_path.joinpath('raw_ephys_data'),
             remote_folder=self.remote_session_path.joinpath('raw_ephys_data'),
             overwrite=True,
+            manifest=self.manifest,
+            bandwidth_limiter=self.bandwidth_limiter,
+        )
+
+
+class TransferScheduler:
+    """
+    Transfer the data of several sessions concurrently.
+
+    Sessions are queued by copier tag, following `TRANSFER_PRIORITY` (e.g., behavior data before video data), and copied
+    by a bounded pool of threads. All copies share a single `BandwidthLimiter`. The failure of one session (an exception
+    or a copier returning False) is logged and does not abort the transfer of the remaining sessions.
+
+    Examples
+    --------
+    >>> copiers = [VideoCopier(session_path, remote_subjects_folder) for session_path in session_paths]
+    >>> scheduler = TransferScheduler(copiers, max_sessions=2, max_bandwidth=50)
+    >>> failed = scheduler.run()
+    """
+
+    def __init__(
+        self,
+        copiers: list[SessionCopier],
+        max_sessions: int = 1,
+        max_bandwidth: float | None = None,
+        progress_interval: float = 30.0,
+    ):
+        """
+        Transfer the data of several sessions concurrently.
+
+        Parameters
+        ----------
+        copiers : list of SessionCopier
+            The copiers to run.
+        max_sessions : int, optional
+            The maximum number of sessions copied concurrently. Defaults to 1.
+        max_bandwidth : float, optional
+            The maximum aggregate rate of the copies in MiB/s. No limit is applied if None.
+        progress_interval : float, optional
+            Interval, in seconds, at which the progress of the transfer is logged.
+        """
+
+        def priority(copier: SessionCopier) -> int:
+            return TRANSFER_PRIORITY.index(copier.tag) if copier.tag in TRANSFER_PRIORITY else len(TRANSFER_PRIORITY)
+
+        self.copiers = sorted(copiers, key=priority)
+        self.max_sessions = max(1, max_sessions)
+        self.progress_interval = progress_interval
+        self.bandwidth_limiter = BandwidthLimiter(max_bandwidth * 2**20 if max_bandwidth else None)
+        self.failed: list[SessionCopier] = []
+        self._t0 = None
+
+    def run(self, number_of_expected_devices: int | None = None) -> list[SessionCopier]:
+        """
+        Run the copiers.
+
+        Parameters
+        ----------
+        number_of_expected_devices : int, optional
+            Passed to `SessionCopier.run`.
+
+        Returns
+        -------
+        list of SessionCopier
+            The copiers that raised an exception or returned False.
+        """
+        self.failed = []
+        self._t0 = time.time()
+        for copier in self.copiers:
+            copier.bandwidth_limiter = self.bandwidth_limiter
+        with ThreadPoolExecutor(max_workers=self.max_sessions) as executor:
+            futures = {
+                executor.submit(copier.run, number_of_expected_devices=number_of_expected_devices): copier
+                for copier in self.copiers
+            }
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=self.progress_interval)
+                for future in done:
+                    if (e := future.exception()) is not None:
+                        log.error(
+                            f'Transfer of {futures[future].session_path} failed',
+                            exc_info=(type(e), e, e.__traceback__),
+                        )
+                        self.failed.append(futures[future])
+                    elif not future.result():
+                        log.error(f'Transfer of {futures[future].session_path} failed')
+                        self.failed.append(futures[future])
+                self.log_progress(len(futures) - len(pending))
+        return self.failed
+
+    def log_progress(self, n_done: int) -> None:
+        """
+        Log the aggregate progress and throughput of the transfer.
+
+        Parameters
+        ----------
+        n_done : int
+            Number of sessions processed so far.
+        """
+        elapsed = max(time.time() - self._t0, 1e-6)
+        total_mib = self.bandwidth_limiter.total_bytes / 2**20
+        log.info(
+            f'{n_done}/{len(self.copiers)} sessions processed ({len(self.failed)} failed) - '
+            f'{total_mib / 1024:.2f} GiB copied in {elapsed:.0f} s ({total_mib / elapsed:.1f} MiB/s)'
         )
@@ -0,0 +1,228 @@
+"""
+Columnar, append-only storage of trial data.
+
+The task data jsonable file remains the reference for the trial data. This module provides an optional second sink that
+stores the validated trial data alongside it as an Arrow IPC stream, with the Bpod state and event timestamps flattened
+into columns. Consumers that only need a few columns of a session (e.g. for computing the adaptive reward of the next
+session) can then load those without parsing the full jsonable file - see
+:func:`iblrig.raw_data_loaders.load_task_arrow`.
+"""
+
+import logging
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pydantic import BaseModel
+
+log = logging.getLogger(__name__)
+
+ARROW_SUFFIX = '.arrows'
+"""str: File extension of the Arrow IPC stream, replacing the extension of the task data jsonable file."""
+
+BPOD_TIMESTAMPS = {
+    'Bpod start timestamp': 'bpod_start_timestamp',
+    'Trial start timestamp': 'trial_start_timestamp',
+    'Trial end timestamp': 'trial_end_timestamp',
+}
+
+
+def arrow_file_from_jsonable(jsonable_file: str | Path) -> Path:
+    """
+    Return the path of the Arrow IPC stream corresponding to a task data jsonable file.
+
+    Parameters
+    ----------
+    jsonable_file : str or Path
+        Full path to the jsonable file.
+
+    Returns
+    -------
+    Path
+        Full path to the Arrow IPC stream, e.g. `_iblrig_taskData.raw.arrows`.
+    """
+    return Path(jsonable_file).with_suffix(ARROW_SUFFIX)
+
+
+def flatten_bpod_data(bpod_data: dict[str, Any]) -> dict[str, Any]:
+    """
+    Flatten the trial data returned by pybpod into a single level dictionary.
+
+    State timestamps are stored as `state_<name>_onset` and `state_<name>_offset` of the first occurrence of the state
+    within the trial. Event timestamps are stored as lists in `event_<name>`.
+
+    Parameters
+    ----------
+    bpod_data : dict
+        Trial data returned from pybpod.
+
+    Returns
+    -------
+    dict
+        The flattened Bpod data.
+    """
+    flat = {v: bpod_data.get(k, np.nan) for k, v in BPOD_TIMESTAMPS.items()}
+    for state, timestamps in bpod_data.get('States timestamps', {}).items():
+        onset, offset = timestamps[0] if len(timestamps) else (np.nan, np.nan)
+        flat[f'state_{state}_onset'], flat[f'state_{state}_offset'] = float(onset), float(offset)
+    for event, timestamps in bpod_data.get('Events timestamps', {}).items():
+        flat[f'event_{event}'] = [float(t) for t in timestamps]
+    return flat
+
+
+def trial_data_schema(
+    trial_model: type[BaseModel] | None = None, state_names: Iterable[str] = (), event_names: Iterable[str] = ()
+) -> pa.Schema:
+    """
+    Declare the schema of the Arrow IPC stream.
+
+    Parameters
+    ----------
+    trial_model : type of TrialDataModel, optional
+        The task's trial data model, the columns are typed after its fields.
+    state_names : iterable of str, optional
+        The names of the states of the state machine, stored as `state_<name>_onset` and `state_<name>_offset`.
+    event_names : iterable of str, optional
+        The names of the events of the Bpod, stored as `event_<name>`.
+
+    Returns
+    -------
+    pyarrow.Schema
+        The schema of the trial data and the flattened Bpod data, see :func:`flatten_bpod_data`.
+    """
+    fields = []
+    if trial_model is not None:
+        schema = pa.Schema.from_pandas(trial_model.preallocate_dataframe(0), preserve_index=False)
+        fields += list(schema.remove_metadata())
+    fields += [pa.field(name, pa.float64()) for name in BPOD_TIMESTAMPS.values()]
+    fields += [pa.field(f'state_{state}_{edge}', pa.float64()) for state in state_names for edge in ('onset', 'offset')]
+    fields += [pa.field(f'event_{event}', pa.list_(pa.float64())) for event in event_names]
+    return pa.schema(fields)
+
+
+class ArrowTrialWriter:
+    """
+    Append trial data to an Arrow IPC stream.
+
+    The schema is declared up front, see :func:`trial_data_schema`. Fields that are not declared are typed after their
+    first non-null value. If a trial holds fields that are not part of the schema yet, or values that don't fit their
+    column's type, the schema is extended and the stream is rewritten: no trial is dropped.
+    """
+
+    def __init__(self, file_path: str | Path, schema: pa.Schema | None = None, flush_every: int = 1):
+        """
+        Append trial data to an Arrow IPC stream.
+
+        Parameters
+        ----------
+        file_path : str or Path
+            Full path to the Arrow IPC stream.
+        schema : pyarrow.Schema, optional
+            The declared schema, see :func:`trial_data_schema`. Defaults to inferring all fields from the trials.
+        flush_every : int, optional
+            Number of trials to buffer before writing a record batch to disk. Defaults to 1.
+        """
+        self.file_path = Path(file_path)
+        self.flush_every = flush_every
+        self.schema: pa.Schema = pa.schema([]) if schema is None else schema
+        self._buffer: list[dict[str, Any]] = []
+        self._sink = None
+        self._writer = None
+
+    def append(self, trial_data: dict[str, Any], bpod_data: dict[str, Any] | None = None) -> None:
+        """
+        Append a single trial.
+
+        Parameters
+        ----------
+        trial_data : dict
+            The validated trial data.
+        bpod_data : dict, optional
+            Trial data returned from pybpod.
+        """
+        self._buffer.append(trial_data | flatten_bpod_data(bpod_data or {}))
+        if self._writer is None:
+            self._open(self.schema)
+        if len(self._buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered trials to disk."""
+        if self._writer is None or len(self._buffer) == 0:
+            return
+        names = list(self.schema.names)
+        names += list(dict.fromkeys(name for record in self._buffer for name in record if name not in self.schema.names))
+        fields, arrays = [], []
+        for name in names:
+            field = self.schema.field(name) if name in self.schema.names else pa.field(name, pa.null())
+            field, array = self._column(field, [None if r.get(name) is pd.NA else r.get(name) for r in self._buffer])
+            fields.append(field)
+            arrays.append(array)
+        if (schema := pa.schema(fields)) != self.schema:
+            self._rewrite(schema)
+        self._writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self._sink.flush()
+        self._buffer = []
+
+    def close(self) -> None:
+        """Flush the buffered trials and close the stream."""
+        try:
+            self.flush()
+        finally:
+            if self._writer is not None:
+                self._writer.close()
+                self._sink.close()
+                self._writer = None
+
+    def _column(self, field: pa.Field, values: list[Any]) -> tuple[pa.Field, pa.Array]:
+        """Convert the values of a column, promoting the type of the field if the values don't fit."""
+        errors = (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError)
+        try:
+            array = pa.array(values)
+        except errors:
+            array = None
+        try:
+            if array is None:  # mixed types, the conversion to the field's type may still succeed
+                return field, pa.array(values, type=field.type)
+            try:
+                # a safe cast fails for values that don't fit the field's type, e.g. fractional values of an integer field
+                return field, array.cast(field.type)
+            except errors:
+                schema = pa.unify_schemas(
+                    [pa.schema([field]), pa.schema([field.with_type(array.type)])], promote_options='permissive'
+                )
+                return schema.field(0), array.cast(schema.field(0).type)
+        except errors as e:
+            log.warning(f'Could not store {field.name} in {self.file_path.name}, the values remain in the jsonable file: {e}')
+            return field, pa.nulls(len(values), field.type)
+
+    def _open(self, schema: pa.Schema) -> None:
+        self.schema = schema
+        if self.file_path.exists():
+            log.warning(f'Overwriting {self.file_path}')
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        self._sink = pa.OSFile(str(self.file_path), 'wb')
+        self._writer = pa.ipc.new_stream(self._sink, self.schema)
+        # the schema is only written along with the first record batch: write an empty one so that the stream can be read
+        self._writer.write_batch(pa.RecordBatch.from_pylist([], schema=self.schema))
+        self._sink.flush()
+
+    def _rewrite(self, schema: pa.Schema) -> None:
+        """Rewrite the stream with an extended schema, the trials written so far are cast to the new schema."""
+        log.info(f'Extending the schema of {self.file_path.name}: {", ".join(set(schema.names) - set(self.schema.names))}')
+        self._writer.close()
+        self._sink.close()
+        with pa.OSFile(str(self.file_path), 'rb') as source:
+            table = pa.ipc.open_stream(source).read_all()
+        columns = [
+            table.column(f.name).cast(f.type) if f.name in table.column_names else pa.nulls(table.num_rows, f.type)
+            for f in schema
+        ]
+        self.schema = schema
+        self._sink = pa.OSFile(str(self.file_path), 'wb')
+        self._writer = pa.ipc.new_stream(self._sink, self.schema)
+        self._writer.write_table(pa.Table.from_arrays(columns, schema=self.schema))
+        self._sink.flush()
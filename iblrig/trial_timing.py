@@ -0,0 +1,174 @@
+"""
+Timing of the phases of the trial loop.
+
+:class:`TrialTimer` measures the duration of the steps executed between two trials (e.g. drawing the next trial,
+building and sending the state machine, saving the trial data) with :func:`time.perf_counter`. The durations of the last
+trials are kept in a fixed-size ring buffer and appended to a per-session timing file before they are overwritten. The
+percentiles of each phase's durations show which steps are responsible for rigs missing their inter-trial interval.
+"""
+
+import contextlib
+import logging
+import time
+from collections.abc import Iterator, Sequence
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+TIMINGS_FILE = '_iblrig_trialTimings.raw.csv'
+
+
+class TrialTimer:
+    """Ring buffer of the durations of the phases of each trial."""
+
+    def __init__(self, phases: Sequence[str], file_path: str | Path | None = None, capacity: int = 1024):
+        """
+        Ring buffer of the durations of the phases of each trial.
+
+        Parameters
+        ----------
+        phases : sequence of str
+            The names of the phases.
+        file_path : str or Path, optional
+            The CSV file the durations are appended to, one row per trial. If None, the durations are only kept in memory.
+        capacity : int, optional
+            The number of trials kept in memory. Defaults to 1024.
+        """
+        self.phases = tuple(phases)
+        self.file_path = Path(file_path) if file_path is not None else None
+        self.capacity = capacity
+        self._iphase = {phase: i for i, phase in enumerate(self.phases)}
+        self._durations = np.full((capacity, len(self.phases)), np.nan)
+        self._trial_nums = np.full(capacity, -1, dtype=int)
+        self._ntrials = 0  # number of trials started
+        self._nsaved = 0  # number of trials written to the timing file
+
+    @property
+    def ntrials(self) -> int:
+        """int: The number of trials started."""
+        return self._ntrials
+
+    def start_trial(self, trial_num: int) -> None:
+        """
+        Start recording the durations of a new trial.
+
+        If the trial's slot in the ring buffer holds a trial that hasn't been written to the timing file yet, the pending
+        trials are written first.
+
+        Parameters
+        ----------
+        trial_num : int
+            The trial number.
+        """
+        if self.file_path is not None and self._ntrials - self._nsaved >= self.capacity:
+            self.save()
+        irow = self._ntrials % self.capacity
+        self._durations[irow] = np.nan
+        self._trial_nums[irow] = trial_num
+        self._ntrials += 1
+
+    def record(self, phase: str, duration: float) -> None:
+        """
+        Record the duration of a phase of the current trial.
+
+        Durations recorded repeatedly for the same phase and trial are summed.
+
+        Parameters
+        ----------
+        phase : str
+            The name of the phase.
+        duration : float
+            The duration in seconds.
+        """
+        if self._ntrials == 0:
+            return
+        irow, icol = (self._ntrials - 1) % self.capacity, self._iphase[phase]
+        self._durations[irow, icol] = np.nansum([self._durations[irow, icol], duration])
+
+    @contextlib.contextmanager
+    def measure(self, phase: str) -> Iterator[None]:
+        """
+        Measure the duration of a block of code as a phase of the current trial.
+
+        Parameters
+        ----------
+        phase : str
+            The name of the phase.
+
+        Examples
+        --------
+        >>> timer = TrialTimer(['next_trial'])
+        >>> timer.start_trial(0)
+        >>> with timer.measure('next_trial'):
+        ...     time.sleep(0.01)
+        """
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - t0)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Return the durations of the trials held in the ring buffer.
+
+        Returns
+        -------
+        pandas.DataFrame
+            The durations in seconds, one column per phase, indexed by trial number in chronological order. Phases that
+            were not executed are NaN.
+        """
+        irows = np.arange(max(self._ntrials - self.capacity, 0), self._ntrials) % self.capacity
+        return self._dataframe(irows)
+
+    def summary(self, quantiles: Sequence[float] = (0.5, 0.95, 0.99)) -> pd.DataFrame:
+        """
+        Return the percentiles of the durations of each phase over the trials held in the ring buffer.
+
+        Parameters
+        ----------
+        quantiles : sequence of float, optional
+            The quantiles to compute. Defaults to the 50th, 95th and 99th percentiles.
+
+        Returns
+        -------
+        pandas.DataFrame
+            One row per phase with the number of trials, the quantiles (columns p50, p95, ...) and the maximum, in seconds.
+        """
+        durations = self.to_dataframe()
+        columns = ['count'] + [f'p{q * 100:g}' for q in quantiles] + ['max']
+        summary = pd.DataFrame(np.nan, index=pd.Index(self.phases, name='phase'), columns=columns)
+        for phase in self.phases:
+            values = durations[phase].dropna().to_numpy()
+            summary.at[phase, 'count'] = values.size
+            if values.size > 0:
+                summary.loc[phase, columns[1:]] = np.r_[np.quantile(values, quantiles), np.max(values)]
+        return summary.astype({'count': int})
+
+    def log_summary(self) -> None:
+        """Log the percentiles of the durations of each phase in milliseconds, see :meth:`summary`."""
+        summary = self.summary()
+        summary.loc[:, summary.columns != 'count'] *= 1000
+        log.info(f'Trial timings (ms) over the last {summary["count"].max()} trials:\n{summary.round(2).to_string()}')
+
+    def save(self) -> None:
+        """Append the durations of the trials that have not been written yet to the timing file."""
+        if self.file_path is None or self._nsaved == self._ntrials:
+            return
+        irows = np.arange(max(self._nsaved, self._ntrials - self.capacity), self._ntrials) % self.capacity
+        if self._ntrials - self._nsaved > self.capacity:
+            log.warning(f'The timings of {self._ntrials - self._nsaved - self.capacity} trials have been overwritten')
+        try:
+            self._dataframe(irows).to_csv(self.file_path, mode='a', header=not self.file_path.exists(), float_format='%.6f')
+        except OSError as e:
+            log.error(f'Could not save the trial timings to {self.file_path}: {e}')
+        else:
+            self._nsaved = self._ntrials
+
+    def _dataframe(self, irows: np.ndarray) -> pd.DataFrame:
+        return pd.DataFrame(
+            self._durations[irows], index=pd.Index(self._trial_nums[irows], name='trial_num'), columns=list(self.phases)
+        )
@@ -0,0 +1,192 @@
+"""
+Background persistence of trial data.
+
+The trial loop hands the validated data of each trial over to a :class:`TrialDataWriter`, which serializes and appends
+them to the task data jsonable file (and optionally to the Arrow IPC stream, see :mod:`iblrig.trial_store`) in a
+separate thread. Slow or busy disks thus don't delay the next trial.
+
+The trials are written in the order in which they were handed over. Each trial's line is flushed to the operating
+system before the trial's callback is run (e.g. notifying the online plots), while the calls to :func:`os.fsync` are
+batched. :meth:`TrialDataWriter.flush` and :meth:`TrialDataWriter.close` block until all trials handed over so far have
+been written and synced to disk.
+
+Only failures to write or sync the jsonable file are reported to the task. The Arrow IPC stream is optional: if appending
+to it fails, the error is logged and the stream is no longer written to for the rest of the session.
+"""
+
+import logging
+import os
+import queue
+import threading
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+import pydantic_core
+
+from iblrig.trial_store import ArrowTrialWriter
+
+log = logging.getLogger(__name__)
+
+
+def _json_fallback(value):
+    """Convert NumPy types and missing values of the trials table for :func:`pydantic_core.to_json`."""
+    if isinstance(value, np.generic | np.ndarray):
+        return value.tolist()
+    if value is pd.NA:  # unset values of columns that are not part of the trial data model
+        return np.nan
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def encode_trial_data(trial_data: dict[str, Any]) -> bytes:
+    """
+    Encode the data of a trial as a line of the task data jsonable file.
+
+    Pydantic's serializer is several times faster than :func:`json.dumps` for the large behavior_data dicts and handles
+    NumPy scalars. NaN and infinite values are written as in :func:`json.dumps`, missing values (:data:`pandas.NA`) as NaN.
+
+    Parameters
+    ----------
+    trial_data : dict
+        The trial data, including the Bpod data as 'behavior_data'.
+
+    Returns
+    -------
+    bytes
+        The JSON encoded trial data, terminated by a newline.
+    """
+    return pydantic_core.to_json(trial_data, fallback=_json_fallback) + b'\n'
+
+
+class TrialDataWriter:
+    """Append trial data to the task data jsonable file from a background thread."""
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        file_path: str | Path,
+        *,
+        arrow_writer: ArrowTrialWriter | None = None,
+        max_queue_size: int = 100,
+        fsync_every: int = 10,
+    ):
+        """
+        Append trial data to the task data jsonable file from a background thread.
+
+        Parameters
+        ----------
+        file_path : str or Path
+            Full path to the task data jsonable file.
+        arrow_writer : ArrowTrialWriter, optional
+            An optional writer that additionally stores the trial data as an Arrow IPC stream. It is disabled upon the first
+            error.
+        max_queue_size : int, optional
+            The maximum number of trials waiting to be written. Once reached, :meth:`put` blocks. Defaults to 100.
+        fsync_every : int, optional
+            The maximum number of trials written between two calls to :func:`os.fsync`. The file is also synced whenever
+            the queue runs empty. Defaults to 10.
+        """
+        self.file_path = Path(file_path)
+        self.arrow_writer = arrow_writer
+        self.fsync_every = fsync_every
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._error: Exception | None = None
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.file_path, 'ab')  # noqa: SIM115 - closed by the writer thread
+        self._thread = threading.Thread(target=self._write_loop, name='trial_writer', daemon=True)
+        self._thread.start()
+
+    def put(self, trial_data: dict[str, Any], bpod_data: dict[str, Any], callback: Callable[[], None] | None = None) -> None:
+        """
+        Hand over the data of a trial for writing.
+
+        Parameters
+        ----------
+        trial_data : dict
+            The validated trial data.
+        bpod_data : dict
+            Trial data returned from pybpod, written as 'behavior_data'.
+        callback : callable, optional
+            A function called from the writer thread once the trial's data have been written.
+
+        Raises
+        ------
+        RuntimeError
+            If the writer has been closed.
+        OSError
+            If writing a previous trial failed.
+        """
+        self._raise_error()
+        if not self._thread.is_alive():
+            raise RuntimeError(f'{self.__class__.__name__} for {self.file_path.name} is closed')
+        if self._queue.full():
+            log.warning(f'{self._queue.qsize()} trials are waiting to be written to {self.file_path.name}')
+        self._queue.put((trial_data, bpod_data, callback))
+
+    def flush(self) -> None:
+        """Block until all trials handed over have been written and synced to disk."""
+        self._queue.join()
+        self._raise_error()
+
+    def close(self) -> None:
+        """Write all pending trials, then stop the writer thread and close the Arrow IPC stream."""
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join()
+        self._raise_error()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise OSError(f'Could not write trial data to {self.file_path}') from error
+
+    def _write_loop(self) -> None:
+        n_unsynced = 0
+        while True:
+            item = self._queue.get()
+            try:
+                if item is self._STOP:
+                    break
+                trial_data, bpod_data, callback = item
+                self._file.write(encode_trial_data(trial_data | {'behavior_data': bpod_data}))
+                self._file.flush()
+                n_unsynced += 1
+            except Exception as e:
+                log.error(f'Could not write trial data to {self.file_path.name}: {e}')
+                self._error = e
+            else:
+                if self.arrow_writer is not None:
+                    try:
+                        self.arrow_writer.append(trial_data, bpod_data)
+                    except Exception as e:
+                        log.error(f'Could not write trial data to {self.arrow_writer.file_path.name}, disabling it: {e}')
+                        self._close_arrow_writer()
+                try:
+                    if callback is not None:
+                        callback()
+                except Exception as e:
+                    log.warning(f'Error in callback after writing trial data: {e}')
+            finally:
+                # sync once the queue runs empty, and at least every fsync_every trials
+                if n_unsynced > 0 and (n_unsynced >= self.fsync_every or self._queue.qsize() == 0):
+                    try:
+                        os.fsync(self._file.fileno())
+                    except OSError as e:
+                        log.error(f'Could not sync {self.file_path.name} to disk: {e}')
+                        self._error = e
+                    n_unsynced = 0
+                self._queue.task_done()
+        self._file.close()
+        self._close_arrow_writer()
+
+    def _close_arrow_writer(self) -> None:
+        arrow_writer, self.arrow_writer = self.arrow_writer, None
+        if arrow_writer is None:
+            return
+        try:
+            arrow_writer.close()
+        except Exception as e:
+            log.error(f'Could not close {arrow_writer.file_path.name}: {e}')
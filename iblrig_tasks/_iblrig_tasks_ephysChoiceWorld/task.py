@@ -9,6 +9,7 @@ import pandas as pd
 
 import iblrig.misc
 from iblrig.base_choice_world import BiasedChoiceWorldSession
+from iblrig.session_creator import read_session_template
 
 
 class Session(BiasedChoiceWorldSession):
@@ -40,11 +41,8 @@ class Session(BiasedChoiceWorldSession):
         session_template_id : int
             Session template ID (0-11).
         """
-        trials_table = pd.read_parquet(Path(__file__).parent.joinpath('trials_fixtures.pqt'))
-        trials_table = (
-            trials_table.loc[trials_table['session_id'] == session_template_id].reindex().drop(columns=['session_id'])
-        ).reset_index()
-        return trials_table
+        file_fixtures = Path(__file__).parent.joinpath('trials_fixtures.pqt')
+        return read_session_template(file_fixtures, session_template_id).drop(columns=['session_id']).reset_index()
 
     @staticmethod
     def extra_parser():
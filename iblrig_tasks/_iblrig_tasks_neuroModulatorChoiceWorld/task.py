@@ -1,4 +1,5 @@
 import logging
+from collections.abc import Hashable
 
 import numpy as np
 from pydantic import NonNegativeFloat
@@ -234,6 +235,16 @@ class Session(BiasedChoiceWorldSession):
         )
         return sma
 
+    def get_state_machine_template_key(self, i: int) -> Hashable | None:
+        if type(self).get_state_machine_trial is not Session.get_state_machine_trial:
+            return None
+        return i == 0, self.position, bool(self.omit_feedback)
+
+    def get_state_machine_timers(self, i: int) -> dict[str, float]:
+        timers = {'quiescent_period': self.quiescent_period, 'reward': self.reward_time}
+        timers.update({state: self.choice_to_feedback_delay for state in ('delay_no_go', 'delay_error', 'delay_reward')})
+        return timers
+
 
 class SessionRelatedBlocks(Session):
     """
@@ -4,11 +4,11 @@ import time
 from datetime import timedelta
 from pathlib import Path
 
-import pandas as pd
 import yaml
 
 import iblrig.misc
 from iblrig.base_choice_world import ChoiceWorldSession
+from iblrig.session_creator import read_session_template
 
 log = logging.getLogger('iblrig.task')
 
@@ -31,8 +31,8 @@ class Session(ChoiceWorldSession):
         self.extractor_tasks = ['PassiveRegisterRaw', 'PassiveTask']
         super(ChoiceWorldSession, self).__init__(**kwargs)
         self.task_params.SESSION_TEMPLATE_ID = session_template_id
-        all_trials = pd.read_parquet(Path(__file__).parent.joinpath('passiveChoiceWorld_trials_fixtures.pqt'))
-        self.trials_table = all_trials[all_trials['session_id'] == self.task_params.SESSION_TEMPLATE_ID].copy()
+        file_fixtures = Path(__file__).parent.joinpath('passiveChoiceWorld_trials_fixtures.pqt')
+        self.trials_table = read_session_template(file_fixtures, self.task_params.SESSION_TEMPLATE_ID)
         self.trials_table['reward_valve_time'] = self.compute_reward_time(amount_ul=self.trials_table['reward_amount'])
         assert duration_spontaneous < 60 * 60 * 24
         self.task_params['SPONTANEOUS_ACTIVITY_SECONDS'] = duration_spontaneous